@@ -1,12 +1,21 @@
 # In this file, you can set the configurations of the app.
 
-from src.utils.constants import DEBUG, ERROR, INFO, LLM_MODEL, OPENAI
+from src.utils.constants import DEBUG, ERROR, INFO, LLM_MODEL, OPENAI, WARNING
 
 #config related to logging must have prefix LOG_
 LOG_LEVEL = INFO
 LOG_SELENIUM_LEVEL = ERROR
 LOG_TO_FILE = False
 LOG_TO_CONSOLE = True
+# Minimum levels per module name prefix, overriding LOG_LEVEL, e.g. {'src.libs.llm_invocation': DEBUG}
+LOG_MODULE_LEVELS = {}
+# Levels of the standard-library loggers of third-party packages
+LOG_THIRD_PARTY_LEVELS = {'httpx': WARNING, 'httpcore': WARNING, 'openai': WARNING, 'urllib3': WARNING, 'selenium': ERROR}
+# Log file of the resume and cover letter builder (None disables it); DEBUG writes every prompt and reply excerpt
+LOG_RESUME_BUILDER_FILE = 'log/resume/gpt_resume.log'
+LOG_RESUME_BUILDER_LEVEL = INFO
+# Longest excerpt of a prompt, reply or parsed result written by debug messages
+LOG_PAYLOAD_MAX_CHARS = 500
 
 MINIMUM_WAIT_TIME_IN_SECONDS = 60
 
@@ -18,5 +27,161 @@ JOB_MIN_APPLICATIONS = 1
 
 LLM_MODEL_TYPE = 'openai'
 LLM_MODEL = 'gpt-4o-mini'
-# Only required for OLLAMA models
-LLM_API_URL = ''
\ No newline at end of file
+# Only required for OLLAMA and openai_compatible models
+LLM_API_URL = ''
+# Custom model types loaded on first use: name -> 'package.module:factory', factory(api_key, llm_model, llm_api_url) -> AIModel
+LLM_MODEL_PROVIDERS = {}
+# Ollama: how long models stay loaded after a call ('30m', or -1 to keep them loaded), warm-up request at startup,
+# context size (None keeps the model default) and parallel slots (None: OLLAMA_NUM_PARALLEL for a local server, else 4)
+LLM_OLLAMA_KEEP_ALIVE = '30m'
+LLM_OLLAMA_WARMUP = True
+LLM_OLLAMA_NUM_CTX = None
+LLM_OLLAMA_PARALLEL_SLOTS = None
+# Backend pool of AIAdapter, routed by rolling latency and error rate with failover; empty uses LLM_MODEL_TYPE only.
+# Entries: {'name', 'model_type', 'model', 'weight', 'api_url', 'api_key_env', 'timeout_seconds'}, e.g.
+# [{'name': 'openai', 'model_type': 'openai', 'model': 'gpt-4o-mini'},
+#  {'name': 'claude', 'model_type': 'claude', 'model': 'claude-3-5-haiku-latest', 'api_key_env': 'ANTHROPIC_API_KEY'},
+#  {'name': 'local', 'model_type': 'ollama', 'model': 'llama3.1', 'api_url': 'http://localhost:11434', 'weight': 0.5}]
+LLM_BACKENDS = []
+# Template name prefix -> backend name(s) allowed to serve it, for templates whose output quality requires it.
+# Template names are the ai_hawk prompts used by the application answerer (e.g. 'coverletter_template',
+# 'numeric_question_template'); the resume and cover letter builder does not go through the pool
+LLM_BACKEND_PINS = {}
+LLM_BACKEND_TIMEOUT_SECONDS = 60
+LLM_BACKEND_DEFAULT_LATENCY_SECONDS = 5.0
+LLM_BACKEND_EWMA_ALPHA = 0.2
+LLM_BACKEND_ERROR_PENALTY = 10
+LLM_BACKEND_ERROR_HALF_LIFE_SECONDS = 120
+LLM_BACKEND_MAX_WORKERS = 32
+
+# Persistent LLM reply cache, keyed by provider, model, temperature and rendered prompt
+LLM_CACHE_ENABLED = True
+LLM_CACHE_PATH = 'data_folder/output/llm_cache.sqlite3'
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+LLM_CACHE_MAX_ENTRIES = 5000
+# Serve cached replies but never store new ones
+LLM_CACHE_READ_ONLY = False
+# Skip the cache entirely for this run
+LLM_CACHE_BYPASS = False
+
+# Generated resume sections reused while their resume data, job summary, prompt template and model are unchanged
+RESUME_SECTION_CACHE_ENABLED = True
+RESUME_SECTION_CACHE_PATH = 'data_folder/output/section_cache.sqlite3'
+RESUME_SECTION_CACHE_MAX_ENTRIES = 2000
+# Sections reused across jobs even though their prompt reads the job description (sections whose prompt
+# does not read it, such as the header, are always reused)
+RESUME_SECTION_CACHE_JOB_INDEPENDENT = ()
+
+# How resume sections are generated: 'fan_out' (one call per section, in parallel) or 'structured'
+# (every section in a single call answering a JSON object keyed by section)
+RESUME_GENERATION_MODE = 'fan_out'
+
+# Persistent embedding cache (memory-mapped vectors, LRU eviction) keyed by embedding model and chunk text
+LLM_EMBEDDING_CACHE_ENABLED = True
+LLM_EMBEDDING_CACHE_DIR = 'data_folder/output/embedding_cache'
+LLM_EMBEDDING_CACHE_MAX_ENTRIES = 20000
+
+# Maximum number of LLM calls in flight at once on the async invocation path
+LLM_MAX_CONCURRENT_REQUESTS = 8
+
+# Client-side rate limits per model name prefix; refined at runtime from x-ratelimit-* response headers
+LLM_RATE_LIMITS = {
+    'default': {'requests_per_minute': 500, 'tokens_per_minute': 200000},
+    'gpt-4o-mini': {'requests_per_minute': 500, 'tokens_per_minute': 200000},
+    'gpt-4o': {'requests_per_minute': 500, 'tokens_per_minute': 30000},
+}
+
+# Retry policy shared by every LLM call: bounded attempts with decorrelated jitter
+LLM_RETRY_MAX_ATTEMPTS = 6
+LLM_RETRY_BASE_DELAY_SECONDS = 1
+LLM_RETRY_MAX_DELAY_SECONDS = 60
+# Per-provider circuit breaker: open after this many consecutive transient failures, probe again after the reset period
+LLM_BREAKER_FAILURE_THRESHOLD = 5
+LLM_BREAKER_RESET_SECONDS = 60
+
+# Shared HTTP connection pool used by every LLM client (HTTP/2 is used when the h2 package is installed)
+LLM_HTTP_MAX_CONNECTIONS = 50
+LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS = 120
+LLM_HTTP_TIMEOUT_SECONDS = 120
+LLM_HTTP_CONNECT_TIMEOUT_SECONDS = 10
+# Open connections to these endpoints at startup so the first tailoring call skips the handshake
+LLM_PREWARM_CLIENTS = True
+LLM_PREWARM_URLS = ['https://api.openai.com/v1']
+
+# Local classifier picking the resume section of textual form questions; the LLM is asked only below this confidence
+SECTION_CLASSIFIER_ENABLED = True
+SECTION_CLASSIFIER_CONFIDENCE_THRESHOLD = 0.55
+# Fraction of confidently classified questions also sent to the LLM to keep measuring the agreement rate
+SECTION_CLASSIFIER_AUDIT_RATE = 0.0
+
+# Prompt token budgets per template; job descriptions are compacted (whitespace, duplicate bullets, EEO/benefits boilerplate) to fit
+LLM_PROMPT_COMPACTION_ENABLED = True
+LLM_PROMPT_TOKEN_BUDGETS = {
+    'summarize_prompt_template': 3000,
+    'cover_letter_template': 3500,
+    'is_relavant_position_template': 6000,
+}
+
+# LLM spend ledger (USD) per job, per run and per day; past a soft limit calls use the fallback model,
+# past a hard limit tailoring stops with BudgetExceededError. None disables a limit.
+LLM_LEDGER_PATH = 'data_folder/output/llm_ledger.sqlite3'
+# Model name prefix -> cheaper model of the same provider used past a soft limit (longest prefix wins).
+# Models without an entry keep running past a soft limit, with a warning.
+LLM_BUDGET_FALLBACK_MODELS = {
+    'gpt-4o-mini': 'gpt-4.1-nano',
+    'gpt-4o': 'gpt-4o-mini',
+    'gpt-4.1-mini': 'gpt-4.1-nano',
+    'gpt-4.1': 'gpt-4.1-mini',
+    'gpt-4-turbo': 'gpt-4o-mini',
+    'gpt-3.5-turbo': 'gpt-4o-mini',
+    'o1': 'o3-mini',
+    'claude-3-5-sonnet': 'claude-3-5-haiku-latest',
+    'claude-3-7-sonnet': 'claude-3-5-haiku-latest',
+    'claude-3-opus': 'claude-3-5-haiku-latest',
+    'gemini-1.5-pro': 'gemini-1.5-flash',
+    'gemini-2.0-flash': 'gemini-1.5-flash',
+}
+LLM_BUDGET_SOFT_LIMITS = {'job': 0.25, 'run': 2.0, 'day': 5.0}
+LLM_BUDGET_HARD_LIMITS = {'job': 1.0, 'run': 5.0, 'day': 10.0}
+# Prices overriding or extending llm_costs.MODEL_PRICING: model prefix -> (input, cached input, output) USD per million tokens
+LLM_PRICING_OVERRIDES = {}
+# Share of the interactive price charged for requests run through the OpenAI Batch API
+LLM_BATCH_PRICE_FACTOR = 0.5
+
+# LLM call log (open_ai_calls.jsonl), written in batches by a background thread; rotated into gzip archives
+# past this size or age, keeping the newest LLM_CALL_LOG_BACKUP_COUNT archives
+LLM_CALL_LOG_MAX_BYTES = 20 * 1024 * 1024
+LLM_CALL_LOG_MAX_AGE_SECONDS = 24 * 60 * 60
+LLM_CALL_LOG_BACKUP_COUNT = 30
+LLM_CALL_LOG_FLUSH_INTERVAL_SECONDS = 1.0
+LLM_CALL_LOG_BATCH_SIZE = 100
+# Store prompt and reply bodies once, by content hash, in open_ai_calls.blobs.sqlite3; entries reference them
+LLM_CALL_LOG_BLOBS_ENABLED = True
+# Analytics index of the call log (python -m src.libs.llm_analytics), ingested incrementally
+LLM_ANALYTICS_PATH = 'data_folder/output/llm_analytics.sqlite3'
+
+# Span tracing of the tailoring pipeline and LLM calls, exported at exit as Chrome trace-event JSON (open in Perfetto)
+TRACE_ENABLED = False
+TRACE_OUTPUT_DIR = 'data_folder/output/traces'
+TRACE_MAX_EVENTS = 200000
+
+# Replay recorded replies from the call log instead of calling providers (offline, deterministic, free benchmarking);
+# prompts without an exact match get the reply of the most similar recorded prompt
+LLM_REPLAY_ENABLED = False
+LLM_REPLAY_LOG_DIR = 'data_folder/output'
+LLM_REPLAY_MIN_SIMILARITY = 0.3
+LLM_REPLAY_SEED = 0
+# Simulated provider latency: distribution none | fixed | uniform | lognormal | recorded, see llm_replay.LatencyModel
+LLM_REPLAY_LATENCY = {'distribution': 'lognormal', 'median_seconds': 1.0, 'sigma': 0.5, 'seconds_per_output_token': 0.0}
+
+# Hedged requests: a call still running after this percentile of the recent latency of its template is duplicated
+# and the first reply wins; at most LLM_HEDGE_BUDGET_RATIO extra requests per call (burst LLM_HEDGE_BUDGET_BURST)
+LLM_HEDGING_ENABLED = False
+LLM_HEDGE_PERCENTILE = 0.95
+LLM_HEDGE_MIN_SAMPLES = 20
+LLM_HEDGE_WINDOW = 200
+LLM_HEDGE_MIN_DELAY_SECONDS = 2.0
+LLM_HEDGE_BUDGET_RATIO = 0.05
+LLM_HEDGE_BUDGET_BURST = 2
+LLM_HEDGE_MAX_WORKERS = 32
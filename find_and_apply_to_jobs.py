@@ -42,7 +42,7 @@ import yaml
 import re
 from src.libs.resume_and_cover_builder import ResumeFacade, ResumeGenerator, StyleManager
 from src.resume_schemas.resume import Resume
-from src.logging import logger
+from src.logging import init_logging, logger
 from src.utils.chrome_utils import init_browser
 from src.utils.constants import (
     PLAIN_TEXT_RESUME_YAML,
@@ -50,6 +50,12 @@ from src.utils.constants import (
     WORK_PREFERENCES_YAML,
 )
 from src.job import Job, JobPreferences
+from src.libs.llm_clients import client_registry
+from src.libs.llm_costs import LedgerCallbackHandler, get_cost_ledger
+from src.libs.tracing import trace_span, traced
+import config as cfg
+
+init_logging()
 
 # CV = Path.cwd() / 'Resume - M. Reza Arrazi.pdf'
 # print(f"CV: {CV}")
@@ -252,6 +258,7 @@ class FileManager:
 @controller.action(
 	'Create tailored cover letter based on job descriptions', param_model=Job
 )
+@traced("create_cover_letter", "pipeline")
 def create_cover_letter(job: Job):
     """
     Logic to create a CV.
@@ -286,7 +293,8 @@ def create_cover_letter(job: Job):
                 logger.warning("No style selected. Proceeding with default style.")
         resume_generator = ResumeGenerator()
         resume_object = resume
-        driver = init_browser()
+        with trace_span("init_browser", "pipeline"):
+            driver = init_browser()
         resume_generator.set_resume_object(resume_object)
         resume_facade = ResumeFacade(            
             api_key=llm_api_key,
@@ -320,7 +328,7 @@ def create_cover_letter(job: Job):
         
         output_path = output_dir / "cover_letter_tailored.pdf"
         try:
-            with open(output_path, "wb") as file:
+            with trace_span("write_pdf", "pipeline"), open(output_path, "wb") as file:
                 file.write(pdf_data)
             print(f"\033[92mCover letter saved in: {output_path}\033[0m")
             logger.info(f"CV salvato in: {output_path}")
@@ -334,6 +342,7 @@ def create_cover_letter(job: Job):
 @controller.action(
 	'Create tailored CV based on job descriptions', param_model=Job
 	)
+@traced("create_resume_pdf_job_tailored", "pipeline")
 def create_resume_pdf_job_tailored(job: Job):
 	"""
 	Logic to create a CV.
@@ -368,7 +377,8 @@ def create_resume_pdf_job_tailored(job: Job):
 				logger.warning("No style selected. Proceeding with default style.")
 		resume_generator = ResumeGenerator()
 		resume_object = resume
-		driver = init_browser()
+		with trace_span("init_browser", "pipeline"):
+			driver = init_browser()
 		resume_generator.set_resume_object(resume_object)
 		resume_facade = ResumeFacade(            
 			api_key=llm_api_key,
@@ -402,7 +412,7 @@ def create_resume_pdf_job_tailored(job: Job):
 		
 		output_path = output_dir / "resume_tailored.pdf"
 		try:
-			with open(output_path, "wb") as file:
+			with trace_span("write_pdf", "pipeline"), open(output_path, "wb") as file:
 				file.write(pdf_data)
 			print(f"\033[92mResume saved in: {output_path}\033[0m")
 			logger.info(f"CV salvato in: {output_path}")
@@ -521,6 +531,9 @@ async def main():
 		global job_preferences
 		job_preferences = load_job_preferences_from_yaml(job_preferences_file)
 
+		if cfg.LLM_PREWARM_CLIENTS:
+			client_registry.prewarm()
+
 		# # Validate configuration and secrets
 		# config = ConfigValidator.validate_config(job_preferences_file)
 
@@ -564,6 +577,8 @@ async def main():
 			max_tokens=None,
 			timeout=None,
 			max_retries=2,
+			# The agent's spend goes to the same ledger and stops at the hard budget limits
+			callbacks=[LedgerCallbackHandler()],
 			# api_key="...",  # if you prefer to pass api key in directly instaed of using env vars
 			# base_url="...",
 			# organization="...",
@@ -576,6 +591,7 @@ async def main():
 			agents.append(agent)
 
 		await asyncio.gather(*[agent.run() for agent in agents])
+		logger.info(f"LLM spend: {get_cost_ledger().summary()}")
 
 		# # Interactive prompt for user to select actions
 		# selected_actions = prompt_user_action()
@@ -0,0 +1,175 @@
+"""
+Persistent embedding cache: vectors in a memory-mapped NumPy file, indexed by embedding model and chunk
+text hash in SQLite, with least-recently-used eviction.
+"""
+# app/libs/embedding_cache.py
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+import config as cfg
+
+
+def embedding_key(model: str, text: str) -> str:
+    """Hash of the model and the chunk text; whitespace-only differences share an entry."""
+    normalized = " ".join(text.split())
+    return hashlib.sha256(f"{model}\x00{normalized}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Fixed-capacity store of the embeddings of one model. Vectors live in a float32 memmap of
+    `capacity` rows, created on the first write once their dimension is known; the SQLite index maps
+    each key to its row and last use. When full, the least recently used row is overwritten.
+    """
+
+    def __init__(self, directory: Path, model: str, capacity: int):
+        """
+        Args:
+            directory (Path): Folder of the cache files.
+            model (str): The embedding model; each model gets its own files.
+            capacity (int): Maximum number of vectors kept.
+        """
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model)
+        self.directory = Path(directory)
+        self.model = model
+        self.capacity = capacity
+        self.vectors_path = self.directory / f"{slug}.f32"
+        self.index_path = self.directory / f"{slug}.sqlite3"
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._vectors: Optional[np.memmap] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.index_path), check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, slot INTEGER UNIQUE NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        return self._conn
+
+    def _open_vectors(self, dimension: Optional[int] = None) -> Optional[np.memmap]:
+        """Map the vector file, creating it with the given dimension on the first write."""
+        if self._vectors is None:
+            conn = self._connect()
+            row = conn.execute("SELECT value FROM meta WHERE name = 'dimension'").fetchone()
+            if row is not None and self.vectors_path.exists():
+                self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, row[0]))
+            elif dimension is not None:
+                self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="w+", shape=(self.capacity, dimension))
+                conn.execute("DELETE FROM entries")
+                conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('dimension', ?)", (dimension,))
+        return self._vectors
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """
+        Returns:
+            dict: Key -> vector for the keys found.
+        """
+        if not keys:
+            return {}
+        with self._lock:
+            vectors = self._open_vectors()
+            if vectors is None:
+                self.misses += len(keys)
+                return {}
+            conn = self._connect()
+            found: Dict[str, List[float]] = {}
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for key, slot in conn.execute(f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", batch):
+                    found[key] = vectors[slot].tolist()
+            if found:
+                now = time.time()
+                conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+            return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        """Store vectors, evicting the least recently used ones when the cache is full."""
+        if not items:
+            return
+        with self._lock:
+            vectors = self._open_vectors(len(next(iter(items.values()))))
+            conn = self._connect()
+            now = time.time()
+            used = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            free_slots = iter(range(used, self.capacity)) if used < self.capacity else iter(())
+            conn.execute("BEGIN")
+            try:
+                for key, vector in items.items():
+                    row = conn.execute("SELECT slot FROM entries WHERE key = ?", (key,)).fetchone()
+                    if row is not None:
+                        slot = row[0]
+                    else:
+                        slot = next(free_slots, None)
+                        if slot is None:
+                            slot = conn.execute("SELECT slot FROM entries ORDER BY last_used LIMIT 1").fetchone()[0]
+                            conn.execute("DELETE FROM entries WHERE slot = ?", (slot,))
+                    vectors[slot] = np.asarray(vector, dtype=np.float32)
+                    conn.execute("INSERT OR REPLACE INTO entries (key, slot, last_used) VALUES (?, ?, ?)", (key, slot, now))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            vectors.flush()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            return {"entries": entries, "capacity": self.capacity, "hits": self.hits, "misses": self.misses}
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings client answering from the EmbeddingCache and sending only the chunks never embedded
+    before to the wrapped client, in one batch.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [embedding_key(self.model, text) for text in texts]
+        found = self.cache.get_many(list(dict.fromkeys(keys)))
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing, vectors))
+            self.cache.put_many(computed)
+            found.update(computed)
+        logger.debug(f"Embedded {len(texts)} chunks, {len(missing)} sent to {self.model}")
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model: str) -> EmbeddingCache:
+    """Return the process-wide embedding cache of a model."""
+    with _caches_lock:
+        if model not in _caches:
+            _caches[model] = EmbeddingCache(Path(cfg.LLM_EMBEDDING_CACHE_DIR), model, cfg.LLM_EMBEDDING_CACHE_MAX_ENTRIES)
+        return _caches[model]
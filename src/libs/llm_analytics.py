@@ -0,0 +1,260 @@
+"""
+Queryable index of the LLM call history: call log entries ingested incrementally into SQLite, with
+per-template, per-model and per-job reports of latency percentiles, tokens and cost.
+
+Usage:
+    python -m src.libs.llm_analytics [--log-dir data_folder/output] [--by template model job] [--since 2025-01-01]
+"""
+# app/libs/llm_analytics.py
+import argparse
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+import config as cfg
+from src.libs.llm_call_log import call_log_sources, read_call_log_bytes, read_call_log_source
+
+GROUPS = ("template", "model", "job")
+PERCENTILES = (0.5, 0.9, 0.99)
+# Entries of the legacy pretty-printed log start with a line holding only "{", so it is identified by its head
+LEGACY_FINGERPRINT_BYTES = 4096
+
+
+def _fingerprint(source: Path, data: bytes) -> Optional[str]:
+    """
+    Identify a log file by its first entry, which stays the same when the file grows and when it is
+    rotated into an archive. None while the first line is still being written.
+    """
+    if source.suffix == ".json":
+        head = data[:LEGACY_FINGERPRINT_BYTES]
+    else:
+        end = data.find(b"\n")
+        if end < 0:
+            return None
+        head = data[:end]
+    return hashlib.sha256(head).hexdigest()
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """The q-quantile (nearest rank) of sorted values, None when there are none."""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class CallAnalytics:
+    """
+    SQLite index of the call log. Every log file is identified by the fingerprint of its first entry
+    and remembered with the byte offset ingested so far, so each ingestion only parses the entries
+    appended since the last one, including after the current log was rotated into an archive.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS calls (
+                    id INTEGER PRIMARY KEY,
+                    time TEXT,
+                    model TEXT,
+                    template TEXT,
+                    job TEXT,
+                    input_tokens INTEGER,
+                    output_tokens INTEGER,
+                    cached_input_tokens INTEGER,
+                    total_tokens INTEGER,
+                    cost REAL,
+                    latency_seconds REAL
+                )
+                """
+            )
+            for column in ("time",) + GROUPS:
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_calls_{column} ON calls({column})")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sources (fingerprint TEXT PRIMARY KEY, name TEXT NOT NULL, offset INTEGER NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sources_name ON sources(name)")
+        return self._conn
+
+    def ingest(self, directory: Path) -> int:
+        """
+        Load the entries of the call log of a folder not ingested yet. Archives are immutable, so the
+        ones already fully ingested are not even decompressed again.
+        Returns:
+            int: Number of new entries.
+        """
+        with self._lock:
+            conn = self._connect()
+            ingested = 0
+            for source in call_log_sources(directory):
+                if source.suffix == ".gz" and conn.execute("SELECT 1 FROM sources WHERE name = ?", (source.name,)).fetchone():
+                    continue
+                data = read_call_log_bytes(source)
+                fingerprint = _fingerprint(source, data)
+                if fingerprint is None:
+                    continue
+                row = conn.execute("SELECT offset FROM sources WHERE fingerprint = ?", (fingerprint,)).fetchone()
+                offset = row[0] if row else 0
+                if offset < len(data):
+                    entries, offset = read_call_log_source(source, offset, data)
+                else:
+                    entries = []
+                with conn:
+                    conn.executemany(
+                        """
+                        INSERT INTO calls (time, model, template, job, input_tokens, output_tokens,
+                                           cached_input_tokens, total_tokens, cost, latency_seconds)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        [
+                            (
+                                entry.get("time"),
+                                entry.get("model"),
+                                entry.get("template"),
+                                entry.get("job"),
+                                entry.get("input_tokens"),
+                                entry.get("output_tokens"),
+                                entry.get("cached_input_tokens"),
+                                entry.get("total_tokens"),
+                                entry.get("total_cost"),
+                                entry.get("latency_seconds"),
+                            )
+                            for entry in entries
+                        ],
+                    )
+                    conn.execute(
+                        "INSERT OR REPLACE INTO sources (fingerprint, name, offset) VALUES (?, ?, ?)",
+                        (fingerprint, source.name, offset),
+                    )
+                ingested += len(entries)
+            logger.debug(f"Ingested {ingested} new LLM calls from {directory}")
+            return ingested
+
+    def report(self, group_by: str, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Args:
+            group_by (str): template, model or job.
+            since (str): Only calls logged at or after this time, e.g. "2025-01-31".
+        Returns:
+            list: One row per group, most expensive first: calls, token totals and averages, cost, and
+            latency percentiles (None when no call of the group recorded its latency).
+        """
+        if group_by not in GROUPS:
+            raise ValueError(f"Unknown report grouping: {group_by}, expected one of {', '.join(GROUPS)}")
+        where, params = ("WHERE time >= ?", (since,)) if since else ("", ())
+        with self._lock:
+            conn = self._connect()
+            totals = conn.execute(
+                f"""
+                SELECT {group_by}, COUNT(*), SUM(input_tokens), SUM(output_tokens), SUM(cached_input_tokens),
+                       AVG(total_tokens), SUM(cost)
+                FROM calls {where} GROUP BY {group_by}
+                """,
+                params,
+            ).fetchall()
+            latencies: Dict[Any, List[float]] = {}
+            latency_filter = f"{where} AND" if where else "WHERE"
+            for key, seconds in conn.execute(
+                f"SELECT {group_by}, latency_seconds FROM calls {latency_filter} latency_seconds IS NOT NULL ORDER BY latency_seconds",
+                params,
+            ):
+                latencies.setdefault(key, []).append(seconds)
+        rows = []
+        for key, calls, input_tokens, output_tokens, cached_input_tokens, average_tokens, cost in totals:
+            row = {
+                group_by: key,
+                "calls": calls,
+                "input_tokens": input_tokens or 0,
+                "output_tokens": output_tokens or 0,
+                "cached_input_tokens": cached_input_tokens or 0,
+                "average_tokens": average_tokens or 0.0,
+                "cost": cost or 0.0,
+            }
+            for q in PERCENTILES:
+                row[f"p{round(q * 100)}_seconds"] = percentile(latencies.get(key, []), q)
+            rows.append(row)
+        return sorted(rows, key=lambda row: row["cost"], reverse=True)
+
+
+def format_report(group_by: str, rows: List[Dict[str, Any]]) -> str:
+    """Render a report as a fixed-width table with a total line."""
+    headers = [group_by, "calls", "in tok", "out tok", "cached", "avg tok", "cost $"] + [
+        f"p{round(q * 100)} s" for q in PERCENTILES
+    ]
+
+    def seconds(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.2f}"
+
+    lines = [
+        [
+            str(row[group_by] if row[group_by] is not None else "-"),
+            str(row["calls"]),
+            str(row["input_tokens"]),
+            str(row["output_tokens"]),
+            str(row["cached_input_tokens"]),
+            f"{row['average_tokens']:.0f}",
+            f"{row['cost']:.4f}",
+        ] + [seconds(row[f"p{round(q * 100)}_seconds"]) for q in PERCENTILES]
+        for row in rows
+    ]
+    lines.append(
+        [
+            "total",
+            str(sum(row["calls"] for row in rows)),
+            str(sum(row["input_tokens"] for row in rows)),
+            str(sum(row["output_tokens"] for row in rows)),
+            str(sum(row["cached_input_tokens"] for row in rows)),
+            "",
+            f"{sum(row['cost'] for row in rows):.4f}",
+        ] + [""] * len(PERCENTILES)
+    )
+    widths = [max(len(line[i]) for line in [headers] + lines) for i in range(len(headers))]
+
+    def render(line: List[str]) -> str:
+        return "  ".join(cell.ljust(width) if i == 0 else cell.rjust(width) for i, (cell, width) in enumerate(zip(line, widths)))
+
+    return "\n".join([render(headers), render(["-" * width for width in widths])] + [render(line) for line in lines])
+
+
+_analytics: Optional[CallAnalytics] = None
+_analytics_lock = threading.Lock()
+
+
+def get_call_analytics() -> CallAnalytics:
+    """Return the process-wide call analytics index at LLM_ANALYTICS_PATH."""
+    global _analytics
+    with _analytics_lock:
+        if _analytics is None:
+            _analytics = CallAnalytics(Path(cfg.LLM_ANALYTICS_PATH))
+        return _analytics
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Ingest the LLM call log and report latency, tokens and cost.")
+    parser.add_argument("--log-dir", default="data_folder/output", help="Folder of the call log")
+    parser.add_argument("--by", nargs="+", choices=GROUPS, default=list(GROUPS), help="Report groupings")
+    parser.add_argument("--since", help="Only calls logged at or after this time, e.g. 2025-01-31")
+    args = parser.parse_args(argv)
+
+    analytics = get_call_analytics()
+    ingested = analytics.ingest(Path(args.log_dir))
+    print(f"Ingested {ingested} new calls from {args.log_dir}")
+    for group_by in args.by:
+        print()
+        print(format_report(group_by, analytics.report(group_by, args.since)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Pool of LLM backends for AIAdapter: routes each request by rolling latency and error rate, fails over
+on errors and timeouts, and pins template families to specific backends.
+"""
+# app/libs/llm_backends.py
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+import config as cfg
+from src.libs.llm_context import current_annotations
+
+# Key of the reply's response_metadata naming the backend of the pool that served it
+BACKEND_METADATA = "llm_backend"
+
+
+class BackendStats:
+    """
+    Rolling (exponentially weighted) latency and error rate of a backend. The error rate also halves
+    every LLM_BACKEND_ERROR_HALF_LIFE_SECONDS without requests, so a failed backend is tried again later.
+    """
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.requests = 0
+        self.errors = 0
+        self.latency_seconds: Optional[float] = None
+        self.error_rate = 0.0
+        self._error_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _decayed_error_rate(self) -> float:
+        idle = time.monotonic() - self._error_time
+        return self.error_rate * 0.5 ** (idle / cfg.LLM_BACKEND_ERROR_HALF_LIFE_SECONDS)
+
+    def record_success(self, seconds: float) -> None:
+        with self._lock:
+            self.requests += 1
+            self.latency_seconds = seconds if self.latency_seconds is None else (
+                self.alpha * seconds + (1 - self.alpha) * self.latency_seconds
+            )
+            self.error_rate = self._decayed_error_rate() * (1 - self.alpha)
+            self._error_time = time.monotonic()
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self.errors += 1
+            self.error_rate = self.alpha + (1 - self.alpha) * self._decayed_error_rate()
+            self._error_time = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "latency_seconds": self.latency_seconds,
+                "error_rate": self._decayed_error_rate(),
+            }
+
+
+@dataclass
+class Backend:
+    """A model of the pool. Higher weights attract more traffic at equal latency."""
+
+    name: str
+    model: Any
+    weight: float = 1.0
+    timeout_seconds: Optional[float] = None
+    stats: BackendStats = field(default_factory=lambda: BackendStats(cfg.LLM_BACKEND_EWMA_ALPHA))
+
+    def score(self) -> float:
+        """
+        Expected cost of routing a request here, lower is better. Backends without history are assumed
+        to answer in LLM_BACKEND_DEFAULT_LATENCY_SECONDS, so they are tried once the others get slower.
+        """
+        snapshot = self.stats.snapshot()
+        latency = snapshot["latency_seconds"]
+        if latency is None:
+            latency = cfg.LLM_BACKEND_DEFAULT_LATENCY_SECONDS
+        return latency * (1 + cfg.LLM_BACKEND_ERROR_PENALTY * snapshot["error_rate"]) / self.weight + snapshot["error_rate"]
+
+
+class BackendPool:
+    """
+    Tries the backends of a request from the best scored to the worst, moving to the next one on an
+    error or a timeout. Requests annotated with a template pinned in LLM_BACKEND_PINS only use the
+    pinned backends. When they all fail the last error is raised, so the invocation core can still
+    classify it for retries.
+    """
+
+    def __init__(self, backends: List[Backend], pins: Optional[Dict[str, List[str]]] = None):
+        if not backends:
+            raise ValueError("A backend pool needs at least one backend")
+        self.backends = backends
+        self.pins = {template: [names] if isinstance(names, str) else list(names) for template, names in (pins or {}).items()}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self) -> Backend:
+        return self.backends[0]
+
+    def get(self, name: str) -> Optional[Backend]:
+        return next((backend for backend in self.backends if backend.name == name), None)
+
+    @staticmethod
+    def _stamp(reply: Any, backend: Backend) -> Any:
+        """Record on the reply which backend served it, so the caller can key its cache and limits on it."""
+        metadata = getattr(reply, "response_metadata", None)
+        if isinstance(metadata, dict):
+            metadata[BACKEND_METADATA] = backend.name
+        return reply
+
+    def _candidates(self) -> List[Backend]:
+        template = current_annotations().get("template")
+        backends = self.backends
+        if template is not None:
+            pinned = next((names for prefix, names in self.pins.items() if template.startswith(prefix)), None)
+            if pinned is not None:
+                backends = [backend for backend in self.backends if backend.name in pinned] or self.backends
+        return sorted(backends, key=lambda backend: backend.score())
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=cfg.LLM_BACKEND_MAX_WORKERS, thread_name_prefix="llm-backend")
+            return self._executor
+
+    def _call(self, backend: Backend, prompt: Any) -> Any:
+        if backend.timeout_seconds is None:
+            return backend.model.invoke(prompt)
+        future = self._get_executor().submit(contextvars.copy_context().run, backend.model.invoke, prompt)
+        try:
+            return future.result(timeout=backend.timeout_seconds)
+        except FutureTimeoutError:
+            raise TimeoutError(f"{backend.name} did not reply within {backend.timeout_seconds}s")
+
+    def invoke(self, prompt: Any) -> Any:
+        last_error = None
+        for backend in self._candidates():
+            started = time.monotonic()
+            try:
+                reply = self._call(backend, prompt)
+            except Exception as e:
+                backend.stats.record_failure()
+                logger.warning(f"LLM backend {backend.name} failed: {e!r}")
+                last_error = e
+                continue
+            backend.stats.record_success(time.monotonic() - started)
+            return self._stamp(reply, backend)
+        raise last_error
+
+    async def ainvoke(self, prompt: Any) -> Any:
+        last_error = None
+        for backend in self._candidates():
+            started = time.monotonic()
+            try:
+                reply = await asyncio.wait_for(backend.model.ainvoke(prompt), timeout=backend.timeout_seconds)
+            except Exception as e:
+                backend.stats.record_failure()
+                logger.warning(f"LLM backend {backend.name} failed: {e!r}")
+                last_error = e
+                continue
+            backend.stats.record_success(time.monotonic() - started)
+            return self._stamp(reply, backend)
+        raise last_error
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns:
+            dict: Backend name -> requests, errors, rolling latency and error rate, and current score.
+        """
+        return {backend.name: {**backend.stats.snapshot(), "score": backend.score()} for backend in self.backends}
+
+
+def served_backend(llm: Any, reply: Any) -> Optional[Backend]:
+    """
+    Return the backend of a pool-backed chat model (AIAdapter) that served a reply, None for other
+    chat models and for replies not stamped by a pool.
+    """
+    pool = getattr(llm, "pool", None)
+    name = (getattr(reply, "response_metadata", None) or {}).get(BACKEND_METADATA)
+    if not isinstance(pool, BackendPool) or name is None:
+        return None
+    return pool.get(name)
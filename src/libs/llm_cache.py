@@ -0,0 +1,253 @@
+"""
+Persistent, content-addressed cache for LLM replies shared by every LoggerChatModel.
+"""
+# app/libs/llm_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.prompt_values import PromptValue
+from loguru import logger
+
+import config as cfg
+
+
+def describe_llm(llm: Any) -> Tuple[str, str, Optional[float]]:
+    """
+    Resolve the provider, model name and temperature of a chat model.
+    Wrappers such as AIAdapter or the AIModel subclasses are unwrapped through
+    their `model` / `chatmodel` attributes until a LangChain chat model is found.
+    Args:
+        llm: The chat model or wrapper passed to a LoggerChatModel.
+    Returns:
+        tuple: (provider, model, temperature).
+    """
+    seen = set()
+    while id(llm) not in seen:
+        seen.add(id(llm))
+        inner = getattr(llm, "chatmodel", None) or getattr(llm, "model", None)
+        if inner is None or isinstance(inner, str):
+            break
+        llm = inner
+
+    provider = getattr(llm, "_llm_type", None) or type(llm).__name__
+    model = (
+        getattr(llm, "model_name", None)
+        or getattr(llm, "model", None)
+        or getattr(llm, "repo_id", None)
+        or ""
+    )
+    temperature = getattr(llm, "temperature", None)
+    return str(provider), str(model), temperature
+
+
+def render_messages(messages: Any) -> List[Dict[str, str]]:
+    """
+    Render the input of a chat model call into a list of role/content dicts.
+    Args:
+        messages: A PromptValue, a list of messages or a plain string.
+    Returns:
+        list: The rendered messages.
+    """
+    if isinstance(messages, PromptValue):
+        messages = messages.to_messages()
+    if isinstance(messages, str):
+        return [{"role": "human", "content": messages}]
+    rendered = []
+    for message in messages:
+        if isinstance(message, BaseMessage):
+            rendered.append({"role": message.type, "content": message.content})
+        elif isinstance(message, dict):
+            rendered.append({"role": message.get("role", ""), "content": message.get("content", "")})
+        else:
+            rendered.append({"role": "", "content": str(message)})
+    return rendered
+
+
+def make_cache_key(provider: str, model: str, temperature: Optional[float], messages: List[Dict[str, str]]) -> str:
+    """
+    Build the content address of a request.
+    Returns:
+        str: The hex SHA-256 digest of the canonical request.
+    """
+    payload = json.dumps(
+        {"provider": provider, "model": model, "temperature": temperature, "messages": messages},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def prompt_prefix_hash(messages: List[Dict[str, str]]) -> str:
+    """
+    Digest of the leading system messages of a request, i.e. the static prompt prefix that
+    providers can serve from their prompt cache. Identifies the prompt template in the call log.
+    Returns:
+        str: A short hex digest, or "" if the request has no system prefix.
+    """
+    prefix = []
+    for message in messages:
+        if message["role"] != "system":
+            break
+        prefix.append(message["content"])
+    if not prefix:
+        return ""
+    return hashlib.sha256("\n".join(prefix).encode("utf-8")).hexdigest()[:16]
+
+
+class LLMResponseCache:
+    """
+    SQLite-backed reply cache with TTL expiry and size-bounded LRU eviction.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        read_only: bool = False,
+        bypass: bool = False,
+    ):
+        """
+        Args:
+            path (Path): The SQLite database file.
+            ttl_seconds (float): Entries older than this are treated as misses. None disables expiry.
+            max_entries (int): Least recently used entries are evicted above this size. None disables eviction.
+            read_only (bool): Serve hits but never write new entries.
+            bypass (bool): Disable the cache entirely.
+        """
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.read_only = read_only
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    provider TEXT,
+                    model TEXT,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        return self._conn
+
+    def get(self, key: str) -> Optional[AIMessage]:
+        """
+        Look up a cached reply.
+        Args:
+            key (str): The request content address.
+        Returns:
+            AIMessage: The cached reply, or None on a miss.
+        """
+        if self.bypass:
+            return None
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT payload, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            payload, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                if not self.read_only:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            if not self.read_only:
+                conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return AIMessage(**json.loads(payload))
+
+    def put(self, key: str, reply: AIMessage, provider: str = "", model: str = "") -> None:
+        """
+        Store a reply and evict the least recently used entries above the size bound.
+        Args:
+            key (str): The request content address.
+            reply (AIMessage): The reply to store.
+        """
+        if self.bypass or self.read_only:
+            return
+        payload = json.dumps(
+            {
+                "content": reply.content,
+                "id": reply.id,
+                "response_metadata": {
+                    name: value for name, value in reply.response_metadata.items() if name != "headers"
+                },
+                "usage_metadata": reply.usage_metadata,
+            },
+            ensure_ascii=False,
+            default=str,
+        )
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, provider, model, payload, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, provider, model, payload, now, now),
+            )
+            if self.max_entries is not None:
+                conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def clear(self) -> None:
+        """Remove every cached entry."""
+        with self._lock:
+            self._connect().execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            dict: Hit, miss and entry counts.
+        """
+        with self._lock:
+            entries = self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """
+    Return the process-wide reply cache configured from config.py.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMResponseCache(
+                path=Path(cfg.LLM_CACHE_PATH),
+                ttl_seconds=cfg.LLM_CACHE_TTL_SECONDS,
+                max_entries=cfg.LLM_CACHE_MAX_ENTRIES,
+                read_only=cfg.LLM_CACHE_READ_ONLY,
+                bypass=not cfg.LLM_CACHE_ENABLED or cfg.LLM_CACHE_BYPASS,
+            )
+            logger.debug(f"LLM reply cache initialized at {_cache.path}")
+        return _cache
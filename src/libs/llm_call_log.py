@@ -0,0 +1,386 @@
+"""
+LLM call log: compact JSONL written by a background thread in batches, rotated by size and age into
+gzip archives, and read back (including archives and the legacy pretty-printed log) for replay and analysis.
+Prompt and reply bodies are stored once in a content-addressed blob store, entries only reference them.
+"""
+# app/libs/llm_call_log.py
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import queue
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from loguru import logger
+
+import config as cfg
+
+CALL_LOG_NAME = "open_ai_calls.jsonl"
+# Written by earlier versions: pretty-printed JSON objects one after the other
+LEGACY_CALL_LOG_NAME = "open_ai_calls.json"
+# Content-addressed store of the prompt and reply bodies, next to the log
+BLOB_STORE_NAME = "open_ai_calls.blobs.sqlite3"
+# Key of a body stored in the blob store: {"$blobs": [hash of each chunk, ...]}
+BLOB_REF = "$blobs"
+# Bodies are split after blank lines, so the static paragraphs of a template are stored once even when
+# the variable payload sits in the same message
+PARAGRAPH_BOUNDARY = re.compile(r"(?<=\n\n)")
+_CLOSE = object()
+
+
+def blob_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class BlobStore:
+    """Zlib-compressed text chunks in SQLite, keyed by the hash of their content; written once, never updated."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, body BLOB NOT NULL)")
+        return self._conn
+
+    def put_many(self, blobs: Dict[str, str]) -> None:
+        if not blobs:
+            return
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO blobs (hash, body) VALUES (?, ?)",
+                    [(key, zlib.compress(text.encode("utf-8"))) for key, text in blobs.items()],
+                )
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        found: Dict[str, str] = {}
+        with self._lock:
+            conn = self._connect()
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for key, body in conn.execute(f"SELECT hash, body FROM blobs WHERE hash IN ({placeholders})", batch):
+                    found[key] = zlib.decompress(body).decode("utf-8")
+        return found
+
+    def prune(self, keep: Set[str]) -> int:
+        """
+        Delete the chunks whose hash is not in `keep`.
+        Returns:
+            int: The number of chunks deleted.
+        """
+        with self._lock:
+            conn = self._connect()
+            unused = [(key,) for (key,) in conn.execute("SELECT hash FROM blobs") if key not in keep]
+            with conn:
+                conn.executemany("DELETE FROM blobs WHERE hash = ?", unused)
+        return len(unused)
+
+
+def pack_text(text: str, blobs: Dict[str, str]) -> Dict[str, List[str]]:
+    """Return the blob reference of a body, adding its chunks to `blobs`."""
+    keys = []
+    for chunk in PARAGRAPH_BOUNDARY.split(text):
+        key = blob_hash(chunk)
+        blobs[key] = chunk
+        keys.append(key)
+    return {BLOB_REF: keys}
+
+
+def pack_entry(entry: Dict[str, Any], blobs: Dict[str, str]) -> Dict[str, Any]:
+    """Replace the prompt and reply bodies of an entry by blob references, adding the chunks to `blobs`."""
+    packed = dict(entry)
+    prompts = entry.get("prompts")
+    if isinstance(prompts, str):
+        packed["prompts"] = pack_text(prompts, blobs)
+    elif isinstance(prompts, dict):
+        packed["prompts"] = {
+            name: pack_text(content, blobs) if isinstance(content, str) else content
+            for name, content in prompts.items()
+        }
+    if isinstance(entry.get("replies"), str):
+        packed["replies"] = pack_text(entry["replies"], blobs)
+    return packed
+
+
+def _is_ref(value: Any) -> bool:
+    return isinstance(value, dict) and list(value) == [BLOB_REF]
+
+
+def _entry_refs(entry: Dict[str, Any]) -> List[Dict[str, List[str]]]:
+    prompts = entry.get("prompts")
+    values = list(prompts.values()) if isinstance(prompts, dict) and not _is_ref(prompts) else [prompts]
+    return [value for value in values + [entry.get("replies")] if _is_ref(value)]
+
+
+def unpack_entry(entry: Dict[str, Any], store: BlobStore, cache: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Rebuild the prompt and reply bodies of an entry from the blob store, exactly as they were logged.
+    `cache` keeps the chunks already read, most of them being shared by many entries.
+    """
+    refs = _entry_refs(entry)
+    if not refs:
+        return entry
+    missing = list({key for ref in refs for key in ref[BLOB_REF] if key not in cache})
+    if missing:
+        cache.update(store.get_many(missing))
+
+    def unpack(value):
+        if not _is_ref(value):
+            return value
+        keys = value[BLOB_REF]
+        lost = [key for key in keys if key not in cache]
+        if lost:
+            logger.warning(f"{len(lost)} chunks of a call log entry are missing from {store.path}")
+            return value
+        return "".join(cache[key] for key in keys)
+
+    unpacked = dict(entry)
+    prompts = entry.get("prompts")
+    if isinstance(prompts, dict) and not _is_ref(prompts):
+        unpacked["prompts"] = {name: unpack(content) for name, content in prompts.items()}
+    else:
+        unpacked["prompts"] = unpack(prompts)
+    unpacked["replies"] = unpack(entry.get("replies"))
+    return unpacked
+
+
+class CallLogWriter:
+    """
+    Appends call log entries from a queue in a daemon thread, so logging never blocks an LLM call.
+    Entries are written as one JSON object per line, in batches of up to `batch_size` or every
+    `flush_interval` seconds. When the file exceeds `max_bytes` or is older than `max_age_seconds`
+    it is renamed with a timestamp and gzip-compressed; only the newest `backup_count` archives are kept.
+    With a blob store, the bodies are stored there before the entries referencing them are written, and
+    the chunks only referenced by deleted archives are swept from it.
+    """
+
+    def __init__(self, path: Path, max_bytes: int, max_age_seconds: float, backup_count: int,
+                 flush_interval: float = 1.0, batch_size: int = 100, blob_store: Optional[BlobStore] = None):
+        self.path = Path(path)
+        self.blob_store = blob_store
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="llm-call-log", daemon=True)
+        self._started_at: Optional[float] = None
+        self._closed = False
+        self._thread.start()
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        """Queue an entry; returns immediately."""
+        if self._closed:
+            logger.warning(f"Call log {self.path} is closed, entry dropped")
+            return
+        self._queue.put(entry)
+
+    def flush(self) -> None:
+        """Block until every queued entry has been written."""
+        self._queue.join()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Write the queued entries and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_CLOSE)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        running = True
+        while running:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            entries = [entry for entry in batch if entry is not _CLOSE]
+            running = len(entries) == len(batch)
+            try:
+                self._write_batch(entries)
+            except Exception as e:
+                logger.error(f"Error writing {len(entries)} entries to {self.path}: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, entries: List[Dict[str, Any]]) -> None:
+        if not entries:
+            return
+        self._rotate_if_needed()
+        if self.blob_store is not None:
+            blobs: Dict[str, str] = {}
+            entries = [pack_entry(entry, blobs) for entry in entries]
+            self.blob_store.put_many(blobs)
+        lines = "".join(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n" for entry in entries)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+        if self._started_at is None:
+            self._started_at = time.time()
+
+    def _rotate_if_needed(self) -> None:
+        if not self.path.exists():
+            self._started_at = None
+            return
+        if self._started_at is None:
+            self._started_at = self.path.stat().st_mtime
+        too_big = self.path.stat().st_size >= self.max_bytes
+        too_old = time.time() - self._started_at >= self.max_age_seconds
+        if not (too_big or too_old):
+            return
+        # Microseconds keep archives of rotations within the same second apart, and sort chronologically
+        rotated = self.path.with_name(f"{self.path.stem}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}{self.path.suffix}")
+        os.replace(self.path, rotated)
+        with open(rotated, "rb") as source, gzip.open(f"{rotated}.gz", "wb") as target:
+            shutil.copyfileobj(source, target)
+        rotated.unlink()
+        self._started_at = None
+        logger.debug(f"Rotated call log to {rotated}.gz")
+        expired = rotated_logs(self.path)[:-self.backup_count or None]
+        for old in expired:
+            old.unlink()
+        if expired and self.blob_store is not None:
+            self._sweep_blobs()
+
+    def _sweep_blobs(self) -> None:
+        """
+        Delete the blobs no longer referenced by the current log or the retained archives. Runs on the
+        writer thread, the only one adding blobs, before the batch being written stores its own.
+        """
+        sources = rotated_logs(self.path) + ([self.path] if self.path.exists() else [])
+        removed = self.blob_store.prune(referenced_blobs(sources))
+        logger.debug(f"Swept {removed} unreferenced chunks from {self.blob_store.path}")
+
+
+def rotated_logs(path: Path) -> List[Path]:
+    """Return the gzip archives of a call log, oldest first."""
+    path = Path(path)
+    return sorted(path.parent.glob(f"{path.stem}.*{path.suffix}.gz"))
+
+
+def _read_entries(text: str, source: Path) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """Parse JSON objects written one after the other, on one line each or pretty-printed, with their end position."""
+    decoder = json.JSONDecoder()
+    position = 0
+    while True:
+        while position < len(text) and text[position].isspace():
+            position += 1
+        if position >= len(text):
+            return
+        try:
+            entry, position = decoder.raw_decode(text, position)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Stopped reading {source} at offset {position}: {e}")
+            return
+        if isinstance(entry, dict):
+            yield entry, position
+
+
+def call_log_sources(directory: Path, include_archives: bool = True) -> List[Path]:
+    """Return the existing files of the call log of a folder, oldest first: the legacy log, the archives and the current log."""
+    directory = Path(directory)
+    current = directory / CALL_LOG_NAME
+    sources = [directory / LEGACY_CALL_LOG_NAME]
+    if include_archives:
+        sources += rotated_logs(current)
+    sources.append(current)
+    return [source for source in sources if source.exists()]
+
+
+def read_call_log_bytes(source: Path) -> bytes:
+    """Return the content of a call log file, decompressing archives."""
+    if source.suffix == ".gz":
+        with gzip.open(source, "rb") as f:
+            return f.read()
+    return Path(source).read_bytes()
+
+
+def read_call_log_source(source: Path, offset: int = 0, data: Optional[bytes] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Parse the entries of one call log file from a byte offset, for readers resuming where they stopped.
+    Args:
+        source (Path): The log file.
+        offset (int): Byte offset (in the decompressed content) of the first entry to read.
+        data (bytes): The content of the file when it was already read.
+    Returns:
+        tuple: (entries, byte offset after the last complete entry).
+    """
+    if data is None:
+        data = read_call_log_bytes(source)
+    text = data[offset:].decode("utf-8", errors="replace")
+    entries, end = [], 0
+    for entry, end in _read_entries(text, source):
+        entries.append(entry)
+    return entries, offset + len(text[:end].encode("utf-8"))
+
+
+def referenced_blobs(sources: List[Path]) -> Set[str]:
+    """Return the hashes of the chunks referenced by the entries of call log files."""
+    keys: Set[str] = set()
+    for source in sources:
+        entries, _ = read_call_log_source(source)
+        for entry in entries:
+            for ref in _entry_refs(entry):
+                keys.update(ref[BLOB_REF])
+    return keys
+
+
+def iter_call_log(directory: Path, include_archives: bool = True, resolve_blobs: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the entries of the call log of a folder, oldest first: the legacy log, the archives and the current log.
+    With resolve_blobs, bodies stored in the blob store are rebuilt; otherwise entries keep their blob references.
+    """
+    blob_store_path = Path(directory) / BLOB_STORE_NAME
+    store = BlobStore(blob_store_path) if resolve_blobs and blob_store_path.exists() else None
+    chunks: Dict[str, str] = {}
+    for source in call_log_sources(directory, include_archives):
+        entries, _ = read_call_log_source(source)
+        for entry in entries:
+            yield unpack_entry(entry, store, chunks) if store is not None else entry
+
+
+_writers: Dict[Path, CallLogWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_call_log_writer(directory: Path) -> CallLogWriter:
+    """Return the writer of the call log of a folder, started on first use and flushed at exit."""
+    path = Path(directory) / CALL_LOG_NAME
+    with _writers_lock:
+        if path not in _writers:
+            writer = CallLogWriter(
+                path,
+                max_bytes=cfg.LLM_CALL_LOG_MAX_BYTES,
+                max_age_seconds=cfg.LLM_CALL_LOG_MAX_AGE_SECONDS,
+                backup_count=cfg.LLM_CALL_LOG_BACKUP_COUNT,
+                flush_interval=cfg.LLM_CALL_LOG_FLUSH_INTERVAL_SECONDS,
+                batch_size=cfg.LLM_CALL_LOG_BATCH_SIZE,
+                blob_store=BlobStore(Path(directory) / BLOB_STORE_NAME) if cfg.LLM_CALL_LOG_BLOBS_ENABLED else None,
+            )
+            atexit.register(writer.close)
+            _writers[path] = writer
+        return _writers[path]
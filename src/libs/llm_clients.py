@@ -0,0 +1,196 @@
+"""
+Registry of long-lived LLM clients sharing one tuned, keep-alive HTTP connection pool.
+"""
+# app/libs/llm_clients.py
+import hashlib
+import importlib.util
+import json
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+from loguru import logger
+
+import config as cfg
+from src.utils.constants import OPENAI, REPLAY
+
+DEFAULT_EMBEDDINGS_MODEL = "text-embedding-ada-002"
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def _create_openai_chat(model: str, api_key: Optional[str], http_client: httpx.Client,
+                        http_async_client: httpx.AsyncClient, **params: Any):
+    from langchain_openai import ChatOpenAI
+
+    # Report token usage on streamed replies too, so streamed calls are logged like regular ones
+    params.setdefault("stream_usage", True)
+    return ChatOpenAI(
+        model_name=model,
+        openai_api_key=api_key,
+        http_client=http_client,
+        http_async_client=http_async_client,
+        include_response_headers=True,
+        **params,
+    )
+
+
+def _create_replay_chat(model: str, api_key: Optional[str], http_client: httpx.Client,
+                        http_async_client: httpx.AsyncClient, **params: Any):
+    from src.libs.llm_replay import ReplayChatModel
+
+    return ReplayChatModel(model_name=model, temperature=params.get("temperature"), seed=cfg.LLM_REPLAY_SEED)
+
+
+class LLMClientRegistry:
+    """
+    Hands out thread-safe chat model and embeddings clients keyed by provider, model and parameters.
+    Every client is built once per process and reuses the same HTTP connection pool, so documents
+    made of many short LLM calls do not pay for client construction and TLS handshakes each time.
+    """
+
+    def __init__(self):
+        self._chat_factories: Dict[str, Callable[..., Any]] = {OPENAI: _create_openai_chat, REPLAY: _create_replay_chat}
+        self._clients: Dict[Tuple, Any] = {}
+        self._lock = threading.Lock()
+        self._http_client: Optional[httpx.Client] = None
+        self._http_async_client: Optional[httpx.AsyncClient] = None
+
+    def register_chat_factory(self, provider: str, factory: Callable[..., Any]) -> None:
+        """
+        Register how chat clients of a provider are built.
+        Args:
+            provider (str): The provider name used in get_chat_model.
+            factory (Callable): Called as factory(model, api_key, http_client, http_async_client, **params).
+        """
+        with self._lock:
+            self._chat_factories[provider] = factory
+
+    def _http_settings(self) -> Dict[str, Any]:
+        return {
+            "http2": _http2_available(),
+            "limits": httpx.Limits(
+                max_connections=cfg.LLM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=cfg.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=cfg.LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+            "timeout": httpx.Timeout(cfg.LLM_HTTP_TIMEOUT_SECONDS, connect=cfg.LLM_HTTP_CONNECT_TIMEOUT_SECONDS),
+        }
+
+    def http_clients(self) -> Tuple[httpx.Client, httpx.AsyncClient]:
+        """
+        Returns:
+            tuple: The shared sync and async httpx clients.
+        """
+        with self._lock:
+            if self._http_client is None:
+                settings = self._http_settings()
+                self._http_client = httpx.Client(**settings)
+                self._http_async_client = httpx.AsyncClient(**settings)
+                logger.debug(f"Shared LLM HTTP pool created (http2={settings['http2']})")
+            return self._http_client, self._http_async_client
+
+    @staticmethod
+    def _key(kind: str, provider: str, model: str, api_key: Optional[str], params: Dict[str, Any]) -> Tuple:
+        key_digest = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+        return kind, provider, model, key_digest, json.dumps(params, sort_keys=True, default=str)
+
+    def get_chat_model(self, provider: str, model: str, api_key: Optional[str] = None, **params: Any):
+        """
+        Return the shared chat client for a provider, model and parameter set.
+        Args:
+            provider (str): The provider name, e.g. "openai".
+            model (str): The model name.
+            api_key (str): The provider API key.
+            **params: Extra client parameters such as temperature.
+        Returns:
+            BaseChatModel: The long-lived client.
+        """
+        if cfg.LLM_REPLAY_ENABLED:
+            provider = REPLAY
+        key = self._key("chat", provider, model, api_key, params)
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        http_client, http_async_client = self.http_clients()
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                factory = self._chat_factories.get(provider)
+                if factory is None:
+                    raise ValueError(f"Unsupported model type: {provider}")
+                client = factory(model, api_key, http_client, http_async_client, **params)
+                self._clients[key] = client
+                logger.debug(f"Created shared {provider} client for {model}")
+            return client
+
+    def get_embeddings(self, api_key: Optional[str] = None, model: str = DEFAULT_EMBEDDINGS_MODEL):
+        """
+        Return the shared OpenAI embeddings client for a model, behind the persistent embedding cache
+        when LLM_EMBEDDING_CACHE_ENABLED is set.
+        """
+        key = self._key("embeddings", OPENAI, model, api_key, {})
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        http_client, http_async_client = self.http_clients()
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                from langchain_openai import OpenAIEmbeddings
+
+                client = OpenAIEmbeddings(
+                    model=model,
+                    openai_api_key=api_key,
+                    http_client=http_client,
+                    http_async_client=http_async_client,
+                )
+                if cfg.LLM_EMBEDDING_CACHE_ENABLED:
+                    from src.libs.embedding_cache import CachedEmbeddings, get_embedding_cache
+
+                    client = CachedEmbeddings(client, model, get_embedding_cache(model))
+                self._clients[key] = client
+            return client
+
+    def prewarm(self, urls=None, background: bool = True) -> Optional[threading.Thread]:
+        """
+        Open keep-alive connections to the LLM endpoints ahead of the first real request.
+        Args:
+            urls (list): Base URLs to connect to. Defaults to LLM_PREWARM_URLS.
+            background (bool): Run in a daemon thread instead of blocking the caller.
+        Returns:
+            threading.Thread: The warm-up thread when run in the background.
+        """
+        urls = list(urls or cfg.LLM_PREWARM_URLS)
+
+        def warm():
+            http_client, _ = self.http_clients()
+            for url in urls:
+                try:
+                    # Any response will do: the point is the TCP/TLS handshake kept alive in the pool
+                    http_client.head(url)
+                    logger.debug(f"Pre-warmed connection to {url}")
+                except httpx.HTTPError as e:
+                    logger.warning(f"Could not pre-warm connection to {url}: {e}")
+
+        if not background:
+            warm()
+            return None
+        thread = threading.Thread(target=warm, name="llm-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+
+client_registry = LLMClientRegistry()
+
+
+def get_chat_model(provider: str, model: str, api_key: Optional[str] = None, **params: Any):
+    """Shortcut for client_registry.get_chat_model."""
+    return client_registry.get_chat_model(provider, model, api_key, **params)
+
+
+def get_embeddings(api_key: Optional[str] = None, model: str = DEFAULT_EMBEDDINGS_MODEL):
+    """Shortcut for client_registry.get_embeddings."""
+    return client_registry.get_embeddings(api_key, model)
@@ -0,0 +1,30 @@
+"""
+Per-call annotations attached to the LLM call log, carried through context variables.
+"""
+# app/libs/llm_context.py
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+_annotations: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("llm_call_annotations", default={})
+
+
+@contextmanager
+def llm_call_annotations(**annotations: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Attach annotations to every LLM call made inside the block; they are merged into the
+    call log entries. Nested blocks add to (and may override) the outer annotations.
+    Worker threads do not inherit them: submit work with contextvars.copy_context().run
+    to carry them over.
+    """
+    merged = {**_annotations.get(), **annotations}
+    token = _annotations.set(merged)
+    try:
+        yield merged
+    finally:
+        _annotations.reset(token)
+
+
+def current_annotations() -> Dict[str, Any]:
+    """Return the annotations of the calls made in the current context."""
+    return dict(_annotations.get())
@@ -0,0 +1,293 @@
+"""
+Model pricing table and persistent LLM spend ledger with soft and hard budget limits.
+"""
+# app/libs/llm_costs.py
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from loguru import logger
+
+import config as cfg
+
+# USD per million tokens: (input, cached input, output). Model names are matched by longest prefix,
+# so dated snapshots such as gpt-4o-2024-08-06 use their family price.
+MODEL_PRICING: Dict[str, Tuple[float, float, float]] = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4-turbo": (10.00, 10.00, 30.00),
+    "gpt-3.5-turbo": (0.50, 0.50, 1.50),
+    "o1-mini": (1.10, 0.55, 4.40),
+    "o1": (15.00, 7.50, 60.00),
+    "o3-mini": (1.10, 0.55, 4.40),
+    "claude-3-5-haiku": (0.80, 0.08, 4.00),
+    "claude-3-5-sonnet": (3.00, 0.30, 15.00),
+    "claude-3-7-sonnet": (3.00, 0.30, 15.00),
+    "claude-3-haiku": (0.25, 0.03, 1.25),
+    "claude-3-opus": (15.00, 1.50, 75.00),
+    "gemini-1.5-flash": (0.075, 0.01875, 0.30),
+    "gemini-1.5-pro": (1.25, 0.3125, 5.00),
+    "gemini-2.0-flash": (0.10, 0.025, 0.40),
+    "llama-3.1-sonar-small": (0.20, 0.20, 0.20),
+    "llama-3.1-sonar-large": (1.00, 1.00, 1.00),
+    "sonar": (1.00, 1.00, 1.00),
+}
+# Budget scopes, from the narrowest to the widest
+SCOPES = ("job", "run", "day")
+
+
+class BudgetExceededError(Exception):
+    """Raised instead of calling the provider once a hard spend limit is reached."""
+
+
+def model_price(model: str) -> Optional[Tuple[float, float, float]]:
+    """
+    Returns:
+        tuple: (input, cached input, output) USD per million tokens, or None for unknown models
+        (local models such as Ollama are free).
+    """
+    pricing = {**MODEL_PRICING, **cfg.LLM_PRICING_OVERRIDES}
+    name = (model or "").lower().split("/")[-1]
+    matches = [prefix for prefix in pricing if name.startswith(prefix)]
+    if not matches:
+        return None
+    return pricing[max(matches, key=len)]
+
+
+def cost_of(model: str, input_tokens: int, output_tokens: int, cached_input_tokens: int = 0) -> float:
+    """
+    Compute the USD cost of a call from its token counts.
+    """
+    price = model_price(model)
+    if price is None:
+        return 0.0
+    input_price, cached_price, output_price = price
+    return (
+        (input_tokens - cached_input_tokens) * input_price
+        + cached_input_tokens * cached_price
+        + output_tokens * output_price
+    ) / 1_000_000
+
+
+class CostLedger:
+    """
+    Records the cost of every LLM call in SQLite and keeps running totals per run, per job and
+    per day. A soft limit makes check() ask for the fallback model, a hard limit stops new calls.
+    """
+
+    def __init__(self, path: Path, soft_limits: Dict[str, float], hard_limits: Dict[str, float],
+                 fallback_models: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            path (Path): The SQLite database file.
+            soft_limits (dict): Scope ("job", "run", "day") -> USD; above it calls use the fallback model.
+            hard_limits (dict): Scope -> USD; above it calls raise BudgetExceededError.
+            fallback_models (dict): Model name prefix -> the cheaper model of the same provider used
+                past a soft limit.
+        """
+        self.path = Path(path)
+        self.soft_limits = {scope: limit for scope, limit in soft_limits.items() if limit is not None}
+        self.hard_limits = {scope: limit for scope, limit in hard_limits.items() if limit is not None}
+        self.fallback_models = dict(fallback_models or {})
+        self._warned_models = set()
+        self.run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self._lock = threading.Lock()
+        self._conn = None
+        self._day = None
+        self._day_total = 0.0
+        self._run_total = 0.0
+        self._job_totals: Dict[str, float] = defaultdict(float)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS spend (
+                    ts REAL NOT NULL,
+                    day TEXT NOT NULL,
+                    run_id TEXT NOT NULL,
+                    job TEXT,
+                    model TEXT,
+                    template TEXT,
+                    input_tokens INTEGER,
+                    output_tokens INTEGER,
+                    cached_input_tokens INTEGER,
+                    cost REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_spend_day ON spend(day)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_spend_job ON spend(job)")
+        return self._conn
+
+    def _roll_day(self) -> None:
+        today = date.today().isoformat()
+        if self._day != today:
+            self._day = today
+            row = self._connect().execute("SELECT COALESCE(SUM(cost), 0) FROM spend WHERE day = ?", (today,)).fetchone()
+            self._day_total = row[0]
+
+    def _totals(self, job: Optional[str]) -> Dict[str, float]:
+        self._roll_day()
+        totals = {"run": self._run_total, "day": self._day_total}
+        if job is not None:
+            totals["job"] = self._job_totals[job]
+        return totals
+
+    def record(self, model: str, input_tokens: int, output_tokens: int, cached_input_tokens: int = 0,
+               job: Optional[str] = None, template: Optional[str] = None, price_factor: float = 1.0) -> float:
+        """
+        Add a call to the ledger.
+        Args:
+            price_factor (float): Share of the listed price actually charged, e.g. for batch requests.
+        Returns:
+            float: The USD cost of the call.
+        """
+        cost = cost_of(model, input_tokens, output_tokens, cached_input_tokens) * price_factor
+        with self._lock:
+            self._roll_day()
+            self._connect().execute(
+                "INSERT INTO spend (ts, day, run_id, job, model, template, input_tokens, output_tokens, "
+                "cached_input_tokens, cost) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), self._day, self.run_id, job, model, template, input_tokens, output_tokens,
+                 cached_input_tokens, cost),
+            )
+            self._run_total += cost
+            self._day_total += cost
+            if job is not None:
+                self._job_totals[job] += cost
+        return cost
+
+    def fallback_for(self, model: Optional[str]) -> Optional[str]:
+        """
+        Returns:
+            str: The fallback of a model, matched by longest prefix like the prices, or None when it has
+            none (a warning is logged once per model, its calls then go on past the soft limit).
+        """
+        name = (model or "").lower().split("/")[-1]
+        matches = [prefix for prefix in self.fallback_models if name.startswith(prefix)]
+        fallback = self.fallback_models[max(matches, key=len)] if matches else None
+        if (fallback is None or fallback == model) and model not in self._warned_models:
+            self._warned_models.add(model)
+            logger.warning(f"Soft LLM budget reached but no cheaper fallback is configured for {model}, keeping it")
+        return fallback if fallback != model else None
+
+    def check(self, job: Optional[str] = None, model: Optional[str] = None) -> Optional[str]:
+        """
+        Compare the current spend with the limits before a call.
+        Args:
+            job (str): The job the call is made for.
+            model (str): The model about to be called, to pick its fallback past a soft limit.
+        Returns:
+            str: None when within budget, or the fallback model to use past a soft limit (None too
+            when the model has no fallback).
+        Raises:
+            BudgetExceededError: When a hard limit is reached.
+        """
+        with self._lock:
+            totals = self._totals(job)
+        for scope in SCOPES:
+            limit = self.hard_limits.get(scope)
+            if limit is not None and scope in totals and totals[scope] >= limit:
+                raise BudgetExceededError(
+                    f"LLM spend for this {scope} reached ${totals[scope]:.4f}, hard limit ${limit:.2f}; pausing LLM calls"
+                )
+        for scope in SCOPES:
+            limit = self.soft_limits.get(scope)
+            if limit is not None and scope in totals and totals[scope] >= limit:
+                return self.fallback_for(model) if model is not None else None
+        return None
+
+    def job_usage(self, job: str) -> Dict[str, Any]:
+        """
+        Returns:
+            dict: Calls, token totals and cost recorded for a job during this run.
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(input_tokens), 0), COALESCE(SUM(output_tokens), 0), "
+                "COALESCE(SUM(cached_input_tokens), 0), COALESCE(SUM(cost), 0) FROM spend WHERE run_id = ? AND job = ?",
+                (self.run_id, job),
+            ).fetchone()
+        calls, input_tokens, output_tokens, cached_input_tokens, cost = row
+        return {
+            "calls": calls,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cached_input_tokens": cached_input_tokens,
+            "cost": cost,
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Returns:
+            dict: Spend of this run, of today and per job of this run.
+        """
+        with self._lock:
+            totals = self._totals(None)
+            return {"run_id": self.run_id, "run": totals["run"], "day": totals["day"], "jobs": dict(self._job_totals)}
+
+
+class LedgerCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback recording the spend of chat models that do not go through LoggerChatModel,
+    such as the browser agent's model, and stopping them at the hard limits.
+    """
+
+    raise_error = True
+
+    def __init__(self, job: Optional[str] = None, template: Optional[str] = "agent"):
+        self.job = job
+        self.template = template
+
+    def on_chat_model_start(self, serialized, messages, **kwargs: Any) -> None:
+        get_cost_ledger().check(self.job)
+
+    def on_llm_end(self, response, **kwargs: Any) -> None:
+        llm_output = response.llm_output or {}
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or {}
+                if not usage:
+                    continue
+                model = (getattr(message, "response_metadata", {}) or {}).get("model_name") or llm_output.get("model_name", "")
+                get_cost_ledger().record(
+                    model,
+                    usage.get("input_tokens", 0),
+                    usage.get("output_tokens", 0),
+                    (usage.get("input_token_details") or {}).get("cache_read", 0),
+                    job=self.job,
+                    template=self.template,
+                )
+
+
+_ledger: Optional[CostLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_cost_ledger() -> CostLedger:
+    """Return the process-wide spend ledger configured from config.py."""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = CostLedger(
+                path=Path(cfg.LLM_LEDGER_PATH),
+                soft_limits=cfg.LLM_BUDGET_SOFT_LIMITS,
+                hard_limits=cfg.LLM_BUDGET_HARD_LIMITS,
+                fallback_models=cfg.LLM_BUDGET_FALLBACK_MODELS,
+            )
+            logger.debug(f"LLM cost ledger opened at {_ledger.path} for run {_ledger.run_id}")
+        return _ledger
@@ -0,0 +1,377 @@
+"""
+Request hedging for LLM calls: a call still running after a high percentile of the recent latency of
+its template gets a duplicate, and the first reply wins. A hedge budget caps the extra requests.
+"""
+# app/libs/llm_hedging.py
+import asyncio
+import contextvars
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterator, List, Optional
+
+from loguru import logger
+
+import config as cfg
+
+_END = object()
+
+
+class LatencyTracker:
+    """Sliding window of recent latencies per key (model and template)."""
+
+    def __init__(self, window: int):
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def observe(self, key: str, seconds: float) -> None:
+        with self._lock:
+            self._samples[key].append(seconds)
+
+    def percentile(self, key: str, q: float, min_samples: int) -> Optional[float]:
+        """
+        Returns:
+            float: The q-quantile of the recent latencies of the key, None with fewer than min_samples.
+        """
+        with self._lock:
+            samples = sorted(self._samples[key])
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class HedgeBudget:
+    """
+    Every call earns `ratio` hedge tokens, up to `burst`, and every hedge spends one, so hedges never
+    exceed that fraction of the calls however slow the provider gets.
+    """
+
+    def __init__(self, ratio: float, burst: float):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def on_call(self) -> None:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class HedgeStats:
+    """Counts calls, hedges sent and hedges that replied first."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def incr(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {"calls": self.calls, "hedges": self.hedges, "hedge_wins": self.hedge_wins}
+
+
+class Hedger:
+    """
+    Runs an LLM call and, when it is slower than the LLM_HEDGE_PERCENTILE of recent calls with the same
+    key and the budget allows it, a duplicate of it. Blocking calls run in a shared worker pool,
+    async calls as tasks, streams race on their first chunk. The latency observed is always the
+    primary request's own, measured from when it starts running, so hedges do not skew the delay.
+    """
+
+    def __init__(self):
+        self.tracker = LatencyTracker(cfg.LLM_HEDGE_WINDOW)
+        self.budget = HedgeBudget(cfg.LLM_HEDGE_BUDGET_RATIO, cfg.LLM_HEDGE_BUDGET_BURST)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=cfg.LLM_HEDGE_MAX_WORKERS, thread_name_prefix="llm-hedge")
+            return self._executor
+
+    def _submit(self, fn: Callable[[], Any]) -> Future:
+        return self._get_executor().submit(contextvars.copy_context().run, fn)
+
+    def delay(self, key: str) -> Optional[float]:
+        """
+        Returns:
+            float: Seconds after which the call is hedged, None when hedging is off or there is no history yet.
+        """
+        if not cfg.LLM_HEDGING_ENABLED:
+            return None
+        threshold = self.tracker.percentile(key, cfg.LLM_HEDGE_PERCENTILE, cfg.LLM_HEDGE_MIN_SAMPLES)
+        if threshold is None:
+            return None
+        return max(threshold, cfg.LLM_HEDGE_MIN_DELAY_SECONDS)
+
+    def _start(self, key: str) -> Optional[float]:
+        hedge_stats.incr("calls")
+        if cfg.LLM_HEDGING_ENABLED:
+            self.budget.on_call()
+        return self.delay(key)
+
+    def _race(self, futures: List[Future], on_discarded: Optional[Callable[[Any], None]]) -> Any:
+        """Return the first successful result of the futures, or raise the last error if they all fail."""
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is futures[-1]:
+                        hedge_stats.incr("hedge_wins")
+                    if on_discarded is not None:
+                        for other in pending:
+                            other.add_done_callback(lambda f: f.exception() is None and on_discarded(f.result()))
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    @staticmethod
+    async def _arace(tasks: List[asyncio.Future]) -> asyncio.Future:
+        """Return the first task to succeed, or raise the last error if they all fail."""
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if len(tasks) > 1 and task is tasks[-1]:
+                        hedge_stats.incr("hedge_wins")
+                    return task
+                error = task.exception()
+        raise error
+
+    @staticmethod
+    async def _arace_and_settle(tasks: List[asyncio.Future], on_discarded: Optional[Callable[[Any], None]]) -> Any:
+        """
+        Race the tasks. A losing hedge is cancelled, a losing primary keeps running so its own latency
+        is still observed; a loser that replies anyway is handed to on_discarded.
+        """
+        winner = None
+        try:
+            winner = await Hedger._arace(tasks)
+            return winner.result()
+        finally:
+            for task in tasks:
+                if task is winner:
+                    continue
+                if winner is None or task is not tasks[0]:
+                    task.cancel()
+                task.add_done_callback(_settle_loser(on_discarded))
+
+    def _observer(self, key: str, key_of: Optional[Callable[[Any], str]]) -> Callable[[Any, float], None]:
+        """Record a latency of the primary request under the key of whatever served its reply."""
+        return lambda result, seconds: self.tracker.observe(key_of(result) if key_of else key, seconds)
+
+    def _first_chunk_observer(self, key: str, key_of: Optional[Callable[[Any], str]]) -> Callable[[Any, float], None]:
+        """Record the time to first chunk of an opened (stream, head) pair under the key of whatever served it."""
+        def observe(opened, seconds: float) -> None:
+            head = opened[1]
+            served_key = key_of(head) if key_of and head is not _END else key
+            self.tracker.observe(f"{served_key}#first_chunk", seconds)
+
+        return observe
+
+    @staticmethod
+    def _timed(fn: Callable[[], Any], observe: Callable[[Any, float], None],
+               started: Optional["_Started"] = None) -> Callable[[], Any]:
+        """
+        Wrap the primary request so its own latency is observed, from the moment it starts running to
+        its reply, whether it wins the race or not: observing the winner would bias the percentile down.
+        """
+        def timed():
+            begin = time.monotonic()
+            if started is not None:
+                started.mark(begin)
+            result = fn()
+            observe(result, time.monotonic() - begin)
+            return result
+
+        return timed
+
+    @staticmethod
+    def _atimed(fn: Callable[[], Awaitable[Any]], observe: Callable[[Any, float], None]) -> Callable[[], Awaitable[Any]]:
+        """Async counterpart of _timed."""
+        async def timed():
+            begin = time.monotonic()
+            result = await fn()
+            observe(result, time.monotonic() - begin)
+            return result
+
+        return timed
+
+    def run(self, key: str, primary: Callable[[], Any], hedge: Callable[[], Any],
+            on_discarded: Optional[Callable[[Any], None]] = None,
+            key_of: Optional[Callable[[Any], str]] = None) -> Any:
+        """
+        Args:
+            key (str): The latency key, e.g. model and template.
+            primary (Callable): Makes the call.
+            hedge (Callable): Makes the duplicate call (acquiring its own rate limit tokens).
+            on_discarded (Callable): Receives the reply that lost the race once it arrives.
+            key_of (Callable): The latency key of a reply, when it depends on what served it (backend pools).
+        Returns:
+            The first reply.
+        """
+        delay = self._start(key)
+        observe = self._observer(key, key_of)
+        if delay is None:
+            return self._timed(primary, observe)()
+        started = _Started()
+        first = self._submit(self._timed(primary, observe, started))
+        try:
+            return first.result(timeout=started.remaining(delay))
+        except FutureTimeoutError:
+            if not self.budget.try_spend():
+                return first.result()
+            hedge_stats.incr("hedges")
+            logger.debug(f"LLM call {key} slower than {delay:.1f}s, sending a hedged request")
+            return self._race([first, self._submit(hedge)], on_discarded)
+
+    async def arun(self, key: str, primary: Callable[[], Awaitable[Any]], hedge: Callable[[], Awaitable[Any]],
+                   on_discarded: Optional[Callable[[Any], None]] = None,
+                   key_of: Optional[Callable[[Any], str]] = None) -> Any:
+        """Async counterpart of run; a losing hedge is cancelled, a losing primary runs to completion."""
+        delay = self._start(key)
+        primary = self._atimed(primary, self._observer(key, key_of))
+        if delay is None:
+            return await primary()
+        tasks = [asyncio.ensure_future(primary())]
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done and self.budget.try_spend():
+            hedge_stats.incr("hedges")
+            logger.debug(f"LLM call {key} slower than {delay:.1f}s, sending a hedged request")
+            tasks.append(asyncio.ensure_future(hedge()))
+        return await self._arace_and_settle(tasks, on_discarded)
+
+    def stream(self, key: str, primary: Callable[[], Iterator[Any]], hedge: Callable[[], Iterator[Any]],
+               key_of: Optional[Callable[[Any], str]] = None) -> Iterator[Any]:
+        """
+        Streaming counterpart of run, hedging on the time to the first chunk: the stream yielding
+        first is consumed, the other one is closed. The primary's own time to first chunk is observed.
+        """
+        delay = self._start(f"{key}#first_chunk")
+
+        def open_stream(factory: Callable[[], Iterator[Any]]):
+            stream = iter(factory())
+            return stream, next(stream, _END)
+
+        def close_stream(opened) -> None:
+            close = getattr(opened[0], "close", None)
+            if close is not None:
+                close()
+
+        observe = self._first_chunk_observer(key, key_of)
+        if delay is None:
+            iterator, head = self._timed(lambda: open_stream(primary), observe)()
+        else:
+            started = _Started()
+            first = self._submit(self._timed(lambda: open_stream(primary), observe, started))
+            try:
+                iterator, head = first.result(timeout=started.remaining(delay))
+            except FutureTimeoutError:
+                if not self.budget.try_spend():
+                    iterator, head = first.result()
+                else:
+                    hedge_stats.incr("hedges")
+                    logger.debug(f"LLM stream {key} silent for {delay:.1f}s, sending a hedged request")
+                    iterator, head = self._race([first, self._submit(lambda: open_stream(hedge))], close_stream)
+        if head is _END:
+            return
+        yield head
+        yield from iterator
+
+    async def astream(self, key: str, primary: Callable[[], AsyncIterator[Any]], hedge: Callable[[], AsyncIterator[Any]],
+                      key_of: Optional[Callable[[Any], str]] = None) -> AsyncIterator[Any]:
+        """
+        Async counterpart of stream. A losing hedge is cancelled; a losing primary still waits for its
+        first chunk, so its time to first chunk is observed, and is then closed.
+        """
+        delay = self._start(f"{key}#first_chunk")
+
+        async def open_stream(factory: Callable[[], AsyncIterator[Any]]):
+            stream = factory().__aiter__()
+            try:
+                return stream, await stream.__anext__()
+            except StopAsyncIteration:
+                return stream, _END
+
+        def close_stream(opened) -> None:
+            aclose = getattr(opened[0], "aclose", None)
+            if aclose is not None:
+                asyncio.ensure_future(aclose())
+
+        open_primary = self._atimed(lambda: open_stream(primary), self._first_chunk_observer(key, key_of))
+        if delay is None:
+            iterator, head = await open_primary()
+        else:
+            tasks = [asyncio.ensure_future(open_primary())]
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and self.budget.try_spend():
+                hedge_stats.incr("hedges")
+                logger.debug(f"LLM stream {key} silent for {delay:.1f}s, sending a hedged request")
+                tasks.append(asyncio.ensure_future(open_stream(hedge)))
+            iterator, head = await self._arace_and_settle(tasks, close_stream)
+        if head is _END:
+            return
+        yield head
+        async for chunk in iterator:
+            yield chunk
+
+
+class _Started:
+    """When a request submitted to the worker pool actually started running, queueing excluded."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._at: Optional[float] = None
+
+    def mark(self, at: float) -> None:
+        self._at = at
+        self._event.set()
+
+    def remaining(self, delay: float) -> float:
+        """Block until the request starts, then return what is left of the hedge delay."""
+        self._event.wait()
+        return max(0.0, delay - (time.monotonic() - self._at))
+
+
+def _settle_loser(on_discarded: Optional[Callable[[Any], None]]) -> Callable[[asyncio.Future], None]:
+    """Done-callback of a task that lost a race: retrieve its error, hand a reply on to on_discarded."""
+    def settle(task: asyncio.Future) -> None:
+        if task.cancelled() or task.exception() is not None:
+            return
+        if on_discarded is not None:
+            on_discarded(task.result())
+
+    return settle
+
+
+hedge_stats = HedgeStats()
+_hedger: Optional[Hedger] = None
+_hedger_lock = threading.Lock()
+
+
+def get_hedger() -> Hedger:
+    """Return the process-wide hedger configured from config.py."""
+    global _hedger
+    with _hedger_lock:
+        if _hedger is None:
+            _hedger = Hedger()
+        return _hedger
@@ -0,0 +1,518 @@
+"""
+Invocation core shared by the LoggerChatModel implementations: cache lookup, provider call,
+retries and request logging, in blocking, asyncio-native and streaming flavours.
+"""
+# app/libs/llm_invocation.py
+import asyncio
+import time
+import weakref
+from abc import abstractmethod
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from langchain_core.language_models import LanguageModelInput
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.runnables import Runnable, RunnableConfig
+from loguru import logger
+
+import config as cfg
+from src.libs.llm_backends import served_backend
+from src.libs.llm_cache import describe_llm, get_llm_cache, make_cache_key, prompt_prefix_hash, render_messages
+from src.libs.llm_context import current_annotations
+from src.libs.llm_costs import get_cost_ledger
+from src.libs.llm_hedging import get_hedger
+from src.libs.llm_rate_limiter import estimate_tokens, get_rate_limiter, response_headers
+from src.libs.llm_retry import CircuitBreaker, get_circuit_breaker, get_retry_policy, is_retryable, retry_stats
+from src.libs.llm_singleflight import llm_singleflight
+from src.libs.tracing import trace_span
+from src.utils.constants import (
+    ANNOTATIONS,
+    CACHED_INPUT_TOKENS,
+    INPUT_TOKENS,
+    LATENCY_SECONDS,
+    MODEL_NAME,
+    OUTPUT_TOKENS,
+    PROMPT_PREFIX_HASH,
+    RESPONSE_METADATA,
+    TOTAL_COST,
+    USAGE_METADATA,
+)
+
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """
+    Return the semaphore capping concurrent async LLM calls on the running event loop.
+    asyncio primitives are bound to a single loop, so one semaphore is kept per loop.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(cfg.LLM_MAX_CONCURRENT_REQUESTS)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+class BaseLoggerChatModel(Runnable[LanguageModelInput, BaseMessage]):
+    """
+    Runnable wrapper around a chat model that caches, rate limits, retries and logs every call.
+    Subclasses provide reply parsing and request logging.
+    """
+
+    def __init__(self, llm: Any):
+        self.llm = llm
+        self._fallback_llms: Dict[str, Any] = {}
+
+    @abstractmethod
+    def parse_llmresult(self, llmresult: BaseMessage) -> Dict[str, Dict]:
+        """Parse the provider reply into the structure expected by log_request."""
+
+    @abstractmethod
+    def log_request(self, messages: Any, parsed_reply: Dict[str, Dict]) -> None:
+        """Persist a completed call to the call log."""
+
+    def invoke(self, input: LanguageModelInput, config: Optional[RunnableConfig] = None, **kwargs: Any) -> BaseMessage:
+        return self(input)
+
+    async def ainvoke(
+        self, input: LanguageModelInput, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> BaseMessage:
+        return await self.acall(input)
+
+    def stream(
+        self, input: LanguageModelInput, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Iterator[AIMessageChunk]:
+        return self.stream_call(input)
+
+    async def astream(
+        self, input: LanguageModelInput, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> AsyncIterator[AIMessageChunk]:
+        async for chunk in self.astream_call(input):
+            yield chunk
+
+    def _prepare_call(self, messages: Any) -> Dict[str, Any]:
+        provider, model, temperature = describe_llm(self.llm)
+        rendered = render_messages(messages)
+        return {
+            "llm": self.llm,
+            "provider": provider,
+            "model": model,
+            "temperature": temperature,
+            "rendered": rendered,
+            "cache_key": make_cache_key(provider, model, temperature, rendered),
+            "prefix_hash": prompt_prefix_hash(rendered),
+            "annotations": current_annotations(),
+            "estimated_tokens": estimate_tokens(rendered),
+        }
+
+    @staticmethod
+    def _served_call(call: Dict[str, Any], reply: Any) -> Dict[str, Any]:
+        """
+        Describe the call by the backend that served the reply. A backend pool (AIAdapter) is described
+        by its primary backend before the call, but may have answered from another one: the reply cache,
+        rate limiter, circuit breaker and hedge latency are then keyed on the backend that answered.
+        """
+        backend = served_backend(call["llm"], reply)
+        if backend is None:
+            return call
+        provider, model, temperature = describe_llm(backend.model)
+        if (provider, model, temperature) == (call["provider"], call["model"], call["temperature"]):
+            return call
+        return {
+            **call,
+            "provider": provider,
+            "model": model,
+            "temperature": temperature,
+            "cache_key": make_cache_key(provider, model, temperature, call["rendered"]),
+        }
+
+    @staticmethod
+    def _record_success(admitted: CircuitBreaker, call: Dict[str, Any]) -> None:
+        """
+        Close the breaker of the provider that served the call. When a backend pool served it from
+        another provider, the breaker that admitted the attempt learnt nothing about its own provider:
+        its trial, if it was one, is released rather than left in flight.
+        """
+        served = get_circuit_breaker(call["provider"])
+        served.record_success()
+        if served is not admitted:
+            admitted.release_trial()
+
+    @staticmethod
+    def _describe_span(span: Any, call: Dict[str, Any]) -> None:
+        """Name the trace span of a call after its template and record where it goes."""
+        template = call["annotations"].get("template")
+        if template:
+            span.rename(f"{span.name} {template}")
+        span.set(provider=call["provider"], model=call["model"], job=call["annotations"].get("job"))
+
+    def _cache_lookup(self, call: Dict[str, Any]) -> Optional[BaseMessage]:
+        cached_reply = get_llm_cache().get(call["cache_key"])
+        if cached_reply is not None:
+            logger.debug(f"LLM cache hit for {call['provider']}/{call['model']}")
+        return cached_reply
+
+    def _fallback_llm(self, fallback_model: str) -> Optional[Any]:
+        """
+        Return a copy of the wrapped chat model using the fallback model, sharing its HTTP client.
+        Wrappers such as AIAdapter cannot be copied this way and keep their configured model.
+        """
+        if fallback_model not in self._fallback_llms:
+            fallback_llm = None
+            for field in ("model_name", "model"):
+                if isinstance(getattr(self.llm, field, None), str) and hasattr(self.llm, "model_copy"):
+                    fallback_llm = self.llm.model_copy(update={field: fallback_model})
+                    break
+            if fallback_llm is None:
+                logger.warning(f"Cannot switch {type(self.llm).__name__} to {fallback_model}, keeping its model")
+            self._fallback_llms[fallback_model] = fallback_llm
+        return self._fallback_llms[fallback_model]
+
+    def _apply_budget(self, call: Dict[str, Any]) -> None:
+        """
+        Check the spend ledger before calling the provider: past a soft limit the call is routed to
+        the cheaper fallback model of the same provider, past a hard limit BudgetExceededError is raised.
+        Cache hits cost nothing and are served before this check.
+        """
+        fallback_model = get_cost_ledger().check(call["annotations"].get("job"), call["model"])
+        if not fallback_model:
+            return
+        fallback_llm = self._fallback_llm(fallback_model)
+        if fallback_llm is None:
+            return
+        logger.info(f"Soft LLM budget reached, using {fallback_model} instead of {call['model']}")
+        call["llm"] = fallback_llm
+        call["model"] = fallback_model
+        call["cache_key"] = make_cache_key(call["provider"], fallback_model, call["temperature"], call["rendered"])
+
+    @staticmethod
+    def _hedge_key(call: Dict[str, Any]) -> str:
+        return f"{call['provider']}/{call['model']}:{call['annotations'].get('template', '')}"
+
+    def _record_discarded(self, reply: BaseMessage, call: Dict[str, Any]) -> None:
+        """Add the cost of a hedged request that lost the race to the spend ledger."""
+        usage = getattr(reply, "usage_metadata", None) or {}
+        get_cost_ledger().record(
+            self._served_call(call, reply)["model"],
+            usage.get("input_tokens", 0),
+            usage.get("output_tokens", 0),
+            (usage.get("input_token_details") or {}).get("cache_read", 0),
+            job=call["annotations"].get("job"),
+            template=call["annotations"].get("template"),
+        )
+
+    def _record_reply(self, messages: Any, reply: BaseMessage, call: Dict[str, Any]) -> BaseMessage:
+        provider, model = call["provider"], call["model"]
+        rate_limiter = get_rate_limiter()
+        rate_limiter.update_from_headers(provider, model, response_headers(reply))
+        parsed_reply = self.parse_llmresult(reply)
+        parsed_reply[PROMPT_PREFIX_HASH] = call["prefix_hash"]
+        parsed_reply[LATENCY_SECONDS] = call.get("latency_seconds")
+        parsed_reply[ANNOTATIONS] = call["annotations"]
+        usage = parsed_reply.get(USAGE_METADATA, {})
+        parsed_reply[TOTAL_COST] = get_cost_ledger().record(
+            parsed_reply.get(RESPONSE_METADATA, {}).get(MODEL_NAME) or model,
+            usage.get(INPUT_TOKENS, 0),
+            usage.get(OUTPUT_TOKENS, 0),
+            usage.get(CACHED_INPUT_TOKENS, 0),
+            job=call["annotations"].get("job"),
+            template=call["annotations"].get("template"),
+        )
+        rate_limiter.record_usage(
+            provider, model, call["estimated_tokens"], parsed_reply.get("usage_metadata", {}).get("total_tokens", 0)
+        )
+        self.log_request(messages, parsed_reply)
+        get_llm_cache().put(call["cache_key"], reply, provider=provider, model=model)
+        return reply
+
+    def __call__(self, messages: Any) -> BaseMessage:
+        with trace_span("llm.invoke", "llm") as span:
+            call = self._prepare_call(messages)
+            self._describe_span(span, call)
+            cached_reply = self._cache_lookup(call)
+            if cached_reply is not None:
+                span.set(cache_hit=True)
+                return cached_reply
+            self._apply_budget(call)
+            return llm_singleflight.do(call["cache_key"], lambda: self._invoke_with_retries(messages, call))
+
+    def _invoke_with_retries(self, messages: Any, call: Dict[str, Any]) -> BaseMessage:
+        provider = call["provider"]
+        rate_limiter = get_rate_limiter()
+        breaker = get_circuit_breaker(provider)
+        retry_stats.incr(provider, "calls")
+        attempt = 0
+        wait_time = 0.0
+        while True:
+            breaker.before_call()
+            retry_stats.incr(provider, "attempts")
+            try:
+                rate_limiter.acquire(provider, call["model"], call["estimated_tokens"])
+                started = time.monotonic()
+                with trace_span("llm.attempt", "llm", attempt=attempt):
+                    reply = get_hedger().run(
+                        self._hedge_key(call),
+                        lambda: call["llm"].invoke(messages),
+                        lambda: self._hedge_invoke(messages, call),
+                        on_discarded=lambda discarded: self._record_discarded(discarded, call),
+                        key_of=lambda served: self._hedge_key(self._served_call(call, served)),
+                    )
+                call["latency_seconds"] = time.monotonic() - started
+                call = self._served_call(call, reply)
+                self._record_success(breaker, call)
+                retry_stats.incr(provider, "successes")
+                return self._record_reply(messages, reply, call)
+            except Exception as err:
+                wait_time = self._handle_failure(call, err, attempt, wait_time)
+                time.sleep(wait_time)
+                attempt += 1
+            except BaseException:
+                # Cancelled or interrupted: no verdict on the provider, let the next call be the trial
+                breaker.release_trial()
+                raise
+
+    @staticmethod
+    def _hedge_invoke(messages: Any, call: Dict[str, Any]) -> BaseMessage:
+        get_rate_limiter().acquire(call["provider"], call["model"], call["estimated_tokens"])
+        return call["llm"].invoke(messages)
+
+    def _handle_failure(self, call: Dict[str, Any], err: Exception, attempt: int, previous_wait: float) -> float:
+        provider = call["provider"]
+        get_rate_limiter().observe_error(provider, call["model"], err)
+        breaker = get_circuit_breaker(provider)
+        if is_retryable(err):
+            breaker.record_failure()
+            if breaker.state == breaker.OPEN:
+                raise err
+        else:
+            # The provider answered, the request itself is at fault
+            breaker.record_success()
+        return get_retry_policy().next_wait(provider, err, attempt, previous_wait)
+
+    @staticmethod
+    async def _ainvoke_llm(llm: Any, messages: Any) -> BaseMessage:
+        if hasattr(llm, "ainvoke"):
+            return await llm.ainvoke(messages)
+        return await asyncio.to_thread(llm.invoke, messages)
+
+    async def _ahedge_invoke(self, messages: Any, call: Dict[str, Any]) -> BaseMessage:
+        await get_rate_limiter().aacquire(call["provider"], call["model"], call["estimated_tokens"])
+        return await self._ainvoke_llm(call["llm"], messages)
+
+    async def acall(self, messages: Any) -> BaseMessage:
+        """
+        Async counterpart of __call__: waits with asyncio.sleep and caps concurrency with a semaphore,
+        so retries never block the event loop. Identical concurrent requests share one upstream call.
+        """
+        with trace_span("llm.ainvoke", "llm") as span:
+            call = self._prepare_call(messages)
+            self._describe_span(span, call)
+            cached_reply = self._cache_lookup(call)
+            if cached_reply is not None:
+                span.set(cache_hit=True)
+                return cached_reply
+            self._apply_budget(call)
+            return await llm_singleflight.ado(call["cache_key"], lambda: self._ainvoke_with_retries(messages, call))
+
+    async def _ainvoke_with_retries(self, messages: Any, call: Dict[str, Any]) -> BaseMessage:
+        provider = call["provider"]
+        rate_limiter = get_rate_limiter()
+        breaker = get_circuit_breaker(provider)
+        retry_stats.incr(provider, "calls")
+        attempt = 0
+        wait_time = 0.0
+        while True:
+            breaker.before_call()
+            retry_stats.incr(provider, "attempts")
+            try:
+                async with _get_semaphore():
+                    await rate_limiter.aacquire(provider, call["model"], call["estimated_tokens"])
+                    started = time.monotonic()
+                    with trace_span("llm.attempt", "llm", attempt=attempt):
+                        reply = await get_hedger().arun(
+                            self._hedge_key(call),
+                            lambda: self._ainvoke_llm(call["llm"], messages),
+                            lambda: self._ahedge_invoke(messages, call),
+                            on_discarded=lambda discarded: self._record_discarded(discarded, call),
+                            key_of=lambda served: self._hedge_key(self._served_call(call, served)),
+                        )
+                    call["latency_seconds"] = time.monotonic() - started
+                call = self._served_call(call, reply)
+                self._record_success(breaker, call)
+                retry_stats.incr(provider, "successes")
+                return self._record_reply(messages, reply, call)
+            except Exception as err:
+                wait_time = self._handle_failure(call, err, attempt, wait_time)
+                await asyncio.sleep(wait_time)
+                attempt += 1
+            except BaseException:
+                # Cancelled or interrupted: no verdict on the provider, let the next call be the trial
+                breaker.release_trial()
+                raise
+
+    @staticmethod
+    def _cached_chunk(cached_reply: BaseMessage) -> AIMessageChunk:
+        return AIMessageChunk(
+            content=cached_reply.content,
+            id=cached_reply.id,
+            response_metadata=cached_reply.response_metadata,
+            usage_metadata=cached_reply.usage_metadata,
+        )
+
+    @staticmethod
+    def _aggregate_chunks(reply: Optional[AIMessageChunk]) -> AIMessage:
+        """Turn the sum of the streamed chunks into the reply logged and cached for the call."""
+        reply = reply if reply is not None else AIMessageChunk(content="")
+        return AIMessage(
+            content=reply.content,
+            id=reply.id,
+            response_metadata=reply.response_metadata,
+            usage_metadata=reply.usage_metadata or {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0},
+        )
+
+    @staticmethod
+    def _stream_llm(llm: Any, messages: Any) -> Iterator[AIMessageChunk]:
+        if hasattr(llm, "stream"):
+            return llm.stream(messages)
+        return iter([llm.invoke(messages)])
+
+    def stream_call(self, messages: Any) -> Iterator[AIMessageChunk]:
+        """
+        Streaming counterpart of __call__: yields the reply chunks as the provider produces them and
+        logs and caches the aggregated reply once the stream ends. A failed attempt is retried only
+        while nothing has been yielded yet; a cache hit is yielded as a single chunk.
+        Streams are not coalesced with identical in-flight requests.
+        """
+        with trace_span("llm.stream", "llm") as span:
+            yield from self._stream_call(messages, span)
+
+    def _stream_call(self, messages: Any, span: Any) -> Iterator[AIMessageChunk]:
+        call = self._prepare_call(messages)
+        self._describe_span(span, call)
+        cached_reply = self._cache_lookup(call)
+        if cached_reply is not None:
+            span.set(cache_hit=True)
+            yield self._cached_chunk(cached_reply)
+            return
+        self._apply_budget(call)
+
+        provider = call["provider"]
+        rate_limiter = get_rate_limiter()
+        breaker = get_circuit_breaker(provider)
+        retry_stats.incr(provider, "calls")
+        attempt = 0
+        wait_time = 0.0
+        while True:
+            breaker.before_call()
+            retry_stats.incr(provider, "attempts")
+            reply = None
+            try:
+                rate_limiter.acquire(provider, call["model"], call["estimated_tokens"])
+                started = time.monotonic()
+                for chunk in get_hedger().stream(
+                    self._hedge_key(call),
+                    lambda: self._stream_llm(call["llm"], messages),
+                    lambda: self._hedge_stream(messages, call),
+                    key_of=lambda head: self._hedge_key(self._served_call(call, head)),
+                ):
+                    reply = chunk if reply is None else reply + chunk
+                    yield chunk
+            except Exception as err:
+                if reply is not None:
+                    rate_limiter.observe_error(provider, call["model"], err)
+                    logger.error(f"Stream from {provider} interrupted after partial output: {err}")
+                    breaker.release_trial()
+                    raise
+                wait_time = self._handle_failure(call, err, attempt, wait_time)
+                time.sleep(wait_time)
+                attempt += 1
+                continue
+            except BaseException:
+                # Cancelled or interrupted: no verdict on the provider, let the next call be the trial
+                breaker.release_trial()
+                raise
+            call["latency_seconds"] = time.monotonic() - started
+            reply = self._aggregate_chunks(reply)
+            call = self._served_call(call, reply)
+            self._record_success(breaker, call)
+            retry_stats.incr(provider, "successes")
+            self._record_reply(messages, reply, call)
+            return
+
+    def _hedge_stream(self, messages: Any, call: Dict[str, Any]) -> Iterator[AIMessageChunk]:
+        get_rate_limiter().acquire(call["provider"], call["model"], call["estimated_tokens"])
+        return self._stream_llm(call["llm"], messages)
+
+    async def _astream_llm(self, llm: Any, messages: Any) -> AsyncIterator[AIMessageChunk]:
+        if hasattr(llm, "astream"):
+            async for chunk in llm.astream(messages):
+                yield chunk
+        else:
+            yield await self._ainvoke_llm(llm, messages)
+
+    async def _ahedge_stream(self, messages: Any, call: Dict[str, Any]) -> AsyncIterator[AIMessageChunk]:
+        await get_rate_limiter().aacquire(call["provider"], call["model"], call["estimated_tokens"])
+        async for chunk in self._astream_llm(call["llm"], messages):
+            yield chunk
+
+    async def astream_call(self, messages: Any) -> AsyncIterator[AIMessageChunk]:
+        """
+        Async counterpart of stream_call.
+        """
+        with trace_span("llm.astream", "llm") as span:
+            async for chunk in self._astream_call(messages, span):
+                yield chunk
+
+    async def _astream_call(self, messages: Any, span: Any) -> AsyncIterator[AIMessageChunk]:
+        call = self._prepare_call(messages)
+        self._describe_span(span, call)
+        cached_reply = self._cache_lookup(call)
+        if cached_reply is not None:
+            span.set(cache_hit=True)
+            yield self._cached_chunk(cached_reply)
+            return
+        self._apply_budget(call)
+
+        provider = call["provider"]
+        rate_limiter = get_rate_limiter()
+        breaker = get_circuit_breaker(provider)
+        retry_stats.incr(provider, "calls")
+        attempt = 0
+        wait_time = 0.0
+        while True:
+            breaker.before_call()
+            retry_stats.incr(provider, "attempts")
+            reply = None
+            try:
+                async with _get_semaphore():
+                    await rate_limiter.aacquire(provider, call["model"], call["estimated_tokens"])
+                    started = time.monotonic()
+                    async for chunk in get_hedger().astream(
+                        self._hedge_key(call),
+                        lambda: self._astream_llm(call["llm"], messages),
+                        lambda: self._ahedge_stream(messages, call),
+                        key_of=lambda head: self._hedge_key(self._served_call(call, head)),
+                    ):
+                        reply = chunk if reply is None else reply + chunk
+                        yield chunk
+            except Exception as err:
+                if reply is not None:
+                    rate_limiter.observe_error(provider, call["model"], err)
+                    logger.error(f"Stream from {provider} interrupted after partial output: {err}")
+                    breaker.release_trial()
+                    raise
+                wait_time = self._handle_failure(call, err, attempt, wait_time)
+                await asyncio.sleep(wait_time)
+                attempt += 1
+                continue
+            except BaseException:
+                # Cancelled or interrupted: no verdict on the provider, let the next call be the trial
+                breaker.release_trial()
+                raise
+            call["latency_seconds"] = time.monotonic() - started
+            reply = self._aggregate_chunks(reply)
+            call = self._served_call(call, reply)
+            self._record_success(breaker, call)
+            retry_stats.incr(provider, "successes")
+            self._record_reply(messages, reply, call)
+            return
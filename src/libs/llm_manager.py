@@ -1,14 +1,15 @@
-import json
+import hashlib
+import importlib
 import os
+import random
 import re
 import textwrap
-import time
+import threading
 from abc import ABC, abstractmethod
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Union
+from typing import Callable, Dict, Union
 
-import httpx
 from dotenv import load_dotenv
 from langchain_core.messages import BaseMessage
 from langchain_core.messages.ai import AIMessage
@@ -20,7 +21,10 @@ from Levenshtein import distance
 import ai_hawk.llm.prompts as prompts
 from config import JOB_SUITABILITY_SCORE
 from src.utils.constants import (
+    ANNOTATIONS,
     AVAILABILITY,
+    CACHE_READ,
+    CACHED_INPUT_TOKENS,
     CERTIFICATIONS,
     CLAUDE,
     COMPANY,
@@ -32,8 +36,10 @@ from src.utils.constants import (
     GEMINI,
     HUGGINGFACE,
     ID,
+    INPUT_TOKEN_DETAILS,
     INPUT_TOKENS,
     INTERESTS,
+    LATENCY_SECONDS,
     JOB_APPLICATION_PROFILE,
     JOB_DESCRIPTION,
     LANGUAGES,
@@ -49,9 +55,12 @@ from src.utils.constants import (
     OUTPUT_TOKENS,
     PERSONAL_INFORMATION,
     PHRASE,
+    PROMPT_PREFIX_HASH,
     PROJECTS,
     PROMPTS,
     QUESTION,
+    OPENAI_COMPATIBLE,
+    REPLAY,
     REPLIES,
     RESPONSE_METADATA,
     RESUME,
@@ -71,7 +80,14 @@ from src.utils.constants import (
     WORK_PREFERENCES,
 )
 from src.job import Job
-from src.logging import logger
+from src.libs.llm_backends import Backend, BackendPool
+from src.libs.llm_call_log import get_call_log_writer
+from src.libs.llm_context import llm_call_annotations
+from src.libs.llm_costs import cost_of
+from src.libs.llm_invocation import BaseLoggerChatModel
+from src.libs.prompt_budget import token_budget
+from src.libs.section_classifier import classifier_stats, get_section_classifier
+from src.logging import logger, truncate
 import config as cfg
 
 load_dotenv()
@@ -82,14 +98,15 @@ class AIModel(ABC):
     def invoke(self, prompt: str) -> str:
         pass
 
+    async def ainvoke(self, prompt: str) -> BaseMessage:
+        return await self.model.ainvoke(prompt)
+
 
 class OpenAIModel(AIModel):
     def __init__(self, api_key: str, llm_model: str):
-        from langchain_openai import ChatOpenAI
+        from src.libs.llm_clients import get_chat_model
 
-        self.model = ChatOpenAI(
-            model_name=llm_model, openai_api_key=api_key, temperature=0.4
-        )
+        self.model = get_chat_model(OPENAI, llm_model, api_key=api_key, temperature=0.4)
 
     def invoke(self, prompt: str) -> BaseMessage:
         logger.debug("Invoking OpenAI API")
@@ -112,17 +129,36 @@ class ClaudeModel(AIModel):
 class OllamaModel(AIModel):
     def __init__(self, llm_model: str, llm_api_url: str):
         from langchain_ollama import ChatOllama
+        from src.libs.llm_ollama import warm_up
 
+        # The same keep_alive and num_ctx on every call (and the warm-up) keep the model loaded
+        params = {"keep_alive": cfg.LLM_OLLAMA_KEEP_ALIVE}
+        if cfg.LLM_OLLAMA_NUM_CTX:
+            params["num_ctx"] = cfg.LLM_OLLAMA_NUM_CTX
         if len(llm_api_url) > 0:
             logger.debug(f"Using Ollama with API URL: {llm_api_url}")
-            self.model = ChatOllama(model=llm_model, base_url=llm_api_url)
+            self.model = ChatOllama(model=llm_model, base_url=llm_api_url, **params)
         else:
-            self.model = ChatOllama(model=llm_model)
+            self.model = ChatOllama(model=llm_model, **params)
+        self.llm_api_url = llm_api_url
+        if cfg.LLM_OLLAMA_WARMUP:
+            options = {"num_ctx": cfg.LLM_OLLAMA_NUM_CTX} if cfg.LLM_OLLAMA_NUM_CTX else None
+            warm_up(llm_model, llm_api_url, cfg.LLM_OLLAMA_KEEP_ALIVE, options)
 
     def invoke(self, prompt: str) -> BaseMessage:
-        response = self.model.invoke(prompt)
+        from src.libs.llm_ollama import slot_semaphore
+
+        # Wait for a free server slot here rather than queueing inside Ollama
+        with slot_semaphore(self.llm_api_url):
+            response = self.model.invoke(prompt)
         return response
 
+    async def ainvoke(self, prompt: str) -> BaseMessage:
+        from src.libs.llm_ollama import async_slot_semaphore
+
+        async with async_slot_semaphore(self.llm_api_url):
+            return await self.model.ainvoke(prompt)
+
 class PerplexityModel(AIModel):
     def __init__(self, api_key: str, llm_model: str):
         from langchain_community.chat_models import ChatPerplexity
@@ -180,36 +216,150 @@ class HuggingFaceModel(AIModel):
         )
         return response
 
+    async def ainvoke(self, prompt: str) -> BaseMessage:
+        return await self.chatmodel.ainvoke(prompt)
+
+
+class ReplayModel(AIModel):
+    def __init__(self, llm_model: str):
+        from src.libs.llm_replay import ReplayChatModel
+
+        self.model = ReplayChatModel(model_name=llm_model, seed=cfg.LLM_REPLAY_SEED)
+
+    def invoke(self, prompt: str) -> BaseMessage:
+        logger.debug("Replaying recorded LLM reply")
+        return self.model.invoke(prompt)
+
+
+class OpenAICompatibleModel(AIModel):
+    """Any server exposing the OpenAI chat completions API, e.g. vLLM, LM Studio or llama.cpp."""
+
+    def __init__(self, api_key: str, llm_model: str, llm_api_url: str):
+        from src.libs.llm_clients import get_chat_model
+
+        self.model = get_chat_model(
+            OPENAI, llm_model, api_key=api_key or "not-needed", temperature=0.4, base_url=llm_api_url
+        )
+
+    def invoke(self, prompt: str) -> BaseMessage:
+        return self.model.invoke(prompt)
+
+
+# Model type -> factory(api_key, llm_model, llm_api_url) returning an AIModel; provider SDKs are imported
+# by the model constructors, so only the provider in use is ever loaded
+ModelFactory = Callable[[str, str, str], AIModel]
+_model_providers: Dict[str, ModelFactory] = {
+    OPENAI: lambda api_key, llm_model, llm_api_url: OpenAIModel(api_key, llm_model),
+    CLAUDE: lambda api_key, llm_model, llm_api_url: ClaudeModel(api_key, llm_model),
+    OLLAMA: lambda api_key, llm_model, llm_api_url: OllamaModel(llm_model, llm_api_url),
+    GEMINI: lambda api_key, llm_model, llm_api_url: GeminiModel(api_key, llm_model),
+    HUGGINGFACE: lambda api_key, llm_model, llm_api_url: HuggingFaceModel(api_key, llm_model),
+    PERPLEXITY: lambda api_key, llm_model, llm_api_url: PerplexityModel(api_key, llm_model),
+    OPENAI_COMPATIBLE: OpenAICompatibleModel,
+    REPLAY: lambda api_key, llm_model, llm_api_url: ReplayModel(llm_model),
+}
+_models: Dict[tuple, AIModel] = {}
+_models_lock = threading.Lock()
+
+
+def register_model_provider(llm_model_type: str, factory: ModelFactory) -> None:
+    """
+    Register a provider usable as LLM_MODEL_TYPE without editing AIAdapter.
+    Args:
+        llm_model_type (str): The model type name.
+        factory (Callable): Called as factory(api_key, llm_model, llm_api_url), returns an AIModel.
+    """
+    with _models_lock:
+        _model_providers[llm_model_type] = factory
+
+
+def _resolve_provider(llm_model_type: str) -> ModelFactory:
+    """Return the factory of a model type, importing the ones declared in LLM_MODEL_PROVIDERS on first use."""
+    factory = _model_providers.get(llm_model_type)
+    if factory is None and llm_model_type in cfg.LLM_MODEL_PROVIDERS:
+        module_name, _, attribute = cfg.LLM_MODEL_PROVIDERS[llm_model_type].partition(":")
+        factory = getattr(importlib.import_module(module_name), attribute)
+        register_model_provider(llm_model_type, factory)
+    if factory is None:
+        raise ValueError(f"Unsupported model type: {llm_model_type}")
+    return factory
+
+
+def get_ai_model(llm_model_type: str, llm_model: str, api_key: str, llm_api_url: str = "") -> AIModel:
+    """
+    Return the model of a configuration, constructing it once per process.
+    Args:
+        llm_model_type (str): The provider, e.g. "openai" or a registered custom provider.
+        llm_model (str): The model name.
+        api_key (str): The provider API key.
+        llm_api_url (str): The API URL for self-hosted providers.
+    Returns:
+        AIModel: The shared model.
+    """
+    key = (llm_model_type, llm_model, llm_api_url, hashlib.sha256((api_key or "").encode("utf-8")).hexdigest())
+    model = _models.get(key)
+    if model is not None:
+        return model
+    factory = _resolve_provider(llm_model_type)
+    with _models_lock:
+        model = _models.get(key)
+        if model is None:
+            logger.debug(f"Creating {llm_model_type} model {llm_model}")
+            model = factory(api_key, llm_model, llm_api_url)
+            _models[key] = model
+        return model
+
 
 class AIAdapter:
     def __init__(self, config: dict, api_key: str):
-        self.model = self._create_model(config, api_key)
+        self.pool = self._create_pool(config, api_key)
+        # The primary backend describes the adapter before a call; replies are stamped with the backend
+        # that served them, on which the invocation core keys the cache, rate limits and breakers
+        self.model = self.pool.primary.model
 
     def _create_model(self, config: dict, api_key: str) -> AIModel:
         llm_model_type = cfg.LLM_MODEL_TYPE
         llm_model = cfg.LLM_MODEL
 
         llm_api_url = cfg.LLM_API_URL
+        if cfg.LLM_REPLAY_ENABLED:
+            llm_model_type = REPLAY
 
         logger.debug(f"Using {llm_model_type} with {llm_model}")
+        return get_ai_model(llm_model_type, llm_model, api_key, llm_api_url)
+
+    def _create_pool(self, config: dict, api_key: str) -> BackendPool:
+        """
+        Build the backend pool from LLM_BACKENDS, or a single backend from LLM_MODEL_TYPE when it is empty
+        (and always in replay mode).
+        """
+        if not cfg.LLM_BACKENDS or cfg.LLM_REPLAY_ENABLED:
+            return BackendPool([Backend(name=cfg.LLM_MODEL_TYPE, model=self._create_model(config, api_key))])
+        backends = []
+        for backend_config in cfg.LLM_BACKENDS:
+            backend_api_key = os.getenv(backend_config["api_key_env"], "") if "api_key_env" in backend_config else api_key
+            model = get_ai_model(
+                backend_config["model_type"], backend_config["model"], backend_api_key, backend_config.get("api_url", "")
+            )
+            backends.append(
+                Backend(
+                    name=backend_config.get("name", backend_config["model_type"]),
+                    model=model,
+                    weight=backend_config.get("weight", 1.0),
+                    timeout_seconds=backend_config.get("timeout_seconds", cfg.LLM_BACKEND_TIMEOUT_SECONDS),
+                )
+            )
+        logger.debug(f"Using LLM backends {[backend.name for backend in backends]}")
+        return BackendPool(backends, cfg.LLM_BACKEND_PINS)
 
-        if llm_model_type == OPENAI:
-            return OpenAIModel(api_key, llm_model)
-        elif llm_model_type == CLAUDE:
-            return ClaudeModel(api_key, llm_model)
-        elif llm_model_type == OLLAMA:
-            return OllamaModel(llm_model, llm_api_url)
-        elif llm_model_type == GEMINI:
-            return GeminiModel(api_key, llm_model)
-        elif llm_model_type == HUGGINGFACE:
-            return HuggingFaceModel(api_key, llm_model)
-        elif llm_model_type == PERPLEXITY:
-            return PerplexityModel(api_key, llm_model)
-        else:
-            raise ValueError(f"Unsupported model type: {llm_model_type}")
+    def backend_stats(self) -> Dict[str, Dict]:
+        return self.pool.stats()
 
     def invoke(self, prompt: str) -> str:
-        return self.model.invoke(prompt)
+        return self.pool.invoke(prompt)
+
+    async def ainvoke(self, prompt: str) -> BaseMessage:
+        return await self.pool.ainvoke(prompt)
 
 
 class LLMLogger:
@@ -220,11 +370,11 @@ class LLMLogger:
     @staticmethod
     def log_request(prompts, parsed_reply: Dict[str, Dict]):
         logger.debug("Starting log_request method")
-        logger.debug(f"Prompts received: {prompts}")
-        logger.debug(f"Parsed reply received: {parsed_reply}")
+        logger.opt(lazy=True).debug("Prompts received: {}", lambda: truncate(prompts))
+        logger.opt(lazy=True).debug("Parsed reply received: {}", lambda: truncate(parsed_reply))
 
         try:
-            calls_log = os.path.join(Path("data_folder/output"), "open_ai_calls.json")
+            calls_log = Path("data_folder/output")
             logger.debug(f"Logging path determined: {calls_log}")
         except Exception as e:
             logger.error(f"Error determining the log path: {str(e)}")
@@ -233,7 +383,7 @@ class LLMLogger:
         if isinstance(prompts, StringPromptValue):
             logger.debug("Prompts are of type StringPromptValue")
             prompts = prompts.text
-            logger.debug(f"Prompts converted to text: {prompts}")
+            logger.opt(lazy=True).debug("Prompts converted to text: {}", lambda: truncate(prompts))
         elif isinstance(prompts, Dict):
             logger.debug("Prompts are of type Dict")
             try:
@@ -241,7 +391,7 @@ class LLMLogger:
                     f"prompt_{i + 1}": prompt.content
                     for i, prompt in enumerate(prompts.messages)
                 }
-                logger.debug(f"Prompts converted to dictionary: {prompts}")
+                logger.opt(lazy=True).debug("Prompts converted to dictionary: {}", lambda: truncate(prompts))
             except Exception as e:
                 logger.error(f"Error converting prompts to dictionary: {str(e)}")
                 raise
@@ -252,9 +402,7 @@ class LLMLogger:
                     f"prompt_{i + 1}": prompt.content
                     for i, prompt in enumerate(prompts.messages)
                 }
-                logger.debug(
-                    f"Prompts converted to dictionary using default method: {prompts}"
-                )
+                logger.opt(lazy=True).debug("Prompts converted to dictionary using default method: {}", lambda: truncate(prompts))
             except Exception as e:
                 logger.error(f"Error converting prompts using default method: {str(e)}")
                 raise
@@ -271,6 +419,7 @@ class LLMLogger:
             output_tokens = token_usage[OUTPUT_TOKENS]
             input_tokens = token_usage[INPUT_TOKENS]
             total_tokens = token_usage[TOTAL_TOKENS]
+            cached_input_tokens = token_usage.get(CACHED_INPUT_TOKENS, 0)
             logger.debug(
                 f"Token usage - Input: {input_tokens}, Output: {output_tokens}, Total: {total_tokens}"
             )
@@ -286,11 +435,9 @@ class LLMLogger:
             raise
 
         try:
-            prompt_price_per_token = 0.00000015
-            completion_price_per_token = 0.0000006
-            total_cost = (input_tokens * prompt_price_per_token) + (
-                output_tokens * completion_price_per_token
-            )
+            total_cost = parsed_reply.get(TOTAL_COST)
+            if total_cost is None:
+                total_cost = cost_of(model_name, input_tokens, output_tokens, cached_input_tokens)
             logger.debug(f"Total cost calculated: {total_cost}")
         except Exception as e:
             logger.error(f"Error calculating total cost: {str(e)}")
@@ -305,9 +452,13 @@ class LLMLogger:
                 TOTAL_TOKENS: total_tokens,
                 INPUT_TOKENS: input_tokens,
                 OUTPUT_TOKENS: output_tokens,
+                CACHED_INPUT_TOKENS: cached_input_tokens,
                 TOTAL_COST: total_cost,
+                PROMPT_PREFIX_HASH: parsed_reply.get(PROMPT_PREFIX_HASH, ""),
+                LATENCY_SECONDS: parsed_reply.get(LATENCY_SECONDS),
             }
-            logger.debug(f"Log entry created: {log_entry}")
+            log_entry.update(parsed_reply.get(ANNOTATIONS, {}))
+            logger.opt(lazy=True).debug("Log entry created: {}", lambda: truncate(log_entry))
         except KeyError as e:
             logger.error(
                 f"Error creating log entry: missing key {str(e)} in parsed_reply"
@@ -315,77 +466,24 @@ class LLMLogger:
             raise
 
         try:
-            with open(calls_log, "a", encoding="utf-8") as f:
-                json_string = json.dumps(log_entry, ensure_ascii=False, indent=4)
-                f.write(json_string + "\n")
-                logger.debug(f"Log entry written to file: {calls_log}")
+            get_call_log_writer(calls_log).write(log_entry)
+            logger.debug(f"Log entry queued for: {calls_log}")
         except Exception as e:
-            logger.error(f"Error writing log entry to file: {str(e)}")
+            logger.error(f"Error queueing log entry: {str(e)}")
             raise
 
 
-class LoggerChatModel:
+class LoggerChatModel(BaseLoggerChatModel):
     def __init__(self, llm: Union[OpenAIModel, OllamaModel, ClaudeModel, GeminiModel]):
-        self.llm = llm
+        super().__init__(llm)
         logger.debug(f"LoggerChatModel successfully initialized with LLM: {llm}")
 
-    def __call__(self, messages: List[Dict[str, str]]) -> str:
-        logger.debug(f"Entering __call__ method with messages: {messages}")
-        while True:
-            try:
-                logger.debug("Attempting to call the LLM with messages")
-
-                reply = self.llm.invoke(messages)
-                logger.debug(f"LLM response received: {reply}")
-
-                parsed_reply = self.parse_llmresult(reply)
-                logger.debug(f"Parsed LLM reply: {parsed_reply}")
-
-                LLMLogger.log_request(prompts=messages, parsed_reply=parsed_reply)
-                logger.debug("Request successfully logged")
-
-                return reply
-
-            except httpx.HTTPStatusError as e:
-                logger.error(f"HTTPStatusError encountered: {str(e)}")
-                if e.response.status_code == 429:
-                    retry_after = e.response.headers.get("retry-after")
-                    retry_after_ms = e.response.headers.get("retry-after-ms")
-
-                    if retry_after:
-                        wait_time = int(retry_after)
-                        logger.warning(
-                            f"Rate limit exceeded. Waiting for {wait_time} seconds before retrying (extracted from 'retry-after' header)..."
-                        )
-                        time.sleep(wait_time)
-                    elif retry_after_ms:
-                        wait_time = int(retry_after_ms) / 1000.0
-                        logger.warning(
-                            f"Rate limit exceeded. Waiting for {wait_time} seconds before retrying (extracted from 'retry-after-ms' header)..."
-                        )
-                        time.sleep(wait_time)
-                    else:
-                        wait_time = 30
-                        logger.warning(
-                            f"'retry-after' header not found. Waiting for {wait_time} seconds before retrying (default)..."
-                        )
-                        time.sleep(wait_time)
-                else:
-                    logger.error(
-                        f"HTTP error occurred with status code: {e.response.status_code}, waiting 30 seconds before retrying"
-                    )
-                    time.sleep(30)
-
-            except Exception as e:
-                logger.error(f"Unexpected error occurred: {str(e)}")
-                logger.info(
-                    "Waiting for 30 seconds before retrying due to an unexpected error."
-                )
-                time.sleep(30)
-                continue
+    def log_request(self, messages, parsed_reply: Dict[str, Dict]) -> None:
+        LLMLogger.log_request(prompts=messages, parsed_reply=parsed_reply)
+        logger.debug("Request successfully logged")
 
     def parse_llmresult(self, llmresult: AIMessage) -> Dict[str, Dict]:
-        logger.debug(f"Parsing LLM result: {llmresult}")
+        logger.opt(lazy=True).debug("Parsing LLM result: {}", lambda: truncate(llmresult))
 
         try:
             if hasattr(llmresult, USAGE_METADATA):
@@ -421,6 +519,9 @@ class LoggerChatModel:
                         TOTAL_TOKENS: usage_metadata.get(
                             TOTAL_TOKENS, 0
                         ),
+                        CACHED_INPUT_TOKENS: (usage_metadata.get(INPUT_TOKEN_DETAILS) or {}).get(
+                            CACHE_READ, 0
+                        ),
                     },
                 }
             else:
@@ -444,9 +545,10 @@ class LoggerChatModel:
                         INPUT_TOKENS: token_usage.prompt_tokens,
                         OUTPUT_TOKENS: token_usage.completion_tokens,
                         TOTAL_TOKENS: token_usage.total_tokens,
+                        CACHED_INPUT_TOKENS: 0,
                     },
                 }
-            logger.debug(f"Parsed LLM result successfully: {parsed_result}")
+            logger.opt(lazy=True).debug("Parsed LLM result successfully: {}", lambda: truncate(parsed_result))
             return parsed_result
 
         except KeyError as e:
@@ -469,7 +571,7 @@ class GPTAnswerer:
 
     @staticmethod
     def find_best_match(text: str, options: list[str]) -> str:
-        logger.debug(f"Finding best match for text: '{text}' in options: {options}")
+        logger.opt(lazy=True).debug("Finding best match for text: '{}' in options: {}", lambda: truncate(text), lambda: truncate(options))
         distances = [
             (option, distance(text.lower(), option.lower())) for option in options
         ]
@@ -479,7 +581,7 @@ class GPTAnswerer:
 
     @staticmethod
     def _remove_placeholders(text: str) -> str:
-        logger.debug(f"Removing placeholders from text: {text}")
+        logger.opt(lazy=True).debug("Removing placeholders from text: {}", lambda: truncate(text))
         text = text.replace("PLACEHOLDER", "")
         return text.strip()
 
@@ -489,77 +591,46 @@ class GPTAnswerer:
         return textwrap.dedent(template)
 
     def set_resume(self, resume):
-        logger.debug(f"Setting resume: {resume}")
+        logger.opt(lazy=True).debug("Setting resume: {}", lambda: truncate(resume))
         self.resume = resume
 
     def set_job(self, job: Job):
-        logger.debug(f"Setting job: {job}")
+        logger.opt(lazy=True).debug("Setting job: {}", lambda: truncate(job))
         self.job = job
         self.job.set_summarize_job_description(
             self.summarize_job_description(self.job.description)
         )
 
     def set_job_application_profile(self, job_application_profile):
-        logger.debug(f"Setting job application profile: {job_application_profile}")
+        logger.opt(lazy=True).debug("Setting job application profile: {}", lambda: truncate(job_application_profile))
         self.job_application_profile = job_application_profile
 
     def _clean_llm_output(self, output: str) -> str:
         return output.replace("*", "").replace("#", "").strip()
     
     def summarize_job_description(self, text: str) -> str:
-        logger.debug(f"Summarizing job description: {text}")
+        logger.opt(lazy=True).debug("Summarizing job description: {}", lambda: truncate(text))
         prompts.summarize_prompt_template = self._preprocess_template_string(
             prompts.summarize_prompt_template
         )
         prompt = ChatPromptTemplate.from_template(prompts.summarize_prompt_template)
         chain = prompt | self.llm_cheap | StrOutputParser()
-        raw_output = chain.invoke({TEXT: text})
+        with token_budget("summarize_prompt_template", prompts.summarize_prompt_template, {TEXT: text}, TEXT) as input_data:
+            raw_output = chain.invoke(input_data)
         output = self._clean_llm_output(raw_output)
-        logger.debug(f"Summary generated: {output}")
+        logger.opt(lazy=True).debug("Summary generated: {}", lambda: truncate(output))
         return output
 
     def _create_chain(self, template: str):
-        logger.debug(f"Creating chain with template: {template}")
+        logger.opt(lazy=True).debug("Creating chain with template: {}", lambda: truncate(template))
         prompt = ChatPromptTemplate.from_template(template)
         return prompt | self.llm_cheap | StrOutputParser()
 
-    def answer_question_textual_wide_range(self, question: str) -> str:
-        logger.debug(f"Answering textual question: {question}")
-        chains = {
-            PERSONAL_INFORMATION: self._create_chain(
-                prompts.personal_information_template
-            ),
-            SELF_IDENTIFICATION: self._create_chain(
-                prompts.self_identification_template
-            ),
-            LEGAL_AUTHORIZATION: self._create_chain(
-                prompts.legal_authorization_template
-            ),
-            WORK_PREFERENCES: self._create_chain(
-                prompts.work_preferences_template
-            ),
-            EDUCATION_DETAILS: self._create_chain(
-                prompts.education_details_template
-            ),
-            EXPERIENCE_DETAILS: self._create_chain(
-                prompts.experience_details_template
-            ),
-            PROJECTS: self._create_chain(prompts.projects_template),
-            AVAILABILITY: self._create_chain(prompts.availability_template),
-            SALARY_EXPECTATIONS: self._create_chain(
-                prompts.salary_expectations_template
-            ),
-            CERTIFICATIONS: self._create_chain(
-                prompts.certifications_template
-            ),
-            LANGUAGES: self._create_chain(prompts.languages_template),
-            INTERESTS: self._create_chain(prompts.interests_template),
-            COVER_LETTER: self._create_chain(prompts.coverletter_template),
-        }
-
+    def _determine_section_with_llm(self, question: str) -> str:
         prompt = ChatPromptTemplate.from_template(prompts.determine_section_template)
         chain = prompt | self.llm_cheap | StrOutputParser()
-        raw_output = chain.invoke({QUESTION: question})
+        with llm_call_annotations(template="determine_section_template"):
+            raw_output = chain.invoke({QUESTION: question})
         output = self._clean_llm_output(raw_output)
 
         match = re.search(
@@ -572,19 +643,69 @@ class GPTAnswerer:
         if not match:
             raise ValueError("Could not extract section name from the response.")
 
-        section_name = match.group(1).lower().replace(" ", "_")
+        return match.group(1).lower().replace(" ", "_")
+
+    def determine_section(self, question: str) -> str:
+        """
+        Pick the section used to answer a textual question: locally when the classifier is
+        confident enough, otherwise with an LLM call. Agreement between the two is tracked
+        whenever both are consulted.
+        """
+        if not cfg.SECTION_CLASSIFIER_ENABLED:
+            return self._determine_section_with_llm(question)
+
+        local_section, confidence = get_section_classifier().classify(question)
+        if local_section is not None and confidence >= cfg.SECTION_CLASSIFIER_CONFIDENCE_THRESHOLD:
+            classifier_stats.record_local()
+            logger.debug(f"Section '{local_section}' classified locally (confidence {confidence:.2f})")
+            if random.random() < cfg.SECTION_CLASSIFIER_AUDIT_RATE:
+                classifier_stats.record_audit(local_section, self._determine_section_with_llm(question))
+            return local_section
+
+        section_name = self._determine_section_with_llm(question)
+        classifier_stats.record_llm(local_section, section_name)
+        stats = classifier_stats.snapshot()
+        agreement = "n/a" if stats["agreement_rate"] is None else f"{stats['agreement_rate']:.0%}"
+        logger.debug(
+            f"Section '{section_name}' chosen by the LLM (local guess '{local_section}', confidence {confidence:.2f}); "
+            f"local/LLM agreement {agreement} over {stats['compared']} questions"
+        )
+        return section_name
+
+    def answer_question_textual_wide_range(self, question: str) -> str:
+        logger.opt(lazy=True).debug("Answering textual question: {}", lambda: truncate(question))
+        # Only the chain of the section the question belongs to is built
+        template_names = {
+            PERSONAL_INFORMATION: "personal_information_template",
+            SELF_IDENTIFICATION: "self_identification_template",
+            LEGAL_AUTHORIZATION: "legal_authorization_template",
+            WORK_PREFERENCES: "work_preferences_template",
+            EDUCATION_DETAILS: "education_details_template",
+            EXPERIENCE_DETAILS: "experience_details_template",
+            PROJECTS: "projects_template",
+            AVAILABILITY: "availability_template",
+            SALARY_EXPECTATIONS: "salary_expectations_template",
+            CERTIFICATIONS: "certifications_template",
+            LANGUAGES: "languages_template",
+            INTERESTS: "interests_template",
+            COVER_LETTER: "coverletter_template",
+        }
+
+        section_name = self.determine_section(question)
 
         if section_name == "cover_letter":
-            chain = chains.get(section_name)
-            raw_output = chain.invoke(
-                {
-                    RESUME: self.resume,
-                    JOB_DESCRIPTION: self.job_description,
-                    COMPANY: self.job.company,
-                }
-            )
+            template_name = template_names[COVER_LETTER]
+            chain = self._create_chain(getattr(prompts, template_name))
+            with llm_call_annotations(template=template_name):
+                raw_output = chain.invoke(
+                    {
+                        RESUME: self.resume,
+                        JOB_DESCRIPTION: self.job_description,
+                        COMPANY: self.job.company,
+                    }
+                )
             output = self._clean_llm_output(raw_output)
-            logger.debug(f"Cover letter generated: {output}")
+            logger.opt(lazy=True).debug("Cover letter generated: {}", lambda: truncate(output))
             return output
         resume_section = getattr(self.resume, section_name, None) or getattr(
             self.job_application_profile, section_name, None
@@ -596,15 +717,17 @@ class GPTAnswerer:
             raise ValueError(
                 f"Section '{section_name}' not found in either resume or job_application_profile."
             )
-        chain = chains.get(section_name)
-        if chain is None:
+        template_name = template_names.get(section_name)
+        if template_name is None:
             logger.error(f"Chain not defined for section '{section_name}'")
             raise ValueError(f"Chain not defined for section '{section_name}'")
-        raw_output = chain.invoke(
-            {RESUME_SECTION: resume_section, QUESTION: question}
-        )
+        chain = self._create_chain(getattr(prompts, template_name))
+        with llm_call_annotations(template=template_name):
+            raw_output = chain.invoke(
+                {RESUME_SECTION: resume_section, QUESTION: question}
+            )
         output = self._clean_llm_output(raw_output)
-        logger.debug(f"Question answered: {output}")
+        logger.opt(lazy=True).debug("Question answered: {}", lambda: truncate(output))
         return output
 
     def answer_question_numeric(
@@ -616,16 +739,17 @@ class GPTAnswerer:
         )
         prompt = ChatPromptTemplate.from_template(func_template)
         chain = prompt | self.llm_cheap | StrOutputParser()
-        raw_output_str = chain.invoke(
-            {
-                RESUME_EDUCATIONS: self.resume.education_details,
-                RESUME_JOBS: self.resume.experience_details,
-                RESUME_PROJECTS: self.resume.projects,
-                QUESTION: question,
-            }
-        )
+        with llm_call_annotations(template="numeric_question_template"):
+            raw_output_str = chain.invoke(
+                {
+                    RESUME_EDUCATIONS: self.resume.education_details,
+                    RESUME_JOBS: self.resume.experience_details,
+                    RESUME_PROJECTS: self.resume.projects,
+                    QUESTION: question,
+                }
+            )
         output_str = self._clean_llm_output(raw_output_str)
-        logger.debug(f"Raw output for numeric question: {output_str}")
+        logger.opt(lazy=True).debug("Raw output for numeric question: {}", lambda: truncate(output_str))
         try:
             output = self.extract_number_from_string(output_str)
             logger.debug(f"Extracted number: {output}")
@@ -637,7 +761,7 @@ class GPTAnswerer:
         return output
 
     def extract_number_from_string(self, output_str):
-        logger.debug(f"Extracting number from string: {output_str}")
+        logger.opt(lazy=True).debug("Extracting number from string: {}", lambda: truncate(output_str))
         numbers = re.findall(r"\d+", output_str)
         if numbers:
             logger.debug(f"Numbers found: {numbers}")
@@ -651,16 +775,17 @@ class GPTAnswerer:
         func_template = self._preprocess_template_string(prompts.options_template)
         prompt = ChatPromptTemplate.from_template(func_template)
         chain = prompt | self.llm_cheap | StrOutputParser()
-        raw_output_str = chain.invoke(
-            {
-                RESUME: self.resume,
-                JOB_APPLICATION_PROFILE: self.job_application_profile,
-                QUESTION: question,
-                OPTIONS: options,
-            }
-        )
+        with llm_call_annotations(template="options_template"):
+            raw_output_str = chain.invoke(
+                {
+                    RESUME: self.resume,
+                    JOB_APPLICATION_PROFILE: self.job_application_profile,
+                    QUESTION: question,
+                    OPTIONS: options,
+                }
+            )
         output_str = self._clean_llm_output(raw_output_str)
-        logger.debug(f"Raw output for options question: {output_str}")
+        logger.opt(lazy=True).debug("Raw output for options question: {}", lambda: truncate(output_str))
         best_option = self.find_best_match(output_str, options)
         logger.debug(f"Best option determined: {best_option}")
         return best_option
@@ -673,9 +798,10 @@ class GPTAnswerer:
             prompts.resume_or_cover_letter_template
         )
         chain = prompt | self.llm_cheap | StrOutputParser()
-        raw_response = chain.invoke({PHRASE: phrase})
+        with llm_call_annotations(template="resume_or_cover_letter_template"):
+            raw_response = chain.invoke({PHRASE: phrase})
         response = self._clean_llm_output(raw_response)
-        logger.debug(f"Response for resume_or_cover: {response}")
+        logger.opt(lazy=True).debug("Response for resume_or_cover: {}", lambda: truncate(response))
         if "resume" in response:
             return "resume"
         elif "cover" in response:
@@ -687,14 +813,15 @@ class GPTAnswerer:
         logger.info("Checking if job is suitable")
         prompt = ChatPromptTemplate.from_template(prompts.is_relavant_position_template)
         chain = prompt | self.llm_cheap | StrOutputParser()
-        raw_output = chain.invoke(
-            {
-                RESUME: self.resume,
-                JOB_DESCRIPTION: self.job_description,
-            }
-        )
+        input_data = {
+            RESUME: self.resume,
+            JOB_DESCRIPTION: self.job_description,
+        }
+        with token_budget("is_relavant_position_template", prompts.is_relavant_position_template,
+                          input_data, JOB_DESCRIPTION) as input_data:
+            raw_output = chain.invoke(input_data)
         output = self._clean_llm_output(raw_output)
-        logger.debug(f"Job suitability output: {output}")
+        logger.opt(lazy=True).debug("Job suitability output: {}", lambda: truncate(output))
 
         try:
             score = re.search(r"Score:\s*(\d+)", output, re.IGNORECASE).group(1)
@@ -0,0 +1,109 @@
+"""
+Ollama helpers: model warm-up with keep_alive pinning and client-side concurrency capped to the
+server's parallel request slots.
+"""
+# app/libs/llm_ollama.py
+import asyncio
+import os
+import threading
+import weakref
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from loguru import logger
+
+import config as cfg
+
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+# Ollama's own default when OLLAMA_NUM_PARALLEL is not set and memory allows it
+DEFAULT_PARALLEL_SLOTS = 4
+
+_slots: Dict[str, int] = {}
+_slot_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_async_slot_semaphores: Dict[str, "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]"] = {}
+_slots_lock = threading.Lock()
+
+
+def _is_local(base_url: str) -> bool:
+    return urlparse(base_url or DEFAULT_OLLAMA_URL).hostname in ("localhost", "127.0.0.1", "::1")
+
+
+def discover_parallel_slots(base_url: str) -> int:
+    """
+    Find how many requests the Ollama server processes in parallel per model. The API does not
+    report it, so in order: LLM_OLLAMA_PARALLEL_SLOTS, then OLLAMA_NUM_PARALLEL when the server runs
+    on this machine (it reads the same variable), then Ollama's default.
+    """
+    if cfg.LLM_OLLAMA_PARALLEL_SLOTS:
+        slots, source = cfg.LLM_OLLAMA_PARALLEL_SLOTS, "LLM_OLLAMA_PARALLEL_SLOTS"
+    elif _is_local(base_url) and os.getenv("OLLAMA_NUM_PARALLEL", "").isdigit():
+        slots, source = int(os.environ["OLLAMA_NUM_PARALLEL"]), "OLLAMA_NUM_PARALLEL"
+    else:
+        slots, source = DEFAULT_PARALLEL_SLOTS, "Ollama default"
+    logger.debug(f"Ollama at {base_url or DEFAULT_OLLAMA_URL} serves {slots} parallel requests ({source})")
+    return max(1, slots)
+
+
+def parallel_slots(base_url: str) -> int:
+    """Return the parallel slots of an Ollama server, discovered once per process."""
+    with _slots_lock:
+        if base_url not in _slots:
+            _slots[base_url] = discover_parallel_slots(base_url)
+        return _slots[base_url]
+
+
+def slot_semaphore(base_url: str) -> threading.BoundedSemaphore:
+    """Return the semaphore capping blocking calls to an Ollama server at its parallel slots."""
+    slots = parallel_slots(base_url)
+    with _slots_lock:
+        if base_url not in _slot_semaphores:
+            _slot_semaphores[base_url] = threading.BoundedSemaphore(slots)
+        return _slot_semaphores[base_url]
+
+
+def async_slot_semaphore(base_url: str) -> asyncio.Semaphore:
+    """Async counterpart of slot_semaphore, one semaphore per event loop."""
+    slots = parallel_slots(base_url)
+    with _slots_lock:
+        per_loop = _async_slot_semaphores.setdefault(base_url, weakref.WeakKeyDictionary())
+        loop = asyncio.get_running_loop()
+        if loop not in per_loop:
+            per_loop[loop] = asyncio.Semaphore(slots)
+        return per_loop[loop]
+
+
+def warm_up(model: str, base_url: str, keep_alive: Any, options: Optional[Dict[str, Any]] = None,
+            background: bool = True) -> Optional[threading.Thread]:
+    """
+    Load the model into the Ollama server ahead of the first real call: a generate request without
+    a prompt loads it and pins it for keep_alive. The options must match the ones of the real calls
+    (e.g. num_ctx), otherwise Ollama reloads the model on the first call.
+    Args:
+        model (str): The model name.
+        base_url (str): The Ollama server URL, the local default when empty.
+        keep_alive: How long the model stays loaded, e.g. "30m", or -1 to keep it loaded.
+        options (dict): Model options used by the real calls.
+        background (bool): Run in a daemon thread instead of blocking.
+    Returns:
+        threading.Thread: The warm-up thread when run in the background.
+    """
+    from src.libs.llm_clients import client_registry
+
+    def warm():
+        http_client, _ = client_registry.http_clients()
+        payload = {"model": model, "keep_alive": keep_alive}
+        if options:
+            payload["options"] = options
+        try:
+            response = http_client.post(f"{(base_url or DEFAULT_OLLAMA_URL).rstrip('/')}/api/generate", json=payload)
+            response.raise_for_status()
+            logger.info(f"Ollama model {model} loaded and kept alive for {keep_alive}")
+        except Exception as e:
+            logger.warning(f"Ollama warm-up of {model} failed: {e}")
+
+    if not background:
+        warm()
+        return None
+    thread = threading.Thread(target=warm, name="ollama-warmup", daemon=True)
+    thread.start()
+    return thread
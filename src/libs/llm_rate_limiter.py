@@ -0,0 +1,227 @@
+"""
+Process-wide request and token budgets for LLM calls, kept in sync with the provider's rate-limit headers.
+"""
+# app/libs/llm_rate_limiter.py
+import asyncio
+import re
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from loguru import logger
+
+import config as cfg
+
+# Header names per budget, as sent by OpenAI-compatible APIs and by Anthropic
+LIMIT_HEADERS = {
+    "requests": ("x-ratelimit-limit-requests", "anthropic-ratelimit-requests-limit"),
+    "tokens": ("x-ratelimit-limit-tokens", "anthropic-ratelimit-tokens-limit"),
+}
+REMAINING_HEADERS = {
+    "requests": ("x-ratelimit-remaining-requests", "anthropic-ratelimit-requests-remaining"),
+    "tokens": ("x-ratelimit-remaining-tokens", "anthropic-ratelimit-tokens-remaining"),
+}
+
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    """
+    Cheap token estimate for rendered messages (about four characters per token).
+    Args:
+        messages (list): Messages as returned by llm_cache.render_messages.
+    Returns:
+        int: The estimated prompt size in tokens.
+    """
+    characters = sum(len(str(message.get("content", ""))) for message in messages)
+    return characters // 4 + 4 * len(messages)
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Read the server-requested wait from retry-after-ms / retry-after headers.
+    Returns:
+        float: Seconds to wait, or None if the headers are absent or unparseable.
+    """
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def _first_header(headers: Mapping[str, str], names: Tuple[str, ...]) -> Optional[float]:
+    for name in names:
+        value = headers.get(name)
+        if value is None:
+            continue
+        match = re.match(r"\s*(\d+(?:\.\d+)?)", str(value))
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations. A reservation may take the bucket into debt;
+    the caller then waits until the debt has been refilled, which keeps callers in FIFO order.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """
+        Take `amount` tokens from the bucket.
+        Returns:
+            float: Seconds the caller has to wait before using the reservation.
+        """
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.refill_per_second
+
+    def adjust(self, amount: float, now: float) -> None:
+        """Give back (positive) or take (negative) tokens without waiting."""
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def set_capacity(self, capacity: float, window_seconds: float = 60.0) -> None:
+        if capacity <= 0 or capacity == self.capacity:
+            return
+        self.capacity = float(capacity)
+        self.refill_per_second = self.capacity / window_seconds
+        self.tokens = min(self.tokens, self.capacity)
+
+    def clamp(self, remaining: float, now: float) -> None:
+        """Trust the server when it reports less headroom than we think we have."""
+        self._refill(now)
+        self.tokens = min(self.tokens, remaining)
+
+
+class _ModelBudget:
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self.blocked_until = 0.0
+
+
+class RateLimiter:
+    """
+    Request and token budgets per (provider, model), shared by every LLM client in the process.
+    """
+
+    def __init__(self, limits: Dict[str, Dict[str, float]]):
+        """
+        Args:
+            limits (dict): Budgets keyed by model name prefix, with a "default" entry. Each value holds
+                `requests_per_minute` and `tokens_per_minute`.
+        """
+        self.limits = limits
+        self.waited_seconds = 0.0
+        self._budgets: Dict[Tuple[str, str], _ModelBudget] = {}
+        self._lock = threading.Lock()
+
+    def _budget(self, provider: str, model: str) -> _ModelBudget:
+        key = (provider, model)
+        budget = self._budgets.get(key)
+        if budget is None:
+            matches = [prefix for prefix in self.limits if prefix != "default" and model.startswith(prefix)]
+            limit = self.limits[max(matches, key=len)] if matches else self.limits["default"]
+            budget = _ModelBudget(limit["requests_per_minute"], limit["tokens_per_minute"])
+            self._budgets[key] = budget
+        return budget
+
+    def reserve(self, provider: str, model: str, tokens: int) -> float:
+        """
+        Reserve one request and `tokens` tokens.
+        Returns:
+            float: Seconds to wait before sending the request.
+        """
+        now = time.monotonic()
+        with self._lock:
+            budget = self._budget(provider, model)
+            wait_time = max(
+                budget.requests.reserve(1, now),
+                budget.tokens.reserve(tokens, now),
+                budget.blocked_until - now,
+            )
+        if wait_time > 0:
+            self.waited_seconds += wait_time
+            logger.debug(f"Rate limiter delaying {provider}/{model} call by {wait_time:.2f}s")
+        return max(wait_time, 0.0)
+
+    def acquire(self, provider: str, model: str, tokens: int) -> None:
+        """Block the current thread until the request fits in the budget."""
+        wait_time = self.reserve(provider, model, tokens)
+        if wait_time:
+            time.sleep(wait_time)
+
+    async def aacquire(self, provider: str, model: str, tokens: int) -> None:
+        """Wait without blocking the event loop until the request fits in the budget."""
+        wait_time = self.reserve(provider, model, tokens)
+        if wait_time:
+            await asyncio.sleep(wait_time)
+
+    def record_usage(self, provider: str, model: str, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the token budget once the real usage of a call is known."""
+        if not actual_tokens:
+            return
+        with self._lock:
+            self._budget(provider, model).tokens.adjust(estimated_tokens - actual_tokens, time.monotonic())
+
+    def update_from_headers(self, provider: str, model: str, headers: Optional[Mapping[str, str]]) -> None:
+        """
+        Align the budgets with x-ratelimit-* / anthropic-ratelimit-* / retry-after response headers.
+        """
+        if not headers:
+            return
+        headers = {str(name).lower(): value for name, value in dict(headers).items()}
+        now = time.monotonic()
+        with self._lock:
+            budget = self._budget(provider, model)
+            for name, bucket in (("requests", budget.requests), ("tokens", budget.tokens)):
+                limit = _first_header(headers, LIMIT_HEADERS[name])
+                if limit:
+                    bucket.set_capacity(limit)
+                remaining = _first_header(headers, REMAINING_HEADERS[name])
+                if remaining is not None:
+                    bucket.clamp(remaining, now)
+            retry_after = parse_retry_after(headers)
+            if retry_after:
+                budget.blocked_until = max(budget.blocked_until, now + retry_after)
+
+    def observe_error(self, provider: str, model: str, err: Exception) -> None:
+        """Feed the headers of a failed HTTP response (e.g. a 429) back into the budgets."""
+        response = getattr(err, "response", None)
+        self.update_from_headers(provider, model, getattr(response, "headers", None))
+
+
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Return the process-wide rate limiter configured from config.py.
+    """
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter(cfg.LLM_RATE_LIMITS)
+        return _rate_limiter
+
+
+def response_headers(reply: Any) -> Optional[Mapping[str, str]]:
+    """Return the HTTP headers attached to a reply by clients created with include_response_headers."""
+    return (getattr(reply, "response_metadata", None) or {}).get("headers")
@@ -0,0 +1,272 @@
+"""
+Record-and-replay chat model answering from the recorded call log (open_ai_calls.jsonl), for offline,
+deterministic and free benchmarking of the whole pipeline.
+"""
+# app/libs/llm_replay.py
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from loguru import logger
+from pydantic import Field, PrivateAttr
+
+import config as cfg
+from src.libs.llm_call_log import iter_call_log
+
+# Prefix of the model name reported by replayed replies: unknown to the pricing table, so replays cost nothing,
+# and skipped when the call log is loaded again, so replayed entries are never replayed themselves
+REPLAY_MODEL_PREFIX = "replay:"
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def load_call_log(directory: Path) -> List[Dict[str, Any]]:
+    """
+    Read the recorded calls of a call log folder (legacy log, archives and current log), leaving out
+    replayed ones.
+    """
+    return [
+        entry for entry in iter_call_log(directory)
+        if not str(entry.get("model", "")).startswith(REPLAY_MODEL_PREFIX)
+    ]
+
+
+def normalize_prompt(text: str) -> str:
+    """Collapse whitespace so formatting differences do not defeat exact matching."""
+    return " ".join(text.split())
+
+
+def recorded_prompt_text(prompts: Any) -> str:
+    """Join the prompts of a log entry (a string, or prompt_1..prompt_n message contents) into one text."""
+    if isinstance(prompts, dict):
+        ordered = sorted(prompts.items(), key=lambda item: int(re.sub(r"\D", "", item[0]) or 0))
+        return "\n".join(str(content) for _, content in ordered)
+    return str(prompts)
+
+
+def messages_text(messages: List[BaseMessage]) -> str:
+    """Join the contents of the messages of a call the same way the call log records them."""
+    return "\n".join(message.content if isinstance(message.content, str) else str(message.content) for message in messages)
+
+
+def prompt_hash(text: str) -> str:
+    return hashlib.sha256(normalize_prompt(text).encode("utf-8")).hexdigest()
+
+
+class ReplayIndex:
+    """
+    Recorded replies indexed by the hash of their normalised prompt. Prompts without an exact match
+    get the reply of the most similar recorded prompt (Jaccard similarity of their word sets).
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]], nearest_cache_size: int = 1024):
+        self.entries = entries
+        self._by_hash: Dict[str, Dict[str, Any]] = {}
+        self._words: List[frozenset] = []
+        for entry in entries:
+            text = recorded_prompt_text(entry.get("prompts", ""))
+            self._by_hash.setdefault(prompt_hash(text), entry)
+            self._words.append(frozenset(WORD_PATTERN.findall(text.lower())))
+        self._nearest: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._nearest_cache_size = nearest_cache_size
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_directory(cls, directory: Path) -> "ReplayIndex":
+        entries = load_call_log(directory)
+        logger.info(f"Loaded {len(entries)} recorded LLM calls from {directory}")
+        return cls(entries)
+
+    def lookup(self, text: str) -> Tuple[Dict[str, Any], float]:
+        """
+        Returns:
+            tuple: (recorded entry, similarity), similarity being 1.0 for an exact match.
+        Raises:
+            LookupError: When the index is empty.
+        """
+        if not self.entries:
+            raise LookupError("No recorded LLM calls to replay")
+        key = prompt_hash(text)
+        entry = self._by_hash.get(key)
+        if entry is not None:
+            return entry, 1.0
+        with self._lock:
+            if key in self._nearest:
+                self._nearest.move_to_end(key)
+                return self._nearest[key]
+        words = frozenset(WORD_PATTERN.findall(text.lower()))
+        best, best_score = 0, -1.0
+        for position, recorded in enumerate(self._words):
+            union = len(words | recorded)
+            score = len(words & recorded) / union if union else 0.0
+            if score > best_score:
+                best, best_score = position, score
+        result = (self.entries[best], best_score)
+        with self._lock:
+            self._nearest[key] = result
+            if len(self._nearest) > self._nearest_cache_size:
+                self._nearest.popitem(last=False)
+        return result
+
+
+class LatencyModel:
+    """
+    Simulated provider latency. Distributions:
+        none: no delay.
+        fixed: median_seconds.
+        uniform: between min_seconds and max_seconds.
+        lognormal: median median_seconds, spread sigma.
+        recorded: the latency_seconds recorded with the reply, median_seconds when it was not recorded.
+    seconds_per_output_token is added for every recorded output token, so longer replies take longer.
+    """
+
+    def __init__(self, settings: Dict[str, Any], seed: int = 0):
+        self.distribution = settings.get("distribution", "none")
+        self.median_seconds = settings.get("median_seconds", 1.0)
+        self.sigma = settings.get("sigma", 0.5)
+        self.min_seconds = settings.get("min_seconds", 0.0)
+        self.max_seconds = settings.get("max_seconds", 2.0)
+        self.seconds_per_output_token = settings.get("seconds_per_output_token", 0.0)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self, entry: Dict[str, Any]) -> float:
+        with self._lock:
+            if self.distribution == "none":
+                return 0.0
+            if self.distribution == "fixed":
+                base = self.median_seconds
+            elif self.distribution == "uniform":
+                base = self._rng.uniform(self.min_seconds, self.max_seconds)
+            elif self.distribution == "lognormal":
+                base = self._rng.lognormvariate(math.log(self.median_seconds), self.sigma)
+            elif self.distribution == "recorded":
+                base = entry.get("latency_seconds") or self.median_seconds
+            else:
+                raise ValueError(f"Unknown replay latency distribution: {self.distribution}")
+        return base + self.seconds_per_output_token * entry.get("output_tokens", 0)
+
+
+class ReplayStats:
+    """Counts replayed calls and the simulated provider time, to separate it from our own overhead."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.exact = 0
+        self.nearest = 0
+        self.simulated_seconds = 0.0
+
+    def record(self, similarity: float, latency: float) -> None:
+        with self._lock:
+            self.calls += 1
+            if similarity >= 1.0:
+                self.exact += 1
+            else:
+                self.nearest += 1
+            self.simulated_seconds += latency
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "exact": self.exact,
+                "nearest": self.nearest,
+                "simulated_seconds": self.simulated_seconds,
+            }
+
+
+replay_stats = ReplayStats()
+_index: Optional[ReplayIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_replay_index() -> ReplayIndex:
+    """Return the process-wide replay index, loading the call log of LLM_REPLAY_LOG_DIR on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ReplayIndex.from_directory(Path(cfg.LLM_REPLAY_LOG_DIR))
+        return _index
+
+
+class ReplayChatModel(BaseChatModel):
+    """
+    Chat model answering every prompt with the recorded reply of the same (or the most similar)
+    prompt, with the recorded token counts and a simulated latency. No network access, no cost.
+    """
+
+    model_name: str = Field(default="replay")
+    temperature: Optional[float] = None
+    latency: Dict[str, Any] = Field(default_factory=dict)
+    seed: int = 0
+    stream_chunk_words: int = 8
+    _latency_model: LatencyModel = PrivateAttr()
+
+    def model_post_init(self, __context: Any) -> None:
+        self._latency_model = LatencyModel(self.latency or cfg.LLM_REPLAY_LATENCY, self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _replay(self, messages: List[BaseMessage]) -> Tuple[AIMessage, float]:
+        text = messages_text(messages)
+        entry, similarity = get_replay_index().lookup(text)
+        if similarity < cfg.LLM_REPLAY_MIN_SIMILARITY:
+            logger.warning(f"No close recorded prompt (best similarity {similarity:.2f}), replaying it anyway")
+        latency = self._latency_model.sample(entry)
+        replay_stats.record(similarity, latency)
+        reply = entry.get("replies", "")
+        message = AIMessage(
+            content=reply if isinstance(reply, str) else json.dumps(reply, ensure_ascii=False),
+            response_metadata={
+                "model_name": f"{REPLAY_MODEL_PREFIX}{entry.get('model', '')}",
+                "finish_reason": "stop",
+                "replay_similarity": similarity,
+            },
+            usage_metadata={
+                "input_tokens": entry.get("input_tokens", 0),
+                "output_tokens": entry.get("output_tokens", 0),
+                "total_tokens": entry.get("total_tokens", 0),
+                "input_token_details": {"cache_read": entry.get("cached_input_tokens", 0)},
+            },
+        )
+        return message, latency
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        message, latency = self._replay(messages)
+        time.sleep(latency)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        message, latency = self._replay(messages)
+        await asyncio.sleep(latency)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        """Yield the recorded reply a few words at a time, spreading the simulated latency over the chunks."""
+        message, latency = self._replay(messages)
+        words = re.split(r"(?<=\s)", message.content)
+        pieces = ["".join(words[i:i + self.stream_chunk_words]) for i in range(0, len(words), self.stream_chunk_words)] or [""]
+        for position, piece in enumerate(pieces):
+            time.sleep(latency / len(pieces))
+            last = position == len(pieces) - 1
+            chunk = AIMessageChunk(
+                content=piece,
+                response_metadata=message.response_metadata if last else {},
+                usage_metadata=message.usage_metadata if last else None,
+            )
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
@@ -0,0 +1,245 @@
+"""
+Retry policy and per-provider circuit breaker shared by the LLM invocation core.
+"""
+# app/libs/llm_retry.py
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+import httpx
+from loguru import logger
+
+import config as cfg
+from src.libs.llm_rate_limiter import parse_retry_after
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server-side failures
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+# Exception class name fragments used by the provider SDKs for transient failures
+RETRYABLE_ERROR_NAMES = ("RateLimit", "Timeout", "Connection", "Overloaded", "ServiceUnavailable", "InternalServer")
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider while its circuit breaker is open."""
+
+
+def status_code_of(err: Exception) -> Optional[int]:
+    """
+    Extract the HTTP status code of a provider error, if it carries one.
+    """
+    status = getattr(err, "status_code", None)
+    if status is None:
+        status = getattr(getattr(err, "response", None), "status_code", None)
+    if status is None and isinstance(getattr(err, "code", None), int):
+        status = err.code
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(err: Exception) -> bool:
+    """
+    Classify an error as transient (retry) or fatal (bad request, auth, programming errors).
+    """
+    status = status_code_of(err)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES or status >= 500
+    if isinstance(err, (httpx.TransportError, TimeoutError, ConnectionError)):
+        return True
+    return any(fragment in type(err).__name__ for fragment in RETRYABLE_ERROR_NAMES)
+
+
+def server_requested_wait(err: Exception) -> Optional[float]:
+    """
+    Read the wait the provider asked for, from retry-after headers or from messages like
+    "Please try again in 20s".
+    """
+    headers = getattr(getattr(err, "response", None), "headers", None)
+    if headers:
+        wait_time = parse_retry_after({str(name).lower(): value for name, value in dict(headers).items()})
+        if wait_time is not None:
+            return wait_time
+    match = re.search(r"try again in (\d+(?:\.\d+)?)\s*(ms|s)", str(err))
+    if match:
+        value = float(match.group(1))
+        return value / 1000.0 if match.group(2) == "ms" else value
+    return None
+
+
+class RetryStats:
+    """Counters describing retry behaviour, per provider."""
+
+    FIELDS = ("calls", "attempts", "retries", "successes", "fatal_errors", "exhausted", "breaker_rejections", "breaker_trips")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(self.FIELDS, 0))
+
+    def incr(self, provider: str, field: str) -> None:
+        with self._lock:
+            self._counters[provider][field] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {provider: dict(counters) for provider, counters in self._counters.items()}
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker. After `failure_threshold` retryable failures in a row the
+    circuit opens and calls fail fast for `reset_timeout` seconds; then a single trial call is let
+    through (half-open) and its outcome closes or re-opens the circuit. A fatal error proves the provider
+    answered, so callers record it as a success; a trial ending without an outcome is released.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, provider: str, failure_threshold: int, reset_timeout: float, stats: RetryStats):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.stats = stats
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """
+        Raises:
+            CircuitOpenError: If the provider is considered down.
+        """
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+        self.stats.incr(self.provider, "breaker_rejections")
+        raise CircuitOpenError(f"Circuit breaker open for provider '{self.provider}', failing fast")
+
+    def release_trial(self) -> None:
+        """
+        End a half-open trial that gave no verdict on the provider (cancelled, or interrupted by the
+        caller), so the next call can be the trial instead of being rejected.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.stats.incr(self.provider, "breaker_trips")
+                    logger.warning(f"Circuit breaker opened for provider '{self.provider}' after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+class RetryPolicy:
+    """
+    Bounded retries with decorrelated jitter: each wait is drawn from [base_delay, 3 * previous wait],
+    capped at max_delay, and never shorter than what the provider asked for.
+    """
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float, stats: RetryStats):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = stats
+
+    def next_wait(self, provider: str, err: Exception, attempt: int, previous_wait: float) -> float:
+        """
+        Decide how long to wait before the next attempt.
+        Args:
+            provider (str): The provider the failed call went to.
+            err (Exception): The error raised by the failed attempt.
+            attempt (int): The zero-based attempt that failed.
+            previous_wait (float): The wait before the failed attempt (0 for the first one).
+        Returns:
+            float: Seconds to wait.
+        Raises:
+            Exception: The original error, if it is fatal or the attempts are exhausted.
+        """
+        if not is_retryable(err):
+            self.stats.incr(provider, "fatal_errors")
+            logger.error(f"Non-retryable error from {provider}: {type(err).__name__}: {err}")
+            raise err
+        if attempt + 1 >= self.max_attempts:
+            self.stats.incr(provider, "exhausted")
+            logger.critical(f"Failed to get a response from {provider} after {self.max_attempts} attempts.")
+            raise err
+
+        wait_time = min(self.max_delay, random.uniform(self.base_delay, max(self.base_delay, previous_wait * 3)))
+        requested = server_requested_wait(err)
+        if requested is not None:
+            wait_time = max(wait_time, min(requested, self.max_delay))
+        self.stats.incr(provider, "retries")
+        logger.warning(
+            f"{type(err).__name__} from {provider}: retrying in {wait_time:.1f} seconds "
+            f"(Attempt {attempt + 1}/{self.max_attempts})"
+        )
+        return wait_time
+
+
+retry_stats = RetryStats()
+_retry_policy: Optional[RetryPolicy] = None
+_breakers: Dict[str, CircuitBreaker] = {}
+_lock = threading.Lock()
+
+
+def get_retry_policy() -> RetryPolicy:
+    """Return the process-wide retry policy configured from config.py."""
+    global _retry_policy
+    with _lock:
+        if _retry_policy is None:
+            _retry_policy = RetryPolicy(
+                max_attempts=cfg.LLM_RETRY_MAX_ATTEMPTS,
+                base_delay=cfg.LLM_RETRY_BASE_DELAY_SECONDS,
+                max_delay=cfg.LLM_RETRY_MAX_DELAY_SECONDS,
+                stats=retry_stats,
+            )
+        return _retry_policy
+
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    """Return the circuit breaker of a provider, creating it on first use."""
+    with _lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                provider,
+                failure_threshold=cfg.LLM_BREAKER_FAILURE_THRESHOLD,
+                reset_timeout=cfg.LLM_BREAKER_RESET_SECONDS,
+                stats=retry_stats,
+            )
+            _breakers[provider] = breaker
+        return breaker
+
+
+def get_retry_stats() -> Dict[str, Dict]:
+    """
+    Returns:
+        dict: Retry counters and breaker state per provider.
+    """
+    snapshot = retry_stats.snapshot()
+    with _lock:
+        breakers = dict(_breakers)
+    for provider, breaker in breakers.items():
+        snapshot.setdefault(provider, dict.fromkeys(RetryStats.FIELDS, 0))
+        snapshot[provider]["breaker_state"] = breaker.state
+    return snapshot
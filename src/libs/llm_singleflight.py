@@ -0,0 +1,111 @@
+"""
+Single-flight coalescing: concurrent identical LLM requests share one upstream call and its result.
+"""
+# app/libs/llm_singleflight.py
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. Callers arriving while a call for their key is in
+    flight wait for it and receive the same result (or the same exception) instead of calling again.
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._async_flights: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], asyncio.Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn() for key, or wait for the identical call already in flight in another thread.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async counterpart of do(): coalesces identical calls in flight on the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        with self._lock:
+            future = self._async_flights.get(flight_key)
+            leader = future is None
+            if leader:
+                future = loop.create_future()
+                self._async_flights[flight_key] = future
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            # Shield so a cancelled follower does not cancel the shared call
+            return await asyncio.shield(future)
+
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting for it
+            future.exception()
+            raise
+        finally:
+            with self._lock:
+                del self._async_flights[flight_key]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            dict: Upstream calls made (leaders) and requests served by an in-flight call (coalesced).
+        """
+        with self._lock:
+            return {"leaders": self.leaders, "coalesced": self.coalesced}
+
+
+llm_singleflight = SingleFlight()
+
+
+def get_singleflight_stats() -> Dict[str, int]:
+    """Return the coalescing counters of the LLM invocation core."""
+    return llm_singleflight.stats()
@@ -0,0 +1,167 @@
+"""
+Token counting, per-template token budgets and deterministic compaction of scraped job descriptions.
+"""
+# app/libs/prompt_budget.py
+import functools
+import re
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+import config as cfg
+from src.libs.llm_context import llm_call_annotations
+
+# Sentences typical of equal employment opportunity / legal statements
+EEO_PATTERN = re.compile(
+    r"equal (employment )?opportunit|affirmative action|without regard to|regardless of (race|age|gender|sex)"
+    r"|reasonable accommodation|e-verify|protected veteran|sexual orientation|gender identity"
+    r"|national origin|drug[- ]free workplace|background check policy|privacy (notice|policy)",
+    re.IGNORECASE,
+)
+# Headings opening a benefits / perks block
+BENEFITS_HEADING_PATTERN = re.compile(
+    r"^(our |the )?(benefits|perks|what we offer|what you('ll| will) get|why (join|work for) us|compensation (and|&) benefits)\b",
+    re.IGNORECASE,
+)
+BULLET_PATTERN = re.compile(r"^\s*([-*•·▪●◦]|\d+[.)])\s+")
+
+
+@functools.lru_cache(maxsize=8)
+def _encoding(model: Optional[str]):
+    """Return the tiktoken encoding of a model, or None when tiktoken or its encoding files are unavailable."""
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(model or "")
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.debug(f"tiktoken unavailable, estimating tokens from characters: {e}")
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Count the tokens of a text with tiktoken, or estimate them (four characters per token)
+    when tiktoken or its encodings are not available.
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def collapse_whitespace(text: str) -> str:
+    """Collapse runs of spaces and tabs and keep at most one blank line between paragraphs."""
+    lines = [re.sub(r"[ \t\u00a0]+", " ", line).strip() for line in text.splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def deduplicate_bullets(text: str) -> str:
+    """Drop bullet lines repeating an earlier bullet, compared case- and punctuation-insensitively."""
+    seen = set()
+    kept: List[str] = []
+    for line in text.splitlines():
+        if BULLET_PATTERN.match(line):
+            key = re.sub(r"\W+", " ", BULLET_PATTERN.sub("", line)).strip().lower()
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(line)
+    return "\n".join(kept)
+
+
+def _is_heading(line: str) -> bool:
+    stripped = line.strip()
+    return bool(stripped) and len(stripped) <= 60 and not BULLET_PATTERN.match(line) and not stripped.endswith(".")
+
+
+def strip_boilerplate(text: str) -> str:
+    """
+    Remove equal opportunity statements and benefits blocks. A benefits block runs from its heading
+    to the next heading.
+    """
+    kept: List[str] = []
+    in_benefits = False
+    for line in text.splitlines():
+        stripped = line.strip()
+        if BENEFITS_HEADING_PATTERN.match(stripped) and _is_heading(line):
+            in_benefits = True
+            continue
+        if in_benefits:
+            if not stripped or BULLET_PATTERN.match(line) or not _is_heading(line):
+                continue
+            in_benefits = False
+        sentences = re.split(r"(?<=[.!?])\s+", line)
+        line = " ".join(sentence for sentence in sentences if not EEO_PATTERN.search(sentence))
+        if stripped and not line.strip():
+            continue
+        kept.append(line)
+    return "\n".join(kept)
+
+
+# Applied in order, cheapest and least lossy first, until the prompt fits its budget
+COMPACTION_STEPS = (collapse_whitespace, deduplicate_bullets, strip_boilerplate)
+
+
+def compact_to_budget(text: str, budget: int, fixed_tokens: int = 0, model: Optional[str] = None) -> Tuple[str, int, int]:
+    """
+    Compact a text until the prompt it goes into fits the token budget.
+    Args:
+        text (str): The variable text, e.g. a scraped job description.
+        budget (int): Maximum prompt tokens.
+        fixed_tokens (int): Tokens taken by the rest of the prompt.
+        model (str): The model whose tokenizer is used for counting.
+    Returns:
+        tuple: (compacted text, prompt tokens before, prompt tokens after).
+    """
+    before = after = fixed_tokens + count_tokens(text, model)
+    for step in COMPACTION_STEPS:
+        if after <= budget:
+            break
+        text = step(text)
+        after = fixed_tokens + count_tokens(text, model)
+    if after > budget:
+        logger.warning(f"Prompt still {after} tokens after compaction, over its budget of {budget}")
+    return text, before, after
+
+
+def budget_inputs(template_name: str, template: str, inputs: Dict[str, Any], field: str,
+                  model: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Apply the token budget of a template to one variable of its inputs.
+    Args:
+        template_name (str): The key of the template in LLM_PROMPT_TOKEN_BUDGETS.
+        template (str): The prompt template.
+        inputs (dict): The template variables.
+        field (str): The variable that may be compacted.
+        model (str): The model whose tokenizer is used for counting.
+    Returns:
+        tuple: (inputs to use, call log annotations with the token counts).
+    """
+    budget = cfg.LLM_PROMPT_TOKEN_BUDGETS.get(template_name)
+    annotations: Dict[str, Any] = {"template": template_name}
+    if budget is None or not cfg.LLM_PROMPT_COMPACTION_ENABLED:
+        return inputs, annotations
+    fixed_tokens = count_tokens(template, model) + sum(
+        count_tokens(str(value), model) for name, value in inputs.items() if name != field
+    )
+    text, before, after = compact_to_budget(str(inputs[field]), budget, fixed_tokens, model)
+    annotations.update({"prompt_tokens_before_compaction": before, "prompt_tokens_after_compaction": after})
+    if after < before:
+        logger.debug(f"Compacted {template_name} prompt from {before} to {after} tokens (budget {budget})")
+    return {**inputs, field: text}, annotations
+
+
+@contextmanager
+def token_budget(template_name: str, template: str, inputs: Dict[str, Any], field: str,
+                 model: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Context manager form of budget_inputs: yields the inputs to use and annotates the LLM calls
+    made inside the block with the template name and token counts.
+    """
+    inputs, annotations = budget_inputs(template_name, template, inputs, field, model)
+    with llm_call_annotations(**annotations):
+        yield inputs
@@ -0,0 +1,254 @@
+"""
+Batch backends used by ResumeGenerator to tailor many resumes offline through a batch API.
+"""
+# app/libs/resume_and_cover_builder/batch_backend.py
+import json
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+import config as cfg
+from src.libs.llm_cache import render_messages
+from src.libs.resume_and_cover_builder.utils import chat_prompt_from_template
+
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+# LangChain message types -> OpenAI chat roles
+OPENAI_ROLES = {"human": "user", "ai": "assistant", "system": "system"}
+
+COMPLETED = "completed"
+IN_PROGRESS = "in_progress"
+FAILED = "failed"
+
+
+def build_batch_request(custom_id: str, template: str, input_data: dict, model: str, temperature: Optional[float]) -> dict:
+    """
+    Render a prompt template into one line of an OpenAI-style batch input file.
+    Args:
+        custom_id (str): Identifier used to match the result back to the request.
+        template (str): The prompt template.
+        input_data (dict): The template variables.
+        model (str): The model to run the request on.
+        temperature (float): The sampling temperature.
+    Returns:
+        dict: The batch request.
+    """
+    prompt_value = chat_prompt_from_template(template).invoke(input_data)
+    messages = [
+        {"role": OPENAI_ROLES.get(message["role"], message["role"]), "content": message["content"]}
+        for message in render_messages(prompt_value)
+    ]
+    body = {"model": model, "messages": messages}
+    if temperature is not None:
+        body["temperature"] = temperature
+    return {"custom_id": custom_id, "method": "POST", "url": CHAT_COMPLETIONS_URL, "body": body}
+
+
+def batch_usage(usage: dict) -> Dict[str, int]:
+    """
+    Convert the OpenAI usage of a batch reply to the token counts of the spend ledger.
+    Returns:
+        dict: input_tokens, output_tokens and cached_input_tokens.
+    """
+    return {
+        "input_tokens": usage.get("prompt_tokens", 0),
+        "output_tokens": usage.get("completion_tokens", 0),
+        "cached_input_tokens": (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0),
+    }
+
+
+def parse_batch_output_line(line: dict) -> Optional[dict]:
+    """
+    Extract the reply of one line of an OpenAI-style batch output file.
+    Returns:
+        dict: content, model and usage of the reply, or None if the request failed.
+    """
+    response = line.get("response") or {}
+    if line.get("error") or response.get("status_code", 200) >= 400:
+        logger.error(f"Batch request {line.get('custom_id')} failed: {line.get('error') or response.get('body')}")
+        return None
+    body = response.get("body", {})
+    return {
+        "content": body["choices"][0]["message"]["content"],
+        "model": body.get("model", ""),
+        "usage": body.get("usage", {}),
+    }
+
+
+class BatchBackend(ABC):
+    """
+    Submits a list of chat-completion requests as one batch and returns the replies once it has run.
+    """
+
+    # Share of the interactive price charged for the requests of a batch
+    price_factor: float = 1.0
+
+    @abstractmethod
+    def submit(self, requests: List[dict]) -> str:
+        """
+        Submit the requests.
+        Returns:
+            str: The batch identifier.
+        """
+
+    @abstractmethod
+    def status(self, batch_id: str) -> str:
+        """
+        Returns:
+            str: One of COMPLETED, IN_PROGRESS or FAILED.
+        """
+
+    @abstractmethod
+    def results(self, batch_id: str) -> Dict[str, dict]:
+        """
+        Returns:
+            dict: custom_id -> parsed reply (see parse_batch_output_line) for every successful request.
+        """
+
+    def run(self, requests: List[dict], poll_interval: float = 30, timeout: Optional[float] = None) -> Dict[str, dict]:
+        """
+        Submit the requests, poll until the batch is done and return its results.
+        Args:
+            requests (list): The batch requests.
+            poll_interval (float): Seconds between status checks.
+            timeout (float): Give up after this many seconds. None waits for the batch window.
+        Returns:
+            dict: custom_id -> parsed reply.
+        """
+        batch_id = self.submit(requests)
+        logger.info(f"Submitted batch {batch_id} with {len(requests)} requests")
+        started = time.monotonic()
+        while True:
+            status = self.status(batch_id)
+            if status == COMPLETED:
+                return self.results(batch_id)
+            if status == FAILED:
+                raise RuntimeError(f"Batch {batch_id} failed")
+            if timeout is not None and time.monotonic() - started > timeout:
+                raise TimeoutError(f"Batch {batch_id} did not complete within {timeout} seconds")
+            logger.debug(f"Batch {batch_id} is {status}, polling again in {poll_interval} seconds")
+            time.sleep(poll_interval)
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """
+    Runs the requests through the OpenAI Batch API (discounted pricing, 24h completion window).
+    """
+
+    # OpenAI batch statuses that mean no results will ever come
+    FAILED_STATUSES = {"failed", "expired", "cancelled", "cancelling"}
+
+    def __init__(self, api_key: str, work_dir: Path, completion_window: str = "24h"):
+        """
+        Args:
+            api_key (str): The OpenAI API key.
+            work_dir (Path): Directory where the batch input files are written before upload.
+            completion_window (str): The batch completion window.
+        """
+        from openai import OpenAI
+
+        self.client = OpenAI(api_key=api_key)
+        self.work_dir = Path(work_dir)
+        self.completion_window = completion_window
+        self.price_factor = cfg.LLM_BATCH_PRICE_FACTOR
+
+    def submit(self, requests: List[dict]) -> str:
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        input_path = self.work_dir / f"batch_input_{uuid.uuid4().hex}.jsonl"
+        with open(input_path, "w", encoding="utf-8") as f:
+            for request in requests:
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+        with open(input_path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=CHAT_COMPLETIONS_URL,
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        status = self.client.batches.retrieve(batch_id).status
+        if status == "completed":
+            return COMPLETED
+        if status in self.FAILED_STATUSES:
+            return FAILED
+        return IN_PROGRESS
+
+    def results(self, batch_id: str) -> Dict[str, dict]:
+        batch = self.client.batches.retrieve(batch_id)
+        results = {}
+        if not batch.output_file_id:
+            return results
+        for raw_line in self.client.files.content(batch.output_file_id).text.splitlines():
+            if not raw_line.strip():
+                continue
+            line = json.loads(raw_line)
+            parsed = parse_batch_output_line(line)
+            if parsed is not None:
+                results[line["custom_id"]] = parsed
+        return results
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    File-based stand-in for the OpenAI Batch API, for tests and dry runs. Each batch is written to
+    `<work_dir>/<batch_id>.input.jsonl` and answered synchronously by `responder` into
+    `<work_dir>/<batch_id>.output.jsonl`, using the same line formats as OpenAI.
+    """
+
+    def __init__(self, work_dir: Path, responder: Optional[Callable[[dict], str]] = None):
+        """
+        Args:
+            work_dir (Path): Directory holding the batch files.
+            responder (Callable): Maps a request body to the reply content. Defaults to an HTML comment
+                naming the request, which is enough to check prompt collection and assembly.
+        """
+        self.work_dir = Path(work_dir)
+        self.responder = responder
+
+    def _respond(self, request: dict) -> str:
+        if self.responder is not None:
+            return self.responder(request["body"])
+        return f"<!-- {request['custom_id']} -->"
+
+    def submit(self, requests: List[dict]) -> str:
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        batch_id = f"local_batch_{uuid.uuid4().hex}"
+        with open(self.work_dir / f"{batch_id}.input.jsonl", "w", encoding="utf-8") as f:
+            for request in requests:
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+        with open(self.work_dir / f"{batch_id}.output.jsonl", "w", encoding="utf-8") as f:
+            for request in requests:
+                line = {
+                    "custom_id": request["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": {
+                            "model": request["body"]["model"],
+                            "choices": [{"message": {"role": "assistant", "content": self._respond(request)}}],
+                            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                        },
+                    },
+                    "error": None,
+                }
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        return COMPLETED if (self.work_dir / f"{batch_id}.output.jsonl").exists() else IN_PROGRESS
+
+    def results(self, batch_id: str) -> Dict[str, dict]:
+        results = {}
+        with open(self.work_dir / f"{batch_id}.output.jsonl", "r", encoding="utf-8") as f:
+            for raw_line in f:
+                if not raw_line.strip():
+                    continue
+                line = json.loads(raw_line)
+                parsed = parse_batch_output_line(line)
+                if parsed is not None:
+                    results[line["custom_id"]] = parsed
+        return results
@@ -1,7 +1,7 @@
-from src.libs.resume_and_cover_builder.template_base import prompt_cover_letter_template
+from src.libs.resume_and_cover_builder.template_base import cache_friendly_prompt, prompt_cover_letter_template
 
 
-cover_letter_template = """
+cover_letter_template = cache_friendly_prompt("""
 Compose a brief and impactful cover letter based on the provided job description and resume. The letter should be no longer than three paragraphs and should be written in a professional, yet conversational tone. Avoid using any placeholders, and ensure that the letter flows naturally and is tailored to the job.
 
 Analyze the job description to identify key qualifications and requirements. Introduce the candidate succinctly, aligning their career objectives with the role. Highlight relevant skills and experiences from the resume that directly match the job’s demands, using specific examples to illustrate these qualifications. Reference notable aspects of the company, such as its mission or values, that resonate with the candidate’s professional goals. Conclude with a strong statement of why the candidate is a good fit for the position, expressing a desire to discuss further.
@@ -10,7 +10,7 @@ Please write the cover letter in a way that directly addresses the job role and
 
 ## Rules:
 - Do not include any introductions, explanations, or additional information.
-
+""" + prompt_cover_letter_template, """
 ## Details :
 - **Job Description:**
 ```
@@ -20,10 +20,10 @@ Please write the cover letter in a way that directly addresses the job role and
 ```
 {resume}
 ```
-"""+ prompt_cover_letter_template
+""")
 
 
-summarize_prompt_template = """
+summarize_prompt_template = cache_friendly_prompt("""
 As a seasoned HR expert, your task is to identify and outline the key skills and requirements necessary for the position of this job. Use the provided job description as input to extract all relevant information. This will involve conducting a thorough analysis of the job's responsibilities and the industry standards. You should consider both the technical and soft skills needed to excel in this role. Additionally, specify any educational qualifications, certifications, or experiences that are essential. Your analysis should also reflect on the evolving nature of this role, considering future trends and how they might affect the required competencies.
 
 Rules:
@@ -41,7 +41,7 @@ Role Evolution: Analyze how the role might evolve in the future, considering ind
 # Final Result:
 Your analysis should be structured in a clear and organized document with distinct sections for each of the points listed above. Each section should contain:
 This comprehensive overview will serve as a guideline for the recruitment process, ensuring the identification of the most qualified candidates.
-
+""", """
 # Job Description:
 ```
 {text}
@@ -49,4 +49,4 @@ This comprehensive overview will serve as a guideline for the recruitment proces
 
 ---
 
-# Job Description Summary"""
\ No newline at end of file
+# Job Description Summary""")
\ No newline at end of file
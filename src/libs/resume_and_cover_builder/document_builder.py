@@ -0,0 +1,150 @@
+"""
+Incremental HTML document builder fed by streamed section generation.
+"""
+# app/libs/resume_and_cover_builder/document_builder.py
+import io
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+SECTION_STARTED = "section_started"
+SECTION_CHUNK = "section_chunk"
+SECTION_COMPLETED = "section_completed"
+DOCUMENT_CHUNK = "document_chunk"
+DOCUMENT_COMPLETED = "document_completed"
+
+
+class ResumeDocumentBuilder:
+    """
+    Writes the resume body in document order while its sections are still being generated.
+    Text of the first unfinished section goes straight into the document; later sections are held
+    back until every section before them is complete. The output has the same layout as
+    LLMResumer.assemble_html_resume, and it is ready the moment the last section completes.
+
+    Progress events are dicts passed to `on_event`:
+        section_started / section_completed: {"type", "section", "completed", "total", "elapsed"}
+        section_chunk: {"type", "section", "text"} for every streamed fragment
+        document_chunk: {"type", "text"} for every fragment appended to the document, in order
+        document_completed: {"type", "html", "elapsed"}
+    """
+
+    def __init__(self, sections: List[str], on_event: Optional[Callable[[dict], None]] = None):
+        """
+        Args:
+            sections (list): The section names in document order; the first one is the header.
+            on_event (Callable): Receives the progress events. Called from the generating threads.
+        """
+        self.sections = list(sections)
+        self.on_event = on_event
+        self._buffers: Dict[str, List[str]] = {section: [] for section in self.sections}
+        self._completed = set()
+        self._cursor = 0
+        self._document = io.StringIO()
+        self._lock = threading.RLock()
+        self._done = threading.Event()
+        self._start_time = time.monotonic()
+        self._write("<body>\n")
+        self._open_section(0)
+
+    def _emit(self, event: dict) -> None:
+        if self.on_event is None:
+            return
+        try:
+            self.on_event(event)
+        except Exception as exc:
+            logger.error(f"Resume progress callback failed: {exc}")
+
+    def _progress(self, event_type: str, section: str) -> None:
+        self._emit({
+            "type": event_type,
+            "section": section,
+            "completed": len(self._completed),
+            "total": len(self.sections),
+            "elapsed": time.monotonic() - self._start_time,
+        })
+
+    def _write(self, text: str) -> None:
+        self._document.write(text)
+        self._emit({"type": DOCUMENT_CHUNK, "text": text})
+
+    def _open_section(self, index: int) -> None:
+        if index == 1:
+            self._write("  <main>\n")
+        self._write("  " if index == 0 else "    ")
+
+    def _close_section(self, index: int) -> None:
+        self._write("\n")
+        if index == len(self.sections) - 1:
+            self._write("  </main>\n</body>")
+
+    def _advance(self) -> None:
+        """Write out every completed section at the cursor, then open the next one."""
+        while self._cursor < len(self.sections):
+            section = self.sections[self._cursor]
+            text = "".join(self._buffers[section])
+            self._buffers[section] = []
+            if text:
+                self._write(text)
+            if section not in self._completed:
+                return
+            self._close_section(self._cursor)
+            self._cursor += 1
+            if self._cursor < len(self.sections):
+                self._open_section(self._cursor)
+        self._emit({"type": DOCUMENT_COMPLETED, "html": self._document.getvalue(), "elapsed": time.monotonic() - self._start_time})
+        self._done.set()
+
+    def start(self, section: str) -> None:
+        """Mark a section as being generated."""
+        with self._lock:
+            self._progress(SECTION_STARTED, section)
+
+    def append(self, section: str, text: str) -> None:
+        """Add a streamed fragment to a section."""
+        if not text:
+            return
+        with self._lock:
+            self._emit({"type": SECTION_CHUNK, "section": section, "text": text})
+            if self._cursor < len(self.sections) and self.sections[self._cursor] == section:
+                self._write(text)
+            else:
+                self._buffers[section].append(text)
+
+    def complete(self, section: str, failed: bool = False) -> None:
+        """
+        Mark a section as finished. Skipped sections are completed without any text.
+        Args:
+            section (str): The section name.
+            failed (bool): Drop the text held back for the section. Text of a section already
+                streaming into the document cannot be taken back and is kept.
+        """
+        with self._lock:
+            if section in self._completed:
+                return
+            self._completed.add(section)
+            if failed:
+                self._buffers[section] = []
+            self._progress(SECTION_COMPLETED, section)
+            self._advance()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until every section is complete.
+        Returns:
+            bool: False if the timeout expired first.
+        """
+        return self._done.wait(timeout)
+
+    @property
+    def is_complete(self) -> bool:
+        return self._done.is_set()
+
+    def getvalue(self) -> str:
+        """
+        Returns:
+            str: The document written so far; the full resume body once complete.
+        """
+        with self._lock:
+            return self._document.getvalue()
@@ -0,0 +1,150 @@
+"""
+Benchmark of the resume generation modes: the same resume tailored to the same job description with
+one call per section (fan_out) and with a single structured call (structured), compared on latency,
+tokens and cost. The LLM response cache and the section cache are bypassed, and the job description
+is summarised once, outside the measured runs. Structured runs do not fall back to one call per section:
+a reply that cannot be parsed counts as a failed run of the structured mode instead.
+
+Usage:
+    python -m src.libs.resume_and_cover_builder.generation_benchmark --job job.txt [--resume data_folder/plain_text_resume.yaml]
+        [--modes fan_out structured] [--runs 3] [--replay]
+"""
+# app/libs/resume_and_cover_builder/generation_benchmark.py
+import argparse
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import yaml
+from dotenv import load_dotenv
+from loguru import logger
+
+import config as cfg
+from src.libs.llm_analytics import percentile
+from src.libs.llm_context import llm_call_annotations
+from src.libs.llm_costs import BudgetExceededError, get_cost_ledger
+from src.libs.resume_and_cover_builder.config import global_config
+from src.libs.resume_and_cover_builder.llm.llm_generate_resume_from_job import LLMResumeJobDescription
+from src.libs.resume_and_cover_builder.module_loader import load_module
+from src.resume_schemas.resume import Resume
+from src.utils.constants import FAN_OUT, STRUCTURED
+
+MODES = (FAN_OUT, STRUCTURED)
+STRINGS_MODULE_PATH = Path(__file__).parent / "resume_job_description_prompt/strings_feder-cr.py"
+
+
+def run_benchmark(resume: Any, job_description_text: str, modes: List[str], runs: int,
+                  api_key: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Generate the resume body `runs` times per mode and measure every run.
+    Args:
+        resume (Resume): The resume to tailor.
+        job_description_text (str): The plain text job description.
+        modes (list): The generation modes to compare.
+        runs (int): Runs per mode; modes are interleaved so provider load drifts affect them alike.
+        api_key (str): The OpenAI API key.
+    Returns:
+        list: One row per mode with the number of failed runs, and the per-run averages of calls, tokens
+        and cost and the latency percentiles of the other runs.
+    """
+    strings = load_module(STRINGS_MODULE_PATH, "strings_feder_cr")
+    resumer = LLMResumeJobDescription(api_key, strings)
+    resumer.set_resume(resume)
+    resumer.set_job_description_from_text(job_description_text)
+
+    generate = {
+        FAN_OUT: resumer.generate_html_resume,
+        STRUCTURED: lambda: resumer.generate_html_resume_structured(fallback=False),
+    }
+    ledger = get_cost_ledger()
+    measured: Dict[str, List[Dict[str, Any]]] = {mode: [] for mode in modes}
+    failed = dict.fromkeys(modes, 0)
+    for run in range(runs):
+        for mode in modes:
+            job = f"benchmark:{mode}:{run}"
+            with llm_call_annotations(job=job):
+                start = time.perf_counter()
+                try:
+                    generate[mode]()
+                except BudgetExceededError:
+                    raise
+                except Exception as e:
+                    failed[mode] += 1
+                    logger.error(f"Benchmark {mode} run {run + 1}/{runs} failed, not measured: {e}")
+                    continue
+                seconds = time.perf_counter() - start
+            usage = ledger.job_usage(job)
+            usage["seconds"] = seconds
+            measured[mode].append(usage)
+            logger.info(f"Benchmark {mode} run {run + 1}/{runs}: {seconds:.2f}s, {usage['calls']} calls, ${usage['cost']:.4f}")
+
+    rows = []
+    for mode, results in measured.items():
+        row = {"mode": mode, "runs": len(results), "failed": failed[mode]}
+        if not results:
+            rows.append(row)
+            continue
+        latencies = sorted(result["seconds"] for result in results)
+        for name in ("calls", "input_tokens", "output_tokens", "cached_input_tokens", "cost"):
+            row[name] = sum(result[name] for result in results) / len(results)
+        row["total_tokens"] = row["input_tokens"] + row["output_tokens"]
+        row["p50_seconds"] = percentile(latencies, 0.5)
+        row["max_seconds"] = latencies[-1]
+        rows.append(row)
+    return rows
+
+
+def format_benchmark(rows: List[Dict[str, Any]]) -> str:
+    """Render the benchmark rows as a fixed-width table, averages per measured run."""
+    headers = ["mode", "runs", "failed", "calls", "in tok", "out tok", "cached", "total tok", "cost $", "p50 s", "max s"]
+    measures = [
+        ("calls", "{:.1f}"),
+        ("input_tokens", "{:.0f}"),
+        ("output_tokens", "{:.0f}"),
+        ("cached_input_tokens", "{:.0f}"),
+        ("total_tokens", "{:.0f}"),
+        ("cost", "{:.4f}"),
+        ("p50_seconds", "{:.2f}"),
+        ("max_seconds", "{:.2f}"),
+    ]
+    lines = [
+        [row["mode"], str(row["runs"]), str(row["failed"])]
+        + [spec.format(row[name]) if name in row else "-" for name, spec in measures]
+        for row in rows
+    ]
+    widths = [max(len(line[i]) for line in [headers] + lines) for i in range(len(headers))]
+
+    def render(line: List[str]) -> str:
+        return "  ".join(cell.ljust(width) if i == 0 else cell.rjust(width) for i, (cell, width) in enumerate(zip(line, widths)))
+
+    return "\n".join([render(headers), render(["-" * width for width in widths])] + [render(line) for line in lines])
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare the resume generation modes on latency, tokens and cost.")
+    parser.add_argument("--job", required=True, help="Plain text file holding the job description")
+    parser.add_argument("--resume", default="data_folder/plain_text_resume.yaml", help="The resume YAML file")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES), help="Generation modes to compare")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per mode")
+    parser.add_argument("--replay", action="store_true", help="Answer from the recorded call log instead of the provider")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    # The caches and the chat model are created on first use, after these overrides
+    cfg.LLM_CACHE_BYPASS = True
+    cfg.RESUME_SECTION_CACHE_ENABLED = False
+    if args.replay:
+        cfg.LLM_REPLAY_ENABLED = True
+
+    global_config.LOG_OUTPUT_FILE_PATH = Path("data_folder/output")
+    with open(args.resume, "r") as f:
+        resume = Resume(**yaml.safe_load(f))
+    job_description_text = Path(args.job).read_text(encoding="utf-8")
+
+    rows = run_benchmark(resume, job_description_text, args.modes, args.runs, os.getenv("OPENAI_API_KEY"))
+    print(format_benchmark(rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,32 +2,25 @@
 This creates the cover letter (in html, utils will then convert in PDF) matching with job description and plain-text resume
 """
 # app/libs/resume_and_cover_builder/llm_generate_cover_letter_from_job.py
-import os
 import textwrap
-from ..utils import LoggerChatModel
+from ..utils import LoggerChatModel, chat_prompt_from_template
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from pathlib import Path
+from src.libs.llm_clients import get_chat_model, get_embeddings
+from src.libs.prompt_budget import budget_inputs, token_budget
+from src.utils.constants import OPENAI
 from dotenv import load_dotenv
 from requests.exceptions import HTTPError as HTTPStatusError
-from pathlib import Path
 from loguru import logger
+from src.logging import truncate
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure log file
-log_folder = 'log/cover_letter/gpt_cover_letter_job_descr'
-if not os.path.exists(log_folder):
-    os.makedirs(log_folder)
-log_path = Path(log_folder).resolve()
-logger.add(log_path / "gpt_cover_letter_job_descr.log", rotation="1 day", compression="zip", retention="7 days", level="DEBUG")
 
 class LLMCoverLetterJobDescription:
     def __init__(self, openai_api_key, strings):
-        self.llm_cheap = LoggerChatModel(ChatOpenAI(model_name="gpt-4o-mini", openai_api_key=openai_api_key, temperature=0.4))
-        self.llm_embeddings = OpenAIEmbeddings(openai_api_key=openai_api_key)
+        self.llm_cheap = LoggerChatModel(get_chat_model(OPENAI, "gpt-4o-mini", api_key=openai_api_key, temperature=0.4))
+        self.llm_embeddings = get_embeddings(api_key=openai_api_key)
         self.strings = strings
 
     @staticmethod
@@ -56,11 +49,26 @@ class LLMCoverLetterJobDescription:
             job_description_text (str): The plain text job description to be used.
         """
         logger.debug("Starting job description summarization...")
-        prompt = ChatPromptTemplate.from_template(self.strings.summarize_prompt_template)
+        prompt = chat_prompt_from_template(self.strings.summarize_prompt_template)
         chain = prompt | self.llm_cheap | StrOutputParser()
-        output = chain.invoke({"text": job_description_text})
+        with token_budget("summarize_prompt_template", self.strings.summarize_prompt_template,
+                          {"text": job_description_text}, "text") as input_data:
+            output = chain.invoke(input_data)
         self.job_description = output
-        logger.debug(f"Job description summarization complete: {self.job_description}")
+        logger.opt(lazy=True).debug("Job description summarization complete: {}", lambda: truncate(self.job_description))
+
+    def get_cover_letter_prompt(self) -> tuple:
+        """
+        Collect the cover letter prompt template and variables without calling the LLM.
+        Returns:
+            tuple: (prompt template, input data).
+        """
+        template = self._preprocess_template_string(self.strings.cover_letter_template)
+        input_data, _ = budget_inputs(
+            "cover_letter_template", template,
+            {"job_description": self.job_description, "resume": self.resume}, "job_description",
+        )
+        return template, input_data
 
     def generate_cover_letter(self) -> str:
         """
@@ -70,22 +78,23 @@ class LLMCoverLetterJobDescription:
         """
         logger.debug("Starting cover letter generation...")
         prompt_template = self._preprocess_template_string(self.strings.cover_letter_template)
-        logger.debug(f"Cover letter template after preprocessing: {prompt_template}")
+        logger.opt(lazy=True).debug("Cover letter template after preprocessing: {}", lambda: truncate(prompt_template))
 
-        prompt = ChatPromptTemplate.from_template(prompt_template)
-        logger.debug(f"Prompt created: {prompt}")
+        prompt = chat_prompt_from_template(prompt_template)
+        logger.opt(lazy=True).debug("Prompt created: {}", lambda: truncate(prompt))
 
         chain = prompt | self.llm_cheap | StrOutputParser()
-        logger.debug(f"Chain created: {chain}")
+        logger.opt(lazy=True).debug("Chain created: {}", lambda: truncate(chain))
 
         input_data = {
             "job_description": self.job_description,
             "resume": self.resume
         }
-        logger.debug(f"Input data: {input_data}")
+        logger.opt(lazy=True).debug("Input data: {}", lambda: truncate(input_data))
 
-        output = chain.invoke(input_data)
-        logger.debug(f"Cover letter generation result: {output}")
+        with token_budget("cover_letter_template", prompt_template, input_data, "job_description") as input_data:
+            output = chain.invoke(input_data)
+        logger.opt(lazy=True).debug("Cover letter generation result: {}", lambda: truncate(output))
 
         logger.debug("Cover letter generation completed")
         return output
@@ -2,33 +2,52 @@
 Create a class that generates a resume based on a resume and a resume template.
 """
 # app/libs/resume_and_cover_builder/gpt_resume.py
-import os
+import contextvars
 import textwrap
-from src.libs.resume_and_cover_builder.utils import LoggerChatModel
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
+from src.libs.resume_and_cover_builder.utils import LoggerChatModel, chat_prompt_from_template
+from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
+from src.libs.llm_clients import get_chat_model
+from src.libs.llm_context import llm_call_annotations
+from src.libs.llm_costs import BudgetExceededError
+import config as cfg
+from src.libs.llm_cache import describe_llm
+from src.libs.resume_and_cover_builder.document_builder import ResumeDocumentBuilder
+from src.libs.resume_and_cover_builder.section_cache import JOB_DESCRIPTION_VARIABLE, get_section_cache, section_cache_key
+from src.libs.resume_and_cover_builder.template_base import (
+    PAYLOAD_MARKER,
+    cache_friendly_prompt,
+    prompt_structured_resume_intro,
+    prompt_structured_resume_output,
+)
+from src.libs.tracing import trace_span
+from src.utils.constants import OPENAI
 from dotenv import load_dotenv
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional, Tuple
 from loguru import logger
-from pathlib import Path
+from src.logging import truncate
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure log file
-log_folder = 'log/resume/gpt_resume'
-if not os.path.exists(log_folder):
-    os.makedirs(log_folder)
-log_path = Path(log_folder).resolve()
-logger.add(log_path / "gpt_resume.log", rotation="1 day", compression="zip", retention="7 days", level="DEBUG")
 
 class LLMResumer:
+    # Resume section -> attribute of the strings module holding its prompt template, in document order
+    SECTION_TEMPLATES = {
+        "header": "prompt_header",
+        "education": "prompt_education",
+        "work_experience": "prompt_working_experience",
+        "projects": "prompt_projects",
+        "achievements": "prompt_achievements",
+        "certifications": "prompt_certifications",
+        "additional_skills": "prompt_additional_skills",
+    }
+    # Template name of the single call generating every section in structured mode
+    STRUCTURED_TEMPLATE = "prompt_structured_resume"
+
     def __init__(self, openai_api_key, strings):
         self.llm_cheap = LoggerChatModel(
-            ChatOpenAI(
-                model_name="gpt-4o-mini", openai_api_key=openai_api_key, temperature=0.4
-            )
+            get_chat_model(OPENAI, "gpt-4o-mini", api_key=openai_api_key, temperature=0.4)
         )
         self.strings = strings
 
@@ -62,7 +81,7 @@ class LLMResumer:
         header_prompt_template = self._preprocess_template_string(
             self.strings.prompt_header
         )
-        prompt = ChatPromptTemplate.from_template(header_prompt_template)
+        prompt = chat_prompt_from_template(header_prompt_template)
         chain = prompt | self.llm_cheap | StrOutputParser()
         input_data = {
             "personal_information": self.resume.personal_information
@@ -81,19 +100,19 @@ class LLMResumer:
         logger.debug("Starting education section generation")
 
         education_prompt_template = self._preprocess_template_string(self.strings.prompt_education)
-        logger.debug(f"Education template: {education_prompt_template}")
+        logger.opt(lazy=True).debug("Education template: {}", lambda: truncate(education_prompt_template))
 
-        prompt = ChatPromptTemplate.from_template(education_prompt_template)
-        logger.debug(f"Prompt: {prompt}")
+        prompt = chat_prompt_from_template(education_prompt_template)
+        logger.opt(lazy=True).debug("Prompt: {}", lambda: truncate(prompt))
         
         chain = prompt | self.llm_cheap | StrOutputParser()
-        logger.debug(f"Chain created: {chain}")
+        logger.opt(lazy=True).debug("Chain created: {}", lambda: truncate(chain))
         
         input_data = {
             "education_details": self.resume.education_details
         } if data is None else data
         output = chain.invoke(input_data)
-        logger.debug(f"Chain invocation result: {output}")
+        logger.opt(lazy=True).debug("Chain invocation result: {}", lambda: truncate(output))
 
         logger.debug("Education section generation completed")
         return output
@@ -109,19 +128,19 @@ class LLMResumer:
         logger.debug("Starting work experience section generation")
 
         work_experience_prompt_template = self._preprocess_template_string(self.strings.prompt_working_experience)
-        logger.debug(f"Work experience template: {work_experience_prompt_template}")
+        logger.opt(lazy=True).debug("Work experience template: {}", lambda: truncate(work_experience_prompt_template))
 
-        prompt = ChatPromptTemplate.from_template(work_experience_prompt_template)
-        logger.debug(f"Prompt: {prompt}")
+        prompt = chat_prompt_from_template(work_experience_prompt_template)
+        logger.opt(lazy=True).debug("Prompt: {}", lambda: truncate(prompt))
         
         chain = prompt | self.llm_cheap | StrOutputParser()
-        logger.debug(f"Chain created: {chain}")
+        logger.opt(lazy=True).debug("Chain created: {}", lambda: truncate(chain))
         
         input_data = {
             "experience_details": self.resume.experience_details
         } if data is None else data
         output = chain.invoke(input_data)
-        logger.debug(f"Chain invocation result: {output}")
+        logger.opt(lazy=True).debug("Chain invocation result: {}", lambda: truncate(output))
 
         logger.debug("Work experience section generation completed")
         return output
@@ -137,19 +156,19 @@ class LLMResumer:
         logger.debug("Starting side projects section generation")
 
         projects_prompt_template = self._preprocess_template_string(self.strings.prompt_projects)
-        logger.debug(f"Side projects template: {projects_prompt_template}")
+        logger.opt(lazy=True).debug("Side projects template: {}", lambda: truncate(projects_prompt_template))
 
-        prompt = ChatPromptTemplate.from_template(projects_prompt_template)
-        logger.debug(f"Prompt: {prompt}")
+        prompt = chat_prompt_from_template(projects_prompt_template)
+        logger.opt(lazy=True).debug("Prompt: {}", lambda: truncate(prompt))
         
         chain = prompt | self.llm_cheap | StrOutputParser()
-        logger.debug(f"Chain created: {chain}")
+        logger.opt(lazy=True).debug("Chain created: {}", lambda: truncate(chain))
         
         input_data = {
             "projects": self.resume.projects
         } if data is None else data
         output = chain.invoke(input_data)
-        logger.debug(f"Chain invocation result: {output}")
+        logger.opt(lazy=True).debug("Chain invocation result: {}", lambda: truncate(output))
 
         logger.debug("Side projects section generation completed")
         return output
@@ -165,22 +184,22 @@ class LLMResumer:
         logger.debug("Starting achievements section generation")
 
         achievements_prompt_template = self._preprocess_template_string(self.strings.prompt_achievements)
-        logger.debug(f"Achievements template: {achievements_prompt_template}")
+        logger.opt(lazy=True).debug("Achievements template: {}", lambda: truncate(achievements_prompt_template))
 
-        prompt = ChatPromptTemplate.from_template(achievements_prompt_template)
-        logger.debug(f"Prompt: {prompt}")
+        prompt = chat_prompt_from_template(achievements_prompt_template)
+        logger.opt(lazy=True).debug("Prompt: {}", lambda: truncate(prompt))
 
         chain = prompt | self.llm_cheap | StrOutputParser()
-        logger.debug(f"Chain created: {chain}")
+        logger.opt(lazy=True).debug("Chain created: {}", lambda: truncate(chain))
 
         input_data = {
             "achievements": self.resume.achievements,
             "certifications": self.resume.certifications,
         } if data is None else data
-        logger.debug(f"Input data for the chain: {input_data}")
+        logger.opt(lazy=True).debug("Input data for the chain: {}", lambda: truncate(input_data))
 
         output = chain.invoke(input_data)
-        logger.debug(f"Chain invocation result: {output}")
+        logger.opt(lazy=True).debug("Chain invocation result: {}", lambda: truncate(output))
 
         logger.debug("Achievements section generation completed")
         return output
@@ -194,21 +213,21 @@ class LLMResumer:
         logger.debug("Starting Certifications section generation")
 
         certifications_prompt_template = self._preprocess_template_string(self.strings.prompt_certifications)
-        logger.debug(f"Certifications template: {certifications_prompt_template}")
+        logger.opt(lazy=True).debug("Certifications template: {}", lambda: truncate(certifications_prompt_template))
 
-        prompt = ChatPromptTemplate.from_template(certifications_prompt_template)
-        logger.debug(f"Prompt: {prompt}")
+        prompt = chat_prompt_from_template(certifications_prompt_template)
+        logger.opt(lazy=True).debug("Prompt: {}", lambda: truncate(prompt))
 
         chain = prompt | self.llm_cheap | StrOutputParser()
-        logger.debug(f"Chain created: {chain}")
+        logger.opt(lazy=True).debug("Chain created: {}", lambda: truncate(chain))
 
         input_data = {
             "certifications": self.resume.certifications
         } if data is None else data
-        logger.debug(f"Input data for the chain: {input_data}")
+        logger.opt(lazy=True).debug("Input data for the chain: {}", lambda: truncate(input_data))
 
         output = chain.invoke(input_data)
-        logger.debug(f"Chain invocation result: {output}")
+        logger.opt(lazy=True).debug("Chain invocation result: {}", lambda: truncate(output))
 
         logger.debug("Certifications section generation completed")
         return output
@@ -221,6 +240,25 @@ class LLMResumer:
         """
         additional_skills_prompt_template = self._preprocess_template_string(self.strings.prompt_additional_skills)
         
+        skills = self._collect_skills()
+        prompt = chat_prompt_from_template(additional_skills_prompt_template)
+        chain = prompt | self.llm_cheap | StrOutputParser()
+        input_data = {
+            "languages": self.resume.languages,
+            "interests": self.resume.interests,
+            "skills": skills,
+        } if data is None else data
+        output = chain.invoke(input_data)
+        
+        return output
+
+    def _collect_skills(self) -> list:
+        """
+        Collect the skills listed across work experience and education exams.
+        Returns:
+            list: The collected skills, sorted so the rendered prompt is the same in every process
+            (set order follows string hash randomisation) and stays cacheable.
+        """
         skills = set()
         if self.resume.experience_details:
             for exp in self.resume.experience_details:
@@ -232,82 +270,138 @@ class LLMResumer:
                 if edu.exam:
                     for exam in edu.exam:
                         skills.update(exam.keys())
-        prompt = ChatPromptTemplate.from_template(additional_skills_prompt_template)
-        chain = prompt | self.llm_cheap | StrOutputParser()
-        input_data = {
-            "languages": self.resume.languages,
-            "interests": self.resume.interests,
-            "skills": skills,
-        } if data is None else data
-        output = chain.invoke(input_data)
-        
-        return output
+        return sorted(skills)
 
-    def generate_html_resume(self) -> str:
+    def _section_has_content(self, section: str) -> bool:
         """
-        Generate the full HTML resume based on the resume object.
+        Check whether the resume has the data a section is generated from.
+        Args:
+            section (str): The section name, one of SECTION_TEMPLATES.
         Returns:
-            str: The generated HTML resume.
+            bool: True if the section should be generated.
         """
-        def header_fn():
-            if self.resume.personal_information:
-                return self.generate_header()
-            return ""
-
-        def education_fn():
-            if self.resume.education_details:
-                return self.generate_education_section()
-            return ""
-
-        def work_experience_fn():
-            if self.resume.experience_details:
-                return self.generate_work_experience_section()
-            return ""
-
-        def projects_fn():
-            if self.resume.projects:
-                return self.generate_projects_section()
-            return ""
-
-        def achievements_fn():
-            if self.resume.achievements:
-                return self.generate_achievements_section()
-            return ""
-        
-        def certifications_fn():
-            if self.resume.certifications:
-                return self.generate_certifications_section()
-            return ""
-
-        def additional_skills_fn():
-            if (self.resume.experience_details or self.resume.education_details or
-                self.resume.languages or self.resume.interests):
-                return self.generate_additional_skills_section()
-            return ""
-
-        # Create a dictionary to map the function names to their respective callables
-        functions = {
-            "header": header_fn,
-            "education": education_fn,
-            "work_experience": work_experience_fn,
-            "projects": projects_fn,
-            "achievements": achievements_fn,
-            "certifications": certifications_fn,
-            "additional_skills": additional_skills_fn,
+        if section == "header":
+            return bool(self.resume.personal_information)
+        if section == "education":
+            return bool(self.resume.education_details)
+        if section == "work_experience":
+            return bool(self.resume.experience_details)
+        if section == "projects":
+            return bool(self.resume.projects)
+        if section == "achievements":
+            return bool(self.resume.achievements)
+        if section == "certifications":
+            return bool(self.resume.certifications)
+        if section == "additional_skills":
+            return bool(self.resume.experience_details or self.resume.education_details or
+                        self.resume.languages or self.resume.interests)
+        raise ValueError(f"Unknown resume section: {section}")
+
+    def _section_input_data(self, section: str) -> dict:
+        """
+        Build the prompt variables of a section.
+        Args:
+            section (str): The section name, one of SECTION_TEMPLATES.
+        Returns:
+            dict: The variables used to fill the section's prompt template.
+        """
+        if section == "header":
+            return {"personal_information": self.resume.personal_information}
+        if section == "education":
+            return {"education_details": self.resume.education_details}
+        if section == "work_experience":
+            return {"experience_details": self.resume.experience_details}
+        if section == "projects":
+            return {"projects": self.resume.projects}
+        if section == "achievements":
+            return {"achievements": self.resume.achievements, "certifications": self.resume.certifications}
+        if section == "certifications":
+            return {"certifications": self.resume.certifications}
+        if section == "additional_skills":
+            return {
+                "languages": self.resume.languages,
+                "interests": self.resume.interests,
+                "skills": self._collect_skills(),
+            }
+        raise ValueError(f"Unknown resume section: {section}")
+
+    def get_section_prompts(self) -> dict:
+        """
+        Collect the prompt template and variables of every section the resume has content for,
+        without calling the LLM.
+        Returns:
+            dict: Section name -> (prompt template, input data).
+        """
+        return {
+            section: (
+                self._preprocess_template_string(getattr(self.strings, template_name)),
+                self._section_input_data(section),
+            )
+            for section, template_name in self.SECTION_TEMPLATES.items()
+            if self._section_has_content(section)
         }
 
-        # Use ThreadPoolExecutor to run the functions in parallel
-        with ThreadPoolExecutor() as executor:
-            future_to_section = {executor.submit(fn): section for section, fn in functions.items()}
-            results = {}
-            for future in as_completed(future_to_section):
-                section = future_to_section[future]
-                try:
-                    result = future.result()
-                    if result:
-                        results[section] = result
-                except Exception as exc:
-                    logger.error(f'{section} raised an exception: {exc}')
+    def get_structured_prompt(self, sections: Optional[List[str]] = None) -> Tuple[str, dict]:
+        """
+        Build the prompt generating several sections in one call: the instructions and HTML template
+        of every section, then each resume variable and the job description once, answered as a
+        JSON object keyed by section.
+        Args:
+            sections (list): The sections to generate, every section the resume has content for by default.
+        Returns:
+            tuple: (prompt template, input data).
+        """
+        section_prompts = self.get_section_prompts()
+        if sections is not None:
+            section_prompts = {section: section_prompts[section] for section in sections}
+        instructions = []
+        input_data = {}
+        for section, (template, data) in section_prompts.items():
+            instructions.append(f'## Section "{section}"\n{template.split(PAYLOAD_MARKER, 1)[0].strip()}')
+            input_data.update(data)
+        # The job description is the largest variable, sent once after the resume data
+        job_description = input_data.pop(JOB_DESCRIPTION_VARIABLE, None)
+        if job_description is not None:
+            input_data[JOB_DESCRIPTION_VARIABLE] = job_description
+        keys = ", ".join(f'"{section}"' for section in section_prompts)
+        static_prefix = "\n\n".join(
+            [prompt_structured_resume_intro.strip()] + instructions
+            + [prompt_structured_resume_output.format(keys=keys).strip()]
+        )
+        payload = "\n\n".join(
+            f"- **{name.replace('_', ' ').capitalize()}:**  \n  {{{name}}}" for name in input_data
+        )
+        return cache_friendly_prompt(static_prefix, payload), input_data
+
+    def section_cache_keys(self, section_prompts: dict) -> dict:
+        """
+        Key the sections of get_section_prompts in the section cache. A section depends on the job
+        only when its template reads the job description and it is not listed in
+        RESUME_SECTION_CACHE_JOB_INDEPENDENT; otherwise it is reused across jobs.
+        Args:
+            section_prompts (dict): Section name -> (prompt template, input data).
+        Returns:
+            dict: Section name -> cache key.
+        """
+        provider, model, temperature = describe_llm(self.llm_cheap.llm)
+        keys = {}
+        for section, (template, input_data) in section_prompts.items():
+            job_dependent = (
+                JOB_DESCRIPTION_VARIABLE in chat_prompt_from_template(template).input_variables
+                and section not in cfg.RESUME_SECTION_CACHE_JOB_INDEPENDENT
+            )
+            keys[section] = section_cache_key(section, template, input_data, job_dependent, provider, model, temperature)
+        return keys
+
+    @staticmethod
+    def assemble_html_resume(results: dict) -> str:
+        """
+        Assemble the generated sections into the resume body.
+        Args:
+            results (dict): Section name -> generated HTML.
+        Returns:
+            str: The HTML resume body.
+        """
         full_resume = "<body>\n"
         full_resume += f"  {results.get('header', '')}\n"
         full_resume += "  <main>\n"
@@ -320,3 +414,164 @@ class LLMResumer:
         full_resume += "  </main>\n"
         full_resume += "</body>"
         return full_resume
+
+    def generate_html_resume(self) -> str:
+        """
+        Generate the full HTML resume based on the resume object, one LLM call per section in parallel.
+        Every section is generated from the template and variables of get_section_prompts, the same
+        ones its section cache key is built from.
+        Returns:
+            str: The generated HTML resume.
+        Raises:
+            BudgetExceededError: When a hard spend limit is reached; the resume is not assembled.
+        """
+        section_prompts = self.get_section_prompts()
+        section_cache = get_section_cache()
+        cache_keys = self.section_cache_keys(section_prompts)
+
+        def run_section(section: str) -> str:
+            template, input_data = section_prompts[section]
+            # The template name keys the latency history used for hedging and appears in the call log
+            with llm_call_annotations(template=self.SECTION_TEMPLATES[section]), trace_span(f"section {section}", "pipeline") as span:
+                cached = section_cache.get(cache_keys[section])
+                if cached is not None:
+                    logger.debug(f"Resume section '{section}' served from the section cache")
+                    span.set(cache_hit=True)
+                    return cached
+                chain = chat_prompt_from_template(template) | self.llm_cheap | StrOutputParser()
+                html = chain.invoke(input_data)
+                section_cache.put(cache_keys[section], section, html)
+                return html
+
+        # Use ThreadPoolExecutor to run the sections in parallel
+        with ThreadPoolExecutor() as executor:
+            # Run each section in a copy of the caller's context so call annotations reach the log
+            future_to_section = {
+                executor.submit(contextvars.copy_context().run, run_section, section): section
+                for section in section_prompts
+            }
+            results = {}
+            for future in as_completed(future_to_section):
+                section = future_to_section[future]
+                try:
+                    result = future.result()
+                    if result:
+                        results[section] = result
+                except BudgetExceededError:
+                    # A hard spend limit pauses tailoring instead of producing an incomplete resume
+                    for pending in future_to_section:
+                        pending.cancel()
+                    raise
+                except Exception as exc:
+                    logger.error(f'{section} raised an exception: {exc}')
+        return self.assemble_html_resume(results)
+
+    def generate_html_resume_structured(self, on_event: Optional[Callable[[dict], None]] = None,
+                                        fallback: bool = True) -> str:
+        """
+        Generate the full HTML resume with a single LLM call answering every section in a JSON object,
+        instead of one call per section. Sections found in the section cache are left out of the call.
+        If the reply cannot be parsed, the sections are generated with generate_html_resume instead.
+        Args:
+            on_event (Callable): Receives the progress events of ResumeDocumentBuilder once the reply is parsed.
+            fallback (bool): False raises the parsing error instead of generating one section per call.
+        Returns:
+            str: The generated HTML resume, same layout as generate_html_resume.
+        """
+        section_prompts = self.get_section_prompts()
+        section_cache = get_section_cache()
+        cache_keys = self.section_cache_keys(section_prompts)
+        results = {}
+        for section in section_prompts:
+            cached = section_cache.get(cache_keys[section])
+            if cached is not None:
+                logger.debug(f"Resume section '{section}' served from the section cache")
+                results[section] = cached
+
+        missing = [section for section in section_prompts if section not in results]
+        if missing:
+            template, input_data = self.get_structured_prompt(missing)
+            chain = chat_prompt_from_template(template) | self.llm_cheap | JsonOutputParser()
+            try:
+                with llm_call_annotations(template=self.STRUCTURED_TEMPLATE), trace_span("sections structured", "pipeline", sections=len(missing)):
+                    reply = chain.invoke(input_data)
+                if not isinstance(reply, dict):
+                    raise ValueError(f"expected a JSON object, got {type(reply).__name__}")
+            except BudgetExceededError:
+                raise
+            except Exception as exc:
+                if not fallback:
+                    raise
+                logger.error(f"Structured resume generation failed, generating one section per call: {exc}")
+                return self.generate_html_resume()
+            for section in missing:
+                html = reply.get(section)
+                if not isinstance(html, str) or not html.strip():
+                    logger.error(f"Structured resume reply has no '{section}' section")
+                    continue
+                results[section] = html
+                section_cache.put(cache_keys[section], section, html)
+
+        if on_event is None:
+            return self.assemble_html_resume(results)
+        builder = ResumeDocumentBuilder(list(self.SECTION_TEMPLATES), on_event)
+        for section in self.SECTION_TEMPLATES:
+            if section in results:
+                builder.start(section)
+                builder.append(section, results[section])
+            builder.complete(section)
+        return builder.getvalue()
+
+    def generate_html_resume_streaming(self, on_event: Optional[Callable[[dict], None]] = None) -> str:
+        """
+        Generate the full HTML resume with every section streamed in parallel into an incremental
+        document builder, so the document is written in order while the slower sections are still
+        being generated, and progress events are reported as tokens arrive.
+        Args:
+            on_event (Callable): Receives the progress events of ResumeDocumentBuilder.
+        Returns:
+            str: The generated HTML resume, same layout as generate_html_resume.
+        """
+        builder = ResumeDocumentBuilder(list(self.SECTION_TEMPLATES), on_event)
+        section_prompts = self.get_section_prompts()
+        section_cache = get_section_cache()
+        cache_keys = self.section_cache_keys(section_prompts)
+
+        def stream_section(section: str) -> None:
+            template, input_data = section_prompts[section]
+            builder.start(section)
+            cached = section_cache.get(cache_keys[section])
+            if cached is not None:
+                logger.debug(f"Resume section '{section}' served from the section cache")
+                builder.append(section, cached)
+                builder.complete(section)
+                return
+            chain = chat_prompt_from_template(template) | self.llm_cheap | StrOutputParser()
+            chunks = []
+            try:
+                with llm_call_annotations(template=self.SECTION_TEMPLATES[section]), trace_span(f"section {section}", "pipeline"):
+                    for chunk in chain.stream(input_data):
+                        chunks.append(chunk)
+                        builder.append(section, chunk)
+            except BudgetExceededError:
+                builder.complete(section, failed=True)
+                raise
+            except Exception as exc:
+                logger.error(f'{section} raised an exception: {exc}')
+                builder.complete(section, failed=True)
+                return
+            section_cache.put(cache_keys[section], section, "".join(chunks))
+            builder.complete(section)
+
+        for section in self.SECTION_TEMPLATES:
+            if section not in section_prompts:
+                builder.complete(section)
+        with ThreadPoolExecutor() as executor:
+            futures = [executor.submit(contextvars.copy_context().run, stream_section, section) for section in section_prompts]
+            for future in as_completed(futures):
+                # Only a hard spend limit gets here, the other section errors are reported by the builder
+                if future.exception() is not None:
+                    for pending in futures:
+                        pending.cancel()
+                    raise future.exception()
+        return builder.getvalue()
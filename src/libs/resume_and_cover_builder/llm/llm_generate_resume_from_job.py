@@ -2,24 +2,17 @@
 Create a class that generates a job description based on a resume and a job description template.
 """
 # app/libs/resume_and_cover_builder/llm_generate_resume_from_job.py
-import os
 from src.libs.resume_and_cover_builder.llm.llm_generate_resume import LLMResumer
-from src.libs.resume_and_cover_builder.utils import LoggerChatModel
+from src.libs.resume_and_cover_builder.utils import LoggerChatModel, chat_prompt_from_template
+from src.libs.prompt_budget import token_budget
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
 from loguru import logger
-from pathlib import Path
 
 # Load environment variables from .env file
 load_dotenv()
 
-log_folder = 'log/resume/gpt_resum_job_descr'
-if not os.path.exists(log_folder):
-    os.makedirs(log_folder)
-log_path = Path(log_folder).resolve()
-logger.add(log_path / "gpt_resum_job_descr.log", rotation="1 day", compression="zip", retention="7 days", level="DEBUG")
 
 class LLMResumeJobDescription(LLMResumer):
     def __init__(self, openai_api_key, strings):
@@ -31,11 +24,27 @@ class LLMResumeJobDescription(LLMResumer):
         Args:
             job_description_text (str): The plain text job description to be used.
         """
-        prompt = ChatPromptTemplate.from_template(self.strings.summarize_prompt_template)
+        prompt = chat_prompt_from_template(self.strings.summarize_prompt_template)
         chain = prompt | self.llm_cheap | StrOutputParser()
-        output = chain.invoke({"text": job_description_text})
+        with token_budget("summarize_prompt_template", self.strings.summarize_prompt_template,
+                          {"text": job_description_text}, "text") as input_data:
+            output = chain.invoke(input_data)
         self.job_description = output
     
+    def _section_input_data(self, section: str) -> dict:
+        """
+        Build the prompt variables of a section, including the summarized job description.
+        Args:
+            section (str): The section name, one of SECTION_TEMPLATES.
+        Returns:
+            dict: The variables used to fill the section's prompt template.
+        """
+        data = super()._section_input_data(section)
+        if section == "achievements":
+            data.pop("certifications")
+        data["job_description"] = self.job_description
+        return data
+
     def generate_header(self) -> str:
         """
         Generate the header section of the resume.
@@ -112,18 +121,8 @@ class LLMResumeJobDescription(LLMResumer):
         additional_skills_prompt_template = self._preprocess_template_string(
             self.strings.prompt_additional_skills
         )
-        skills = set()
-        if self.resume.experience_details:
-            for exp in self.resume.experience_details:
-                if exp.skills_acquired:
-                    skills.update(exp.skills_acquired)
-
-        if self.resume.education_details:
-            for edu in self.resume.education_details:
-                if edu.exam:
-                    for exam in edu.exam:
-                        skills.update(exam.keys())
-        prompt = ChatPromptTemplate.from_template(additional_skills_prompt_template)
+        skills = self._collect_skills()
+        prompt = chat_prompt_from_template(additional_skills_prompt_template)
         chain = prompt | self.llm_cheap | StrOutputParser()
         output = chain.invoke({
             "languages": self.resume.languages,
@@ -6,15 +6,15 @@ import re  # For email validation
 from src.libs.resume_and_cover_builder.utils import LoggerChatModel
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
-from langchain_openai import ChatOpenAI
+from src.libs.llm_clients import get_chat_model, get_embeddings
+from src.utils.constants import OPENAI
 from dotenv import load_dotenv
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from loguru import logger
-from pathlib import Path
+from src.logging import truncate
 from langchain_core.prompt_values import StringPromptValue
 from langchain_core.runnables import RunnablePassthrough
 from langchain_text_splitters import TokenTextSplitter
-from langchain_community.embeddings import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain_community.document_loaders import TextLoader
 from requests.exceptions import HTTPError as HTTPStatusError  # HTTP error handling
@@ -23,22 +23,13 @@ import openai
 # Load environment variables from the .env file
 load_dotenv()
 
-# Configure the log file
-log_folder = 'log/resume/gpt_resume'
-if not os.path.exists(log_folder):
-    os.makedirs(log_folder)
-log_path = Path(log_folder).resolve()
-logger.add(log_path / "gpt_resume.log", rotation="1 day", compression="zip", retention="7 days", level="DEBUG")
-
 
 class LLMParser:
     def __init__(self, openai_api_key):
         self.llm = LoggerChatModel(
-            ChatOpenAI(
-                model_name="gpt-4o-mini", openai_api_key=openai_api_key, temperature=0.4
-            )
+            get_chat_model(OPENAI, "gpt-4o-mini", api_key=openai_api_key, temperature=0.4)
         )
-        self.llm_embeddings = OpenAIEmbeddings(openai_api_key=openai_api_key)  # Initialize embeddings
+        self.llm_embeddings = get_embeddings(api_key=openai_api_key)  # Shared embeddings client
         self.vectorstore = None  # Will be initialized after document loading
 
     @staticmethod
@@ -102,7 +93,7 @@ class LLMParser:
         retriever = self.vectorstore.as_retriever()
         retrieved_docs = retriever.get_relevant_documents(query)[:top_k]
         context = "\n\n".join(doc.page_content for doc in retrieved_docs)
-        logger.debug(f"Context retrieved for query '{query}': {context[:200]}...")  # Log the first 200 characters
+        logger.opt(lazy=True).debug("Context retrieved for query '{}': {}", lambda: truncate(query), lambda: truncate(context, 200))
         return context
     
     def _extract_information(self, question: str, retrieval_query: str) -> str:
@@ -129,13 +120,13 @@ class LLMParser:
         )
         
         formatted_prompt = prompt.format(context=context, question=question)
-        logger.debug(f"Formatted prompt for extraction: {formatted_prompt[:200]}...")  # Log the first 200 characters
+        logger.opt(lazy=True).debug("Formatted prompt for extraction: {}", lambda: truncate(formatted_prompt, 200))
         
         try:
             chain = prompt | self.llm | StrOutputParser()
             result = chain.invoke({"context": context, "question": question})
             extracted_info = result.strip()
-            logger.debug(f"Extracted information: {extracted_info}")
+            logger.opt(lazy=True).debug("Extracted information: {}", lambda: truncate(extracted_info))
             return extracted_info
         except Exception as e:  
             logger.error(f"Error during information extraction: {e}")
@@ -10,6 +10,8 @@ from loguru import logger
 
 # from src.libs.resume_and_cover_builder.llm.llm_job_parser import LLMParser
 from src.job import Job
+from src.libs.llm_context import llm_call_annotations
+from src.libs.tracing import trace_span
 from src.utils.chrome_utils import HTML_to_PDF
 from .config import global_config
 
@@ -87,6 +89,22 @@ class ResumeFacade:
     #     logger.info(f"Extracting job details from URL: {job_url}")
 
 
+    def _job_key(self) -> str:
+        """
+        Identify the current job in the LLM spend ledger: its link, or role and company without one.
+        """
+        return self.job.link or f"{self.job.role} @ {self.job.company}"
+
+    @staticmethod
+    def _log_progress(event: dict) -> None:
+        """
+        Log the section progress events of streamed resume generation.
+        """
+        if event["type"] == "section_completed":
+            logger.info(f"Resume section '{event['section']}' ready ({event['completed']}/{event['total']}, {event['elapsed']:.1f}s)")
+        elif event["type"] == "document_completed":
+            logger.info(f"Resume body complete after {event['elapsed']:.1f}s")
+
     def create_resume_pdf_job_tailored(self) -> tuple[bytes, str]:
         """
         Create a resume PDF using the selected style and the given job description text.
@@ -101,13 +119,17 @@ class ResumeFacade:
             raise ValueError("You must choose a style before generating the PDF.")
 
 
-        html_resume = self.resume_generator.create_resume_job_description_text(style_path, self.job.description)
+        with llm_call_annotations(job=self._job_key()):
+            html_resume = self.resume_generator.create_resume_job_description_text(
+                style_path, self.job.description, on_event=self._log_progress
+            )
 
         # Generate a unique name using the job URL hash
         # suggested_name = hashlib.md5(self.job.link.encode()).hexdigest()[:10]
         suggested_name = f'{self.job.role.lower().replace(",", "").replace(" ", "_")}_{self.job.company.lower().replace(" ", "_")}'
         
-        result = HTML_to_PDF(html_resume, self.driver)
+        with trace_span("html_to_pdf", "pipeline"):
+            result = HTML_to_PDF(html_resume, self.driver)
         self.driver.quit()
         return result, suggested_name
     
@@ -127,7 +149,8 @@ class ResumeFacade:
             raise ValueError("You must choose a style before generating the PDF.")
         
         html_resume = self.resume_generator.create_resume(style_path)
-        result = HTML_to_PDF(html_resume, self.driver)
+        with trace_span("html_to_pdf", "pipeline"):
+            result = HTML_to_PDF(html_resume, self.driver)
         self.driver.quit()
         return result
 
@@ -145,13 +168,15 @@ class ResumeFacade:
             raise ValueError("You must choose a style before generating the PDF.")
         
         
-        cover_letter_html = self.resume_generator.create_cover_letter_job_description(style_path, self.job.description)
+        with llm_call_annotations(job=self._job_key()):
+            cover_letter_html = self.resume_generator.create_cover_letter_job_description(style_path, self.job.description)
 
         # Generate a unique name using the job URL hash
         # suggested_name = hashlib.md5(self.job.link.encode()).hexdigest()[:10]
         suggested_name = f'{self.job.role.lower().replace(",", "").replace(" ", "_")}_{self.job.company.lower().replace(" ", "_")}'
 
         
-        result = HTML_to_PDF(cover_letter_html, self.driver)
+        with trace_span("html_to_pdf", "pipeline"):
+            result = HTML_to_PDF(cover_letter_html, self.driver)
         self.driver.quit()
         return result, suggested_name
\ No newline at end of file
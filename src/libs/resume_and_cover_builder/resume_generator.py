@@ -3,10 +3,18 @@ This module is responsible for generating resumes and cover letters using the LL
 """
 # app/libs/resume_and_cover_builder/resume_generator.py
 from string import Template
-from typing import Any
+from typing import Any, Callable, Dict
+from loguru import logger
+import config as cfg
+from src.libs.llm_cache import describe_llm
+from src.libs.llm_costs import BudgetExceededError, CostLedger, get_cost_ledger
+from src.libs.prompt_budget import budget_inputs
+from src.libs.resume_and_cover_builder.batch_backend import BatchBackend, batch_usage, build_batch_request
 from src.libs.resume_and_cover_builder.llm.llm_generate_resume import LLMResumer
 from src.libs.resume_and_cover_builder.llm.llm_generate_resume_from_job import LLMResumeJobDescription
 from src.libs.resume_and_cover_builder.llm.llm_generate_cover_letter_from_job import LLMCoverLetterJobDescription
+from src.libs.tracing import trace_span
+from src.utils.constants import FAN_OUT, STRUCTURED
 from .module_loader import load_module
 from .config import global_config
 
@@ -18,7 +26,8 @@ class ResumeGenerator:
          self.resume_object = resume_object
          
 
-    def _create_resume(self, gpt_answerer: Any, style_path):
+    def _create_resume(self, gpt_answerer: Any, style_path, on_event: Callable[[dict], None] = None,
+                       mode: str = None):
         # Imposta il resume nell'oggetto gpt_answerer
         gpt_answerer.set_resume(self.resume_object)
         
@@ -33,33 +42,200 @@ class ResumeGenerator:
         except Exception as e:
             raise RuntimeError(f"Errore durante la lettura del file CSS: {e}")
         
-        # Genera l'HTML del resume
-        body_html = gpt_answerer.generate_html_resume()
+        # Genera l'HTML del resume: una chiamata per sezione (in streaming se è richiesto il progresso)
+        # oppure una sola chiamata strutturata per tutte le sezioni
+        mode = mode or cfg.RESUME_GENERATION_MODE
+        if mode not in (FAN_OUT, STRUCTURED):
+            raise ValueError(f"Unknown resume generation mode: {mode}, expected {FAN_OUT} or {STRUCTURED}")
+        with trace_span("generate_sections", "pipeline", streaming=on_event is not None, mode=mode):
+            if mode == STRUCTURED:
+                body_html = gpt_answerer.generate_html_resume_structured(on_event)
+            elif on_event is not None:
+                body_html = gpt_answerer.generate_html_resume_streaming(on_event)
+            else:
+                body_html = gpt_answerer.generate_html_resume()
         
         # Applica i contenuti al template
-        return template.substitute(body=body_html, style_css=style_css)
+        with trace_span("apply_template", "pipeline"):
+            return template.substitute(body=body_html, style_css=style_css)
 
-    def create_resume(self, style_path):
+    @staticmethod
+    def _apply_html_template(body_html: str, style_css: str) -> str:
+        return Template(global_config.html_template).substitute(body=body_html, style_css=style_css)
+
+    def create_resume(self, style_path, on_event: Callable[[dict], None] = None, mode: str = None):
         strings = load_module(global_config.STRINGS_MODULE_RESUME_PATH, global_config.STRINGS_MODULE_NAME)
         gpt_answerer = LLMResumer(global_config.API_KEY, strings)
-        return self._create_resume(gpt_answerer, style_path)
+        return self._create_resume(gpt_answerer, style_path, on_event, mode)
 
-    def create_resume_job_description_text(self, style_path: str, job_description_text: str):
+    def create_resume_job_description_text(self, style_path: str, job_description_text: str,
+                                           on_event: Callable[[dict], None] = None, mode: str = None):
         strings = load_module(global_config.STRINGS_MODULE_RESUME_JOB_DESCRIPTION_PATH, global_config.STRINGS_MODULE_NAME)
         gpt_answerer = LLMResumeJobDescription(global_config.API_KEY, strings)
-        gpt_answerer.set_job_description_from_text(job_description_text)
-        return self._create_resume(gpt_answerer, style_path)
+        with trace_span("summarize_job_description", "pipeline"):
+            gpt_answerer.set_job_description_from_text(job_description_text)
+        return self._create_resume(gpt_answerer, style_path, on_event, mode)
 
     def create_cover_letter_job_description(self, style_path: str, job_description_text: str):
         strings = load_module(global_config.STRINGS_MODULE_COVER_LETTER_JOB_DESCRIPTION_PATH, global_config.STRINGS_MODULE_NAME)
         gpt_answerer = LLMCoverLetterJobDescription(global_config.API_KEY, strings)
         gpt_answerer.set_resume(self.resume_object)
-        gpt_answerer.set_job_description_from_text(job_description_text)
-        cover_letter_html = gpt_answerer.generate_cover_letter()
+        with trace_span("summarize_job_description", "pipeline"):
+            gpt_answerer.set_job_description_from_text(job_description_text)
+        with trace_span("generate_cover_letter", "pipeline"):
+            cover_letter_html = gpt_answerer.generate_cover_letter()
         template = Template(global_config.html_template)
         with open(style_path, "r") as f:
             style_css = f.read()
-        return template.substitute(body=cover_letter_html, style_css=style_css)
-    
-    
-    
\ No newline at end of file
+        with trace_span("apply_template", "pipeline"):
+            return template.substitute(body=cover_letter_html, style_css=style_css)
+
+    @staticmethod
+    def _check_batch_budget(ledger: CostLedger, answerers: Dict[tuple, Any], model: str) -> Dict[str, str]:
+        """
+        Check the spend ledger before submitting a batch. The run and day hard limits stop the batch, a
+        job past its hard limit is left out of it, and jobs past a soft limit use the fallback model.
+        Returns:
+            dict: Job identifier -> model to request, for the jobs still in the batch.
+        """
+        ledger.check()
+        models = {}
+        for job_id in {job_id for job_id, _ in answerers}:
+            try:
+                models[job_id] = ledger.check(job_id, model) or model
+            except BudgetExceededError as e:
+                logger.error(f"Skipping job {job_id} in batch tailoring: {e}")
+                for key in [key for key in answerers if key[0] == job_id]:
+                    del answerers[key]
+        return models
+
+    @staticmethod
+    def _record_batch_usage(ledger: CostLedger, replies: Dict[str, dict], owners: Dict[str, tuple],
+                            backend: BatchBackend) -> float:
+        """
+        Record the replies of a batch in the spend ledger, at the backend's batch price.
+        Args:
+            owners (dict): custom_id -> (job identifier, template name).
+        Returns:
+            float: The USD cost of the replies.
+        """
+        total = 0.0
+        for custom_id, reply in replies.items():
+            job_id, template = owners[custom_id]
+            usage = batch_usage(reply["usage"])
+            total += ledger.record(
+                reply["model"], usage["input_tokens"], usage["output_tokens"], usage["cached_input_tokens"],
+                job=job_id, template=template, price_factor=backend.price_factor,
+            )
+        return total
+
+    def create_resumes_batch(self, style_path: str, jobs: Dict[str, str], backend: BatchBackend,
+                             include_cover_letter: bool = True, poll_interval: float = 30,
+                             timeout: float = None) -> Dict[str, Dict[str, str]]:
+        """
+        Tailor resumes (and cover letters) for many jobs through a batch backend instead of
+        interactive calls. Runs two batches: the job description summaries first, then every
+        resume section and cover letter prompt of every job.
+        Args:
+            style_path (str): The CSS style applied to every document.
+            jobs (dict): Job identifier -> plain text job description.
+            backend (BatchBackend): The batch backend the prompts are submitted to.
+            include_cover_letter (bool): Also generate a cover letter per job.
+            poll_interval (float): Seconds between batch status checks.
+            timeout (float): Give up on a batch after this many seconds.
+        Returns:
+            dict: Job identifier -> {"resume": html, "cover_letter": html}. Documents whose
+            requests failed in the batch are left out.
+        """
+        with open(style_path, "r") as f:
+            style_css = f.read()
+
+        resume_strings = load_module(global_config.STRINGS_MODULE_RESUME_JOB_DESCRIPTION_PATH, global_config.STRINGS_MODULE_NAME)
+        answerers = {}
+        for job_id in jobs:
+            resumer = LLMResumeJobDescription(global_config.API_KEY, resume_strings)
+            resumer.set_resume(self.resume_object)
+            answerers[(job_id, "resume")] = resumer
+        if include_cover_letter:
+            cover_letter_strings = load_module(global_config.STRINGS_MODULE_COVER_LETTER_JOB_DESCRIPTION_PATH, global_config.STRINGS_MODULE_NAME)
+            for job_id in jobs:
+                cover_letter_writer = LLMCoverLetterJobDescription(global_config.API_KEY, cover_letter_strings)
+                cover_letter_writer.set_resume(self.resume_object)
+                answerers[(job_id, "cover_letter")] = cover_letter_writer
+
+        _, model, temperature = describe_llm(next(iter(answerers.values())).llm_cheap.llm)
+        ledger = get_cost_ledger()
+        owners: Dict[str, tuple] = {}
+
+        # Phase 1: job description summaries, needed by every section prompt. The resume and the cover
+        # letter of a job share one summary when their summarize templates are the same
+        job_models = self._check_batch_budget(ledger, answerers, model)
+        summary_ids: Dict[tuple, str] = {}
+        summary_requests = []
+        for (job_id, document), answerer in answerers.items():
+            template = answerer.strings.summarize_prompt_template
+            if (job_id, template) in summary_ids:
+                continue
+            custom_id = f"{job_id}:summary:{len(summary_ids)}"
+            summary_ids[(job_id, template)] = custom_id
+            owners[custom_id] = (job_id, "summarize_prompt_template")
+            summary_requests.append(
+                build_batch_request(
+                    custom_id, template,
+                    budget_inputs("summarize_prompt_template", template, {"text": jobs[job_id]}, "text")[0],
+                    job_models[job_id], temperature,
+                )
+            )
+        summaries = backend.run(summary_requests, poll_interval=poll_interval, timeout=timeout) if summary_requests else {}
+        total_cost = self._record_batch_usage(ledger, summaries, owners, backend)
+        for (job_id, document), answerer in list(answerers.items()):
+            summary = summaries.get(summary_ids[(job_id, answerer.strings.summarize_prompt_template)])
+            if summary is None:
+                logger.error(f"No job description summary for {job_id}, skipping its {document}")
+                del answerers[(job_id, document)]
+                continue
+            answerer.job_description = summary["content"]
+
+        # Phase 2: resume sections and cover letters
+        job_models = self._check_batch_budget(ledger, answerers, model)
+        section_requests = []
+        for (job_id, document), answerer in answerers.items():
+            if document == "resume":
+                prompts = answerer.get_section_prompts()
+                template_names = answerer.SECTION_TEMPLATES
+            else:
+                prompts = {"cover_letter": answerer.get_cover_letter_prompt()}
+                template_names = {"cover_letter": "cover_letter_template"}
+            for section, (template, input_data) in prompts.items():
+                custom_id = f"{job_id}:{document}:{section}"
+                owners[custom_id] = (job_id, template_names[section])
+                section_requests.append(
+                    build_batch_request(custom_id, template, input_data, job_models[job_id], temperature)
+                )
+        sections = backend.run(section_requests, poll_interval=poll_interval, timeout=timeout) if section_requests else {}
+        total_cost += self._record_batch_usage(ledger, sections, owners, backend)
+
+        documents: Dict[str, Dict[str, str]] = {}
+        for (job_id, document), answerer in answerers.items():
+            prefix = f"{job_id}:{document}:"
+            results = {
+                custom_id[len(prefix):]: reply["content"]
+                for custom_id, reply in sections.items()
+                if custom_id.startswith(prefix)
+            }
+            if document == "resume":
+                body_html = LLMResumer.assemble_html_resume(results)
+            elif "cover_letter" in results:
+                body_html = results["cover_letter"]
+            else:
+                logger.error(f"Cover letter for {job_id} missing from the batch results")
+                continue
+            documents.setdefault(job_id, {})[document] = self._apply_html_template(body_html, style_css)
+
+        usage = [reply["usage"] for reply in list(summaries.values()) + list(sections.values())]
+        logger.info(
+            f"Batch generation finished for {len(documents)}/{len(jobs)} jobs: "
+            f"{len(summary_requests) + len(section_requests)} requests, "
+            f"{sum(u.get('total_tokens', 0) for u in usage)} tokens, ${total_cost:.4f}"
+        )
+        return documents
@@ -1,6 +1,6 @@
-from src.libs.resume_and_cover_builder.template_base import prompt_header_template, prompt_education_template, prompt_working_experience_template, prompt_projects_template, prompt_additional_skills_template, prompt_certifications_template, prompt_achievements_template
+from src.libs.resume_and_cover_builder.template_base import cache_friendly_prompt, prompt_header_template, prompt_education_template, prompt_working_experience_template, prompt_projects_template, prompt_additional_skills_template, prompt_certifications_template, prompt_achievements_template
 
-prompt_header = """
+prompt_header = cache_friendly_prompt("""
 Act as an HR expert and resume writer specializing in ATS-friendly resumes. Your task is to create a professional and polished header for the resume. The header should:
 
 1. **Contact Information**: Include your full name, city and country, phone number, email address, LinkedIn profile, and GitHub profile.
@@ -8,12 +8,12 @@ Act as an HR expert and resume writer specializing in ATS-friendly resumes. Your
 
 To implement this:
 - If any of the contact information fields (e.g., LinkedIn profile, GitHub profile) are not provided (i.e., `None`), omit them from the header.
-
+""" + prompt_header_template, """
 - **My information:**  
   {personal_information}
-""" + prompt_header_template
+""")
 
-prompt_education = """
+prompt_education = cache_friendly_prompt("""
 Act as an HR expert and resume writer with a specialization in creating ATS-friendly resumes. Your task is to articulate the educational background for a resume, ensuring it aligns with the provided job description. For each educational entry, ensure you include:
 
 1. **Institution Name and Location**: Specify the university or educational institution’s name and location.
@@ -24,17 +24,16 @@ Act as an HR expert and resume writer with a specialization in creating ATS-frie
 To implement this, follow these steps:
 - If the exam details are not provided (i.e., `None`), skip the coursework section when filling out the template.
 - If the exam details are available, fill out the coursework section accordingly.
-
-
+""" + prompt_education_template, """
 - **My information:**  
   {education_details}
 
 - **Job Description:**  
   {job_description}
-"""+ prompt_education_template
+""")
 
 
-prompt_working_experience = """
+prompt_working_experience = cache_friendly_prompt("""
 Act as an HR expert and resume writer with a specialization in creating ATS-friendly resumes. Your task is to detail the work experience for a resume, ensuring it aligns with the provided job description. For each job entry, ensure you include:
 
 1. **Company Name and Location**: Provide the name of the company and its location.
@@ -46,17 +45,16 @@ Ensure that the descriptions highlight relevant experience and align with the jo
 
 To implement this:
 - If any of the work experience details (e.g., responsibilities, achievements) are not provided (i.e., `None`), omit those sections when filling out the template.
-
-
+""" + prompt_working_experience_template, """
 - **My information:**  
   {experience_details}
 
 - **Job Description:**  
   {job_description}
-"""+ prompt_working_experience_template
+""")
 
 
-prompt_projects = """
+prompt_projects = cache_friendly_prompt("""
 Act as an HR expert and resume writer with a specialization in creating ATS-friendly resumes. Your task is to highlight notable side projects based on the provided job description. For each project, ensure you include:
 
 1. **Project Name and Link**: Provide the name of the project and include a link to the GitHub repository or project page.
@@ -67,17 +65,16 @@ Ensure that the project descriptions demonstrate your skills and achievements re
 
 To implement this:
 - If any of the project details (e.g., link, achievements) are not provided (i.e., `None`), omit those sections when filling out the template.
-
-
+""" + prompt_projects_template, """
 - **My information:**  
   {projects}
 
 - **Job Description:**  
   {job_description}
-"""+ prompt_projects_template
+""")
 
 
-prompt_achievements = """
+prompt_achievements = cache_friendly_prompt("""
 Act as an HR expert and resume writer with a specialization in creating ATS-friendly resumes. Your task is to list significant achievements based on the provided job description. For each achievement, ensure you include:
 
 1. **Award or Recognition**: Clearly state the name of the award, recognition, scholarship, or honor.
@@ -87,17 +84,16 @@ Ensure that the achievements are clearly presented and effectively highlight you
 
 To implement this:
 - If any of the achievement details (e.g., certifications, descriptions) are not provided (i.e., `None`), omit those sections when filling out the template.
-
-
+""" + prompt_achievements_template, """
 - **My information:**  
   {achievements}
 
 - **Job Description:**  
   {job_description}
-"""+ prompt_achievements_template
+""")
 
 
-prompt_certifications = """
+prompt_certifications = cache_friendly_prompt("""
 Act as an HR expert and resume writer with a specialization in creating ATS-friendly resumes. Your task is to list significant certifications based on the provided details. For each certification, ensure you include:
 
 1. **Certification Name**: Clearly state the name of the certification.
@@ -108,16 +104,16 @@ Ensure that the certifications are clearly presented and effectively highlight y
 To implement this:
 
 If any of the certification details (e.g., descriptions) are not provided (i.e., None), omit those sections when filling out the template.
-
+""" + prompt_certifications_template, """
 - **My information:**  
   {certifications}
 
 - **Job Description:**  
   {job_description}
-"""+ prompt_certifications_template
+""")
 
 
-prompt_additional_skills = """
+prompt_additional_skills = cache_friendly_prompt("""
 Act as an HR expert and resume writer with a specialization in creating ATS-friendly resumes. Your task is to list additional skills relevant to the job. For each skill, ensure you include:
 Do not add any information beyond what is listed in the provided data fields. Only use the information provided in the 'languages', 'interests', and 'skills' fields to formulate your responses. Avoid extrapolating or incorporating details from the job description or other external sources.
 
@@ -129,8 +125,7 @@ Ensure that the skills listed are relevant and accurately reflect your expertise
 
 To implement this:
 - If any of the skill details (e.g., languages, interests, skills) are not provided (i.e., `None`), omit those sections when filling out the template.
-
-
+""" + prompt_additional_skills_template, """
 - **My information:**  
   {languages}
   {interests}
@@ -138,9 +133,9 @@ To implement this:
 
 - **Job Description:**  
   {job_description}
-"""+ prompt_additional_skills_template
+""")
 
-summarize_prompt_template = """
+summarize_prompt_template = cache_friendly_prompt("""
 As a seasoned HR expert, your task is to identify and outline the key skills and requirements necessary for the position of this job. Use the provided job description as input to extract all relevant information. This will involve conducting a thorough analysis of the job's responsibilities and the industry standards. You should consider both the technical and soft skills needed to excel in this role. Additionally, specify any educational qualifications, certifications, or experiences that are essential. Your analysis should also reflect on the evolving nature of this role, considering future trends and how they might affect the required competencies.
 
 Rules:
@@ -158,7 +153,7 @@ Role Evolution: Analyze how the role might evolve in the future, considering ind
 # Final Result:
 Your analysis should be structured in a clear and organized document with distinct sections for each of the points listed above. Each section should contain:
 This comprehensive overview will serve as a guideline for the recruitment process, ensuring the identification of the most qualified candidates.
-
+""", """
 # Job Description:
 ```
 {text}
@@ -166,4 +161,4 @@ This comprehensive overview will serve as a guideline for the recruitment proces
 
 ---
 
-# Job Description Summary"""
+# Job Description Summary""")
@@ -0,0 +1,157 @@
+"""
+Memoization of generated resume sections, so a section is sent to the LLM again only when its inputs changed.
+"""
+# app/libs/resume_and_cover_builder/section_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+import config as cfg
+
+# Prompt variable holding the summarised job description
+JOB_DESCRIPTION_VARIABLE = "job_description"
+# Job digest of the sections whose output does not depend on the job
+JOB_INDEPENDENT = "job-independent"
+
+
+def _canonical(value: Any) -> Any:
+    """Turn Resume sub-models and containers into JSON-serialisable values with a stable order."""
+    if hasattr(value, "model_dump"):
+        return _canonical(value.model_dump(mode="json"))
+    if isinstance(value, dict):
+        return {str(name): _canonical(item) for name, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_canonical(item) for item in value), key=lambda item: json.dumps(item, sort_keys=True, default=str))
+    return value
+
+
+def digest(value: Any) -> str:
+    """Stable digest of a value (text, Resume sub-model, dict of prompt variables)."""
+    payload = value if isinstance(value, str) else json.dumps(_canonical(value), sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def section_cache_key(section: str, template: str, input_data: Dict[str, Any], job_dependent: bool,
+                      provider: str, model: str, temperature: Optional[float]) -> str:
+    """
+    Build the key of a generated section.
+    Args:
+        section (str): The section name.
+        template (str): The prompt template, so any edit of it invalidates the section.
+        input_data (dict): The prompt variables; the job description is keyed separately.
+        job_dependent (bool): Whether the output depends on the job; otherwise the job is left out of the key.
+        provider, model, temperature: The model generating the section.
+    Returns:
+        str: The hex digest of the key parts.
+    """
+    resume_inputs = {name: value for name, value in input_data.items() if name != JOB_DESCRIPTION_VARIABLE}
+    job_digest = digest(input_data.get(JOB_DESCRIPTION_VARIABLE) or "") if job_dependent else JOB_INDEPENDENT
+    parts = [section, digest(resume_inputs), job_digest, digest(template), provider, model, str(temperature)]
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+class SectionCache:
+    """
+    SQLite store of generated section HTML with size-bounded LRU eviction.
+    """
+
+    def __init__(self, path: Path, max_entries: Optional[int] = None, bypass: bool = False):
+        """
+        Args:
+            path (Path): The SQLite database file.
+            max_entries (int): Least recently used sections are evicted above this size. None disables eviction.
+            bypass (bool): Disable the cache entirely.
+        """
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sections (
+                    key TEXT PRIMARY KEY,
+                    section TEXT NOT NULL,
+                    html TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sections_last_access ON sections(last_access)")
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns:
+            str: The HTML of the section, or None on a miss.
+        """
+        if self.bypass:
+            return None
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT html FROM sections WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE sections SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, section: str, html: str) -> None:
+        if self.bypass or not html:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO sections (key, section, html, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, section, html, now, now),
+            )
+            if self.max_entries is not None:
+                conn.execute(
+                    "DELETE FROM sections WHERE key IN ("
+                    "SELECT key FROM sections ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._connect().execute("SELECT COUNT(*) FROM sections").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+
+_cache: Optional[SectionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_section_cache() -> SectionCache:
+    """
+    Return the process-wide section cache configured from config.py.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SectionCache(
+                path=Path(cfg.RESUME_SECTION_CACHE_PATH),
+                max_entries=cfg.RESUME_SECTION_CACHE_MAX_ENTRIES,
+                bypass=not cfg.RESUME_SECTION_CACHE_ENABLED or cfg.LLM_CACHE_BYPASS,
+            )
+            logger.debug(f"Resume section cache initialized at {_cache.path}")
+        return _cache
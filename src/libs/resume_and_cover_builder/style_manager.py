@@ -1,10 +1,7 @@
 import os
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
-import logging
-
-# Configure logging
-logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+from loguru import logger
 
 
 class StyleManager:
@@ -14,8 +11,8 @@ class StyleManager:
         project_root = current_file.parent.parent.parent.parent
         self.styles_directory = project_root / "src" / "libs" / "resume_and_cover_builder" / "resume_style"
 
-        logging.debug(f"Project root determined as: {project_root}")
-        logging.debug(f"Styles directory set to: {self.styles_directory}")
+        logger.debug(f"Project root determined as: {project_root}")
+        logger.debug(f"Styles directory set to: {self.styles_directory}")
 
     def get_styles(self) -> Dict[str, Tuple[str, str]]:
         """
@@ -25,17 +22,17 @@ class StyleManager:
         """
         styles_to_files = {}
         if not self.styles_directory:
-            logging.warning("Styles directory is not set.")
+            logger.warning("Styles directory is not set.")
             return styles_to_files
-        logging.debug(f"Reading styles directory: {self.styles_directory}")
+        logger.debug(f"Reading styles directory: {self.styles_directory}")
         try:
             files = [f for f in self.styles_directory.iterdir() if f.is_file()]
-            logging.debug(f"Files found: {[f.name for f in files]}")
+            logger.debug(f"Files found: {[f.name for f in files]}")
             for file_path in files:
-                logging.debug(f"Processing file: {file_path}")
+                logger.debug(f"Processing file: {file_path}")
                 with file_path.open("r", encoding="utf-8") as file:
                     first_line = file.readline().strip()
-                    logging.debug(f"First line of file {file_path.name}: {first_line}")
+                    logger.debug(f"First line of file {file_path.name}: {first_line}")
                     if first_line.startswith("/*") and first_line.endswith("*/"):
                         content = first_line[2:-2].strip()
                         if "$" in content:
@@ -43,13 +40,13 @@ class StyleManager:
                             style_name = style_name.strip()
                             author_link = author_link.strip()
                             styles_to_files[style_name] = (file_path.name, author_link)
-                            logging.info(f"Added style: {style_name} by {author_link}")
+                            logger.info(f"Added style: {style_name} by {author_link}")
         except FileNotFoundError:
-            logging.error(f"Directory {self.styles_directory} not found.")
+            logger.error(f"Directory {self.styles_directory} not found.")
         except PermissionError:
-            logging.error(f"Permission denied for accessing {self.styles_directory}.")
+            logger.error(f"Permission denied for accessing {self.styles_directory}.")
         except Exception as e:
-            logging.error(f"Unexpected error while reading styles: {e}")
+            logger.error(f"Unexpected error while reading styles: {e}")
         return styles_to_files
 
     def format_choices(self, styles_to_files: Dict[str, Tuple[str, str]]) -> List[str]:
@@ -69,7 +66,7 @@ class StyleManager:
             selected_style (str): The name of the style to select.
         """
         self.selected_style = selected_style
-        logging.info(f"Selected style set to: {self.selected_style}")
+        logger.info(f"Selected style set to: {self.selected_style}")
 
     def get_style_path(self) -> Optional[Path]:
         """
@@ -84,5 +81,5 @@ class StyleManager:
             file_name, _ = styles[self.selected_style]
             return self.styles_directory / file_name
         except Exception as e:
-            logging.error(f"Error retrieving selected style: {e}")
+            logger.error(f"Error retrieving selected style: {e}")
             return None
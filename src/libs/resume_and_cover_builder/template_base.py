@@ -3,6 +3,22 @@ This module is used to store the global configuration of the application.
 """
 # app/libs/resume_and_cover_builder/template_base.py
 
+# Separates the static part of a prompt (instructions and HTML template) from its per-request payload.
+# Prompts containing it are sent as a system message followed by a human message with the payload, so
+# the identical prefix shared by every job can be served from the provider's prompt cache.
+PAYLOAD_MARKER = "\n<!-- payload -->\n"
+
+
+def cache_friendly_prompt(static_prefix: str, payload: str) -> str:
+    """
+    Build a prompt whose static part comes first and whose variables come last.
+    Args:
+        static_prefix (str): Instructions and template, identical for every request.
+        payload (str): The part holding the template variables.
+    Returns:
+        str: The prompt string used by the prompt modules.
+    """
+    return static_prefix.strip("\n") + PAYLOAD_MARKER + payload.strip("\n") + "\n"
 
 
 prompt_cover_letter_template = """
@@ -237,3 +253,11 @@ prompt_additional_skills_template = """
 '''
 The results should be provided in html format, Provide only the html code for the resume, without any explanations or additional text and also without ```html ```
 """
+
+prompt_structured_resume_intro = """
+Act as an HR expert and resume writer specializing in ATS-friendly resumes. Your task is to write several sections of a resume at once. Each section below comes with its own instructions and HTML template; follow them for that section only, using the information and the job description (if any) given at the end.
+"""
+
+prompt_structured_resume_output = """
+Answer with a single JSON object and nothing else, without ```json ```. It must have exactly these keys: {keys}. The value of each key is the html code of that section, as a string, following the section's template.
+"""
@@ -3,17 +3,32 @@ This module contains utility functions for the Resume and Cover Letter Builder s
 """
 
 # app/libs/resume_and_cover_builder/utils.py
-import json
-import openai
-import time
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict
 from langchain_core.messages.ai import AIMessage
 from langchain_core.prompt_values import StringPromptValue
+from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
 from .config import global_config
-from loguru import logger
-from requests.exceptions import HTTPError as HTTPStatusError
+from src.libs.llm_call_log import get_call_log_writer
+from src.libs.llm_costs import cost_of
+from src.libs.llm_invocation import BaseLoggerChatModel
+from src.libs.resume_and_cover_builder.template_base import PAYLOAD_MARKER
+
+
+def chat_prompt_from_template(template: str) -> ChatPromptTemplate:
+    """
+    Build the chat prompt of a prompt-module template. Templates built with cache_friendly_prompt
+    become a static system message followed by the payload; other templates a single human message.
+    Args:
+        template (str): The prompt template.
+    Returns:
+        ChatPromptTemplate: The chat prompt.
+    """
+    if PAYLOAD_MARKER in template:
+        static_prefix, payload = template.split(PAYLOAD_MARKER, 1)
+        return ChatPromptTemplate.from_messages([("system", static_prefix), ("human", payload)])
+    return ChatPromptTemplate.from_template(template)
 
 
 class LLMLogger:
@@ -23,7 +38,7 @@ class LLMLogger:
 
     @staticmethod
     def log_request(prompts, parsed_reply: Dict[str, Dict]):
-        calls_log = global_config.LOG_OUTPUT_FILE_PATH / "open_ai_calls.json"
+        calls_log = global_config.LOG_OUTPUT_FILE_PATH
         if isinstance(prompts, StringPromptValue):
             prompts = prompts.text
         elif isinstance(prompts, Dict):
@@ -45,16 +60,15 @@ class LLMLogger:
         output_tokens = token_usage["output_tokens"]
         input_tokens = token_usage["input_tokens"]
         total_tokens = token_usage["total_tokens"]
+        cached_input_tokens = token_usage.get("cached_input_tokens", 0)
 
         # Extract model details from the response
         model_name = parsed_reply["response_metadata"]["model_name"]
-        prompt_price_per_token = 0.00000015
-        completion_price_per_token = 0.0000006
 
-        # Calculate the total cost of the API call
-        total_cost = (input_tokens * prompt_price_per_token) + (
-            output_tokens * completion_price_per_token
-        )
+        # Cost of the API call, priced per model when it was recorded in the spend ledger
+        total_cost = parsed_reply.get("total_cost")
+        if total_cost is None:
+            total_cost = cost_of(model_name, input_tokens, output_tokens, cached_input_tokens)
 
         # Create a log entry with all relevant information
         log_entry = {
@@ -65,46 +79,25 @@ class LLMLogger:
             "total_tokens": total_tokens,
             "input_tokens": input_tokens,
             "output_tokens": output_tokens,
+            "cached_input_tokens": cached_input_tokens,
             "total_cost": total_cost,
+            "prompt_prefix_hash": parsed_reply.get("prompt_prefix_hash", ""),
+            "latency_seconds": parsed_reply.get("latency_seconds"),
         }
+        # Annotations of the call, e.g. template name and token counts before/after compaction
+        log_entry.update(parsed_reply.get("annotations", {}))
 
-        # Write the log entry to the log file in JSON format
-        with open(calls_log, "a", encoding="utf-8") as f:
-            json_string = json.dumps(log_entry, ensure_ascii=False, indent=4)
-            f.write(json_string + "\n")
+        # Queue the entry for the background JSONL writer, off the latency path of the call
+        get_call_log_writer(calls_log).write(log_entry)
 
 
-class LoggerChatModel:
+class LoggerChatModel(BaseLoggerChatModel):
 
     def __init__(self, llm: ChatOpenAI):
-        self.llm = llm
+        super().__init__(llm)
 
-    def __call__(self, messages: List[Dict[str, str]]) -> str:
-        max_retries = 15
-        retry_delay = 10
-
-        for attempt in range(max_retries):
-            try:
-                reply = self.llm.invoke(messages)
-                parsed_reply = self.parse_llmresult(reply)
-                LLMLogger.log_request(prompts=messages, parsed_reply=parsed_reply)
-                return reply
-            except (openai.RateLimitError, HTTPStatusError) as err:
-                if isinstance(err, HTTPStatusError) and err.response.status_code == 429:
-                    logger.warning(f"HTTP 429 Too Many Requests: Waiting for {retry_delay} seconds before retrying (Attempt {attempt + 1}/{max_retries})...")
-                    time.sleep(retry_delay)
-                    retry_delay *= 2
-                else:
-                    wait_time = self.parse_wait_time_from_error_message(str(err))
-                    logger.warning(f"Rate limit exceeded or API error. Waiting for {wait_time} seconds before retrying (Attempt {attempt + 1}/{max_retries})...")
-                    time.sleep(wait_time)
-            except Exception as e:
-                logger.error(f"Unexpected error occurred: {str(e)}, retrying in {retry_delay} seconds... (Attempt {attempt + 1}/{max_retries})")
-                time.sleep(retry_delay)
-                retry_delay *= 2
-
-        logger.critical("Failed to get a response from the model after multiple attempts.")
-        raise Exception("Failed to get a response from the model after multiple attempts.")
+    def log_request(self, messages, parsed_reply: Dict[str, Dict]) -> None:
+        LLMLogger.log_request(prompts=messages, parsed_reply=parsed_reply)
 
     def parse_llmresult(self, llmresult: AIMessage) -> Dict[str, Dict]:
         # Parse the LLM result into a structured format.
@@ -126,6 +119,7 @@ class LoggerChatModel:
                 "input_tokens": usage_metadata.get("input_tokens", 0),
                 "output_tokens": usage_metadata.get("output_tokens", 0),
                 "total_tokens": usage_metadata.get("total_tokens", 0),
+                "cached_input_tokens": (usage_metadata.get("input_token_details") or {}).get("cache_read", 0),
             },
         }
         return parsed_result
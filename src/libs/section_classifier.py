@@ -0,0 +1,275 @@
+"""
+Local BM25 classifier mapping application form questions to the resume section used to answer them.
+"""
+# app/libs/section_classifier.py
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from src.utils.constants import (
+    AVAILABILITY,
+    CERTIFICATIONS,
+    COVER_LETTER,
+    EDUCATION_DETAILS,
+    EXPERIENCE_DETAILS,
+    INTERESTS,
+    LANGUAGES,
+    LEGAL_AUTHORIZATION,
+    PERSONAL_INFORMATION,
+    PROJECTS,
+    SALARY_EXPECTATIONS,
+    SELF_IDENTIFICATION,
+    WORK_PREFERENCES,
+)
+
+# Labelled example questions per section, in the wording used by application forms
+SECTION_EXAMPLES: Dict[str, List[str]] = {
+    PERSONAL_INFORMATION: [
+        "What is your full name?",
+        "First name",
+        "Last name",
+        "Email address",
+        "Mobile phone number",
+        "Phone country code",
+        "What is your current city of residence?",
+        "Address, city, zip code, country",
+        "LinkedIn profile URL",
+        "GitHub profile or portfolio website",
+        "Date of birth",
+        "Preferred name or pronouns",
+    ],
+    SELF_IDENTIFICATION: [
+        "What is your gender?",
+        "Are you a veteran or protected veteran?",
+        "Do you have a disability?",
+        "What is your race or ethnicity?",
+        "Are you Hispanic or Latino?",
+        "Sexual orientation",
+        "Voluntary self identification",
+        "Equal employment opportunity demographic questions",
+        "How do you describe your gender identity?",
+    ],
+    LEGAL_AUTHORIZATION: [
+        "Are you legally authorized to work in the United States?",
+        "Will you now or in the future require visa sponsorship?",
+        "Do you have a valid work permit for the EU?",
+        "Are you authorized to work in Canada?",
+        "Do you require sponsorship for employment visa status such as H-1B?",
+        "Do you have the legal right to work in the UK?",
+        "Citizenship or permanent residency status",
+        "Can you provide proof of eligibility to work?",
+    ],
+    WORK_PREFERENCES: [
+        "Are you willing to relocate?",
+        "Are you open to remote, hybrid or in-person work?",
+        "Are you willing to travel for work?",
+        "Are you willing to work in an office on site?",
+        "Would you be comfortable working night shifts or weekends?",
+        "Are you willing to complete a background check or drug test?",
+        "Are you willing to undergo a background check?",
+        "Preferred work location",
+    ],
+    EDUCATION_DETAILS: [
+        "What is your highest level of education?",
+        "Do you have a bachelor's degree?",
+        "Have you completed a master's degree or PhD?",
+        "Which university did you attend?",
+        "What was your field of study or major?",
+        "What is your GPA or final grade?",
+        "When did you graduate?",
+        "List relevant coursework",
+    ],
+    EXPERIENCE_DETAILS: [
+        "How many years of experience do you have?",
+        "Describe your previous work experience",
+        "What is your current job title and employer?",
+        "Tell us about your responsibilities in your last role",
+        "Describe a challenging situation at work and how you handled it",
+        "Why are you leaving your current job?",
+        "What experience do you have with Python?",
+        "Have you managed a team before?",
+        "Describe your professional background and skills",
+    ],
+    PROJECTS: [
+        "Describe a project you are proud of",
+        "Tell us about a side project you built",
+        "Share a link to a project or repository you have worked on",
+        "Which open source projects have you contributed to?",
+        "Describe a technical project and your role in it",
+    ],
+    AVAILABILITY: [
+        "When can you start?",
+        "What is your notice period?",
+        "What is your earliest available start date?",
+        "How soon could you join?",
+        "Are you available to start immediately?",
+        "Are you available for full-time or part-time work?",
+    ],
+    SALARY_EXPECTATIONS: [
+        "What are your salary expectations?",
+        "What is your desired salary?",
+        "Expected annual compensation",
+        "What is your current salary?",
+        "Desired hourly rate or pay range",
+        "Minimum compensation you would accept",
+    ],
+    CERTIFICATIONS: [
+        "Do you have any certifications?",
+        "List your professional certifications and licenses",
+        "Are you AWS certified?",
+        "Do you hold a PMP or Scrum Master certification?",
+        "Do you have a valid professional license?",
+    ],
+    LANGUAGES: [
+        "What languages do you speak?",
+        "How fluent are you in English?",
+        "What is your level of German?",
+        "Do you speak Spanish or French?",
+        "Language proficiency",
+        "Are you a native speaker or bilingual?",
+    ],
+    INTERESTS: [
+        "What are your hobbies?",
+        "What do you do in your free time?",
+        "Tell us about your interests outside of work",
+        "What are you passionate about?",
+        "What do you enjoy doing on weekends?",
+        "Personal interests and activities",
+    ],
+    COVER_LETTER: [
+        "Cover letter",
+        "Please write a cover letter",
+        "Why do you want to work here?",
+        "Why are you interested in this position?",
+        "Why should we hire you?",
+        "Tell us why you are a good fit for this role and our company",
+        "Message to the hiring manager",
+        "Motivation letter",
+    ],
+}
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "could", "did", "do", "does", "for", "from",
+    "have", "how", "i", "if", "in", "is", "it", "of", "on", "or", "our", "please", "such", "the", "this",
+    "to", "us", "was", "we", "what", "when", "which", "will", "with", "would", "you", "your",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase, drop stopwords, strip plural endings and add bigrams so that phrases such as
+    "cover letter" or "start date" weigh more than their words alone.
+    """
+    words = [word.rstrip("s") if len(word) > 3 else word for word in re.findall(r"[a-z0-9]+", text.lower())]
+    words = [word for word in words if word not in STOPWORDS]
+    return words + [f"{first}_{second}" for first, second in zip(words, words[1:])]
+
+
+class SectionClassifier:
+    """
+    Okapi BM25 over one document per section, made of that section's example questions.
+    Confidence is the margin between the two best scores, 1 - second / best, scaled by the share of
+    the question's words found in the examples: a question matching several sections equally well,
+    or matched on a single word out of many, is left to the LLM.
+    """
+
+    def __init__(self, examples: Dict[str, List[str]] = None, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        examples = examples or SECTION_EXAMPLES
+        self.sections = list(examples)
+        self._term_counts = [Counter(token for text in examples[section] for token in tokenize(text)) for section in self.sections]
+        self._lengths = [sum(counts.values()) for counts in self._term_counts]
+        self._avg_length = sum(self._lengths) / len(self._lengths)
+        document_frequency = Counter(term for counts in self._term_counts for term in counts)
+        n = len(self.sections)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def scores(self, question: str) -> Dict[str, float]:
+        """
+        Returns:
+            dict: Section -> BM25 score of the question.
+        """
+        terms = [term for term in tokenize(question) if term in self._idf]
+        scores = {}
+        for section, counts, length in zip(self.sections, self._term_counts, self._lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self._avg_length)
+            scores[section] = sum(
+                self._idf[term] * counts[term] * (self.k1 + 1) / (counts[term] + norm)
+                for term in terms
+                if counts[term]
+            )
+        return scores
+
+    def classify(self, question: str) -> Tuple[Optional[str], float]:
+        """
+        Returns:
+            tuple: (best section or None if nothing matched, confidence between 0 and 1).
+        """
+        ranked = sorted(self.scores(question).items(), key=lambda item: item[1], reverse=True)
+        (best, best_score), (_, second_score) = ranked[0], ranked[1]
+        if best_score <= 0:
+            return None, 0.0
+        words = [term for term in tokenize(question) if "_" not in term]
+        coverage = sum(term in self._idf for term in words) / len(words)
+        return best, (1 - second_score / best_score) * coverage
+
+
+class ClassifierStats:
+    """
+    Counts how questions were classified and how often the local classifier agreed with the LLM
+    on the questions both of them saw.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.local = 0
+        self.llm_fallbacks = 0
+        self.compared = 0
+        self.agreements = 0
+
+    def record_local(self) -> None:
+        with self._lock:
+            self.local += 1
+
+    def record_llm(self, local_section: Optional[str], llm_section: str) -> None:
+        with self._lock:
+            self.llm_fallbacks += 1
+            if local_section is not None:
+                self.compared += 1
+                self.agreements += local_section == llm_section
+
+    def record_audit(self, local_section: str, llm_section: str) -> None:
+        with self._lock:
+            self.compared += 1
+            self.agreements += local_section == llm_section
+
+    @property
+    def agreement_rate(self) -> Optional[float]:
+        return self.agreements / self.compared if self.compared else None
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "local": self.local,
+                "llm_fallbacks": self.llm_fallbacks,
+                "compared": self.compared,
+                "agreements": self.agreements,
+                "agreement_rate": self.agreement_rate,
+            }
+
+
+_classifier: Optional[SectionClassifier] = None
+_classifier_lock = threading.Lock()
+classifier_stats = ClassifierStats()
+
+
+def get_section_classifier() -> SectionClassifier:
+    """Return the process-wide classifier, indexing the examples on first use."""
+    global _classifier
+    with _classifier_lock:
+        if _classifier is None:
+            _classifier = SectionClassifier()
+        return _classifier
@@ -0,0 +1,197 @@
+"""
+Lightweight span tracing of the tailoring pipeline, exported as Chrome trace-event JSON
+(open it in https://ui.perfetto.dev or chrome://tracing). Disabled spans cost one function call.
+"""
+# app/libs/tracing.py
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional
+
+from loguru import logger
+
+import config as cfg
+
+
+class Span:
+    """A span being recorded; its name and arguments can still be changed until it ends."""
+
+    __slots__ = ("name", "args")
+
+    def __init__(self, name: str, args: Dict[str, Any]):
+        self.name = name
+        self.args = args
+
+    def rename(self, name: str) -> None:
+        self.name = name
+
+    def set(self, **args: Any) -> None:
+        self.args.update(args)
+
+
+class _NullSpan:
+    """Stand-in yielded by spans while tracing is disabled."""
+
+    __slots__ = ()
+    name = ""
+
+    def rename(self, name: str) -> None:
+        pass
+
+    def set(self, **args: Any) -> None:
+        pass
+
+
+_NULL_SPAN_CONTEXT = nullcontext(_NullSpan())
+
+
+class Tracer:
+    """
+    Collects complete ("X") trace events with the OS thread ID of the thread that ran them, so the
+    ThreadPoolExecutor workers get their own tracks. Keeps at most `max_events` events.
+    """
+
+    def __init__(self, max_events: int):
+        self.max_events = max_events
+        self.pid = os.getpid()
+        self.dropped = 0
+        self._origin_ns = time.perf_counter_ns()
+        self._events: List[Dict[str, Any]] = []
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def _now_us(self) -> float:
+        return (time.perf_counter_ns() - self._origin_ns) / 1000
+
+    def _record(self, event: Dict[str, Any]) -> None:
+        tid = threading.get_native_id()
+        event["pid"], event["tid"] = self.pid, tid
+        with self._lock:
+            if tid not in self._threads:
+                self._threads[tid] = threading.current_thread().name
+            if len(self._events) >= self.max_events:
+                self.dropped += 1
+                return
+            self._events.append(event)
+
+    @contextmanager
+    def span(self, name: str, category: str, args: Dict[str, Any]) -> Iterator[Span]:
+        span = Span(name, args)
+        start = self._now_us()
+        try:
+            yield span
+        except BaseException as e:
+            span.args["error"] = repr(e)
+            raise
+        finally:
+            self._record({
+                "name": span.name, "cat": category, "ph": "X",
+                "ts": start, "dur": self._now_us() - start, "args": span.args,
+            })
+
+    def instant(self, name: str, category: str, args: Dict[str, Any]) -> None:
+        self._record({"name": name, "cat": category, "ph": "i", "s": "t", "ts": self._now_us(), "args": args})
+
+    def export(self, path: Path) -> Path:
+        """Write the recorded events, with process and thread names, as a Chrome trace-event file."""
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+        metadata = [{"name": "process_name", "ph": "M", "pid": self.pid, "tid": 0, "args": {"name": "tailoring"}}]
+        metadata += [
+            {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+            for tid, name in threads.items()
+        ]
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "traceEvents": metadata + events,
+                "displayTimeUnit": "ms",
+                "otherData": {"dropped_events": self.dropped},
+            }, f)
+        logger.info(f"Trace with {len(events)} events written to {path}")
+        return path
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+_configured = False
+
+
+def _default_trace_path() -> Path:
+    return Path(cfg.TRACE_OUTPUT_DIR) / f"trace-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+
+
+def start_tracing() -> Tracer:
+    """Start recording spans (TRACE_ENABLED does this on first use); the trace is exported at exit."""
+    global _tracer, _configured
+    with _tracer_lock:
+        _configured = True
+        if _tracer is None:
+            _tracer = Tracer(cfg.TRACE_MAX_EVENTS)
+            atexit.register(stop_tracing)
+        return _tracer
+
+
+def stop_tracing(path: Optional[Path] = None) -> Optional[Path]:
+    """
+    Stop recording and export the trace.
+    Args:
+        path (Path): Output file, a timestamped file in TRACE_OUTPUT_DIR by default.
+    Returns:
+        Path: The exported trace, None when tracing was not running.
+    """
+    global _tracer
+    with _tracer_lock:
+        tracer, _tracer = _tracer, None
+    if tracer is None:
+        return None
+    return tracer.export(path or _default_trace_path())
+
+
+def get_tracer() -> Optional[Tracer]:
+    """Return the running tracer, None while tracing is disabled."""
+    global _configured
+    if not _configured:
+        if cfg.TRACE_ENABLED:
+            return start_tracing()
+        _configured = True
+    return _tracer
+
+
+def trace_span(name: str, category: str = "app", **args: Any) -> ContextManager[Any]:
+    """
+    Time the enclosed block as a span of the trace. The context yields the span, whose name and
+    arguments may be completed inside the block (a no-op object while tracing is disabled).
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        return _NULL_SPAN_CONTEXT
+    return tracer.span(name, category, args)
+
+
+def trace_instant(name: str, category: str = "app", **args: Any) -> None:
+    """Mark a point in time on the current thread's track."""
+    tracer = get_tracer()
+    if tracer is not None:
+        tracer.instant(name, category, args)
+
+
+def traced(name: Optional[str] = None, category: str = "app") -> Callable[[Callable], Callable]:
+    """Decorator recording every call of the function as a span, named after the function by default."""
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with trace_span(span_name, category):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
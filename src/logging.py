@@ -1,11 +1,45 @@
+"""
+Logging subsystem of the app: loguru sinks with non-blocking (enqueued) writes, per-module levels,
+the levels of third-party standard-library loggers, and truncation of logged payloads.
+Nothing is configured at import: the entry point calls init_logging() once.
+"""
 import logging.handlers
 import os
 import sys
 import logging
+import threading
+from typing import Any, Dict, Optional
+
 from loguru import logger
-from selenium.webdriver.remote.remote_connection import LOGGER as selenium_logger
 
-from config import LOG_LEVEL, LOG_SELENIUM_LEVEL, LOG_TO_CONSOLE, LOG_TO_FILE
+import config as cfg
+
+LOG_FORMAT = "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
+RESUME_BUILDER_MODULE = "src.libs.resume_and_cover_builder"
+
+_initialized = False
+_init_lock = threading.Lock()
+
+
+def truncate(value: Any, limit: Optional[int] = None) -> str:
+    """
+    Shorten a logged payload (prompt, reply, parsed result) to LOG_PAYLOAD_MAX_CHARS characters.
+    Meant for lazy debug messages: logger.opt(lazy=True).debug("Reply: {}", lambda: truncate(reply)).
+    """
+    text = value if isinstance(value, str) else str(value)
+    limit = cfg.LOG_PAYLOAD_MAX_CHARS if limit is None else limit
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} more characters]"
+
+
+def _module_filter(default_level: str) -> Dict[str, Any]:
+    """Loguru filter applying LOG_MODULE_LEVELS (module name prefix -> minimum level) over the default level."""
+    return {"": default_level, **cfg.LOG_MODULE_LEVELS}
+
+
+def _lowest_level(levels: Dict[str, Any]) -> int:
+    return min(logger.level(level).no for level in levels.values() if level is not False)
 
 
 def remove_default_loggers():
@@ -16,56 +50,62 @@ def remove_default_loggers():
     if os.path.exists("log/app.log"):
         os.remove("log/app.log")
 
+
 def init_loguru_logger():
     """Initialize and configure loguru logger."""
-
-    def get_log_filename():
-        return f"log/app.log"
-
-    log_file = get_log_filename()
-
+    log_file = "log/app.log"
     os.makedirs(os.path.dirname(log_file), exist_ok=True)
 
     logger.remove()
 
+    levels = _module_filter(cfg.LOG_LEVEL)
+    # enqueue: records are written by a background thread, so sinks never block the caller;
+    # diagnose is off because rendering variable values in tracebacks is slow and leaks secrets
+    sink_options = dict(
+        level=_lowest_level(levels), filter=levels, format=LOG_FORMAT,
+        enqueue=True, backtrace=True, diagnose=False,
+    )
+
     # Add file logger if LOG_TO_FILE is True
-    if LOG_TO_FILE:
-        logger.add(
-            log_file,
-            level=LOG_LEVEL,
-            rotation="10 MB",
-            retention="1 week",
-            compression="zip",
-            format="<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-            backtrace=True,
-            diagnose=True,
-        )
+    if cfg.LOG_TO_FILE:
+        logger.add(log_file, rotation="10 MB", retention="1 week", compression="zip", **sink_options)
 
     # Add console logger if LOG_TO_CONSOLE is True
-    if LOG_TO_CONSOLE:
+    if cfg.LOG_TO_CONSOLE:
+        logger.add(sys.stderr, **sink_options)
+
+    # One file for the resume and cover letter builder, replacing the sinks its modules added at import
+    if cfg.LOG_RESUME_BUILDER_FILE:
+        resume_levels = {"": False, RESUME_BUILDER_MODULE: cfg.LOG_RESUME_BUILDER_LEVEL}
         logger.add(
-            sys.stderr,
-            level=LOG_LEVEL,
-            format="<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-            backtrace=True,
-            diagnose=True,
+            cfg.LOG_RESUME_BUILDER_FILE, level=cfg.LOG_RESUME_BUILDER_LEVEL, filter=resume_levels,
+            rotation="1 day", retention="7 days", compression="zip",
+            enqueue=True, backtrace=True, diagnose=False,
         )
 
 
+def init_third_party_loggers():
+    """Set the levels of the standard-library loggers of third-party packages (httpx, openai, ...)."""
+    for name, level in cfg.LOG_THIRD_PARTY_LEVELS.items():
+        logging.getLogger(name).setLevel(level)
+
+
 def init_selenium_logger():
     """Initialize and configure selenium logger to write to selenium.log."""
+    from selenium.webdriver.remote.remote_connection import LOGGER as selenium_logger
+
     log_file = "log/selenium.log"
     os.makedirs(os.path.dirname(log_file), exist_ok=True)
 
     selenium_logger.handlers.clear()
 
-    selenium_logger.setLevel(LOG_SELENIUM_LEVEL)
+    selenium_logger.setLevel(cfg.LOG_SELENIUM_LEVEL)
 
     # Create file handler for selenium logger
     file_handler = logging.handlers.TimedRotatingFileHandler(
         log_file, when="D", interval=1, backupCount=5
     )
-    file_handler.setLevel(LOG_SELENIUM_LEVEL)
+    file_handler.setLevel(cfg.LOG_SELENIUM_LEVEL)
 
     # Define a simplified format for selenium logger entries
     formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
@@ -75,6 +115,14 @@ def init_selenium_logger():
     selenium_logger.addHandler(file_handler)
 
 
-remove_default_loggers()
-init_loguru_logger()
-init_selenium_logger()
+def init_logging():
+    """Configure every sink and logger level once; later calls do nothing."""
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        remove_default_loggers()
+        init_loguru_logger()
+        init_third_party_loggers()
+        init_selenium_logger()
+        _initialized = True
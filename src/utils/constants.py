@@ -25,6 +25,12 @@ OUTPUT_TOKENS = "output_tokens"
 INPUT_TOKENS = "input_tokens"
 TOTAL_TOKENS = "total_tokens"
 TOKEN_USAGE = "token_usage"
+INPUT_TOKEN_DETAILS = "input_token_details"
+CACHE_READ = "cache_read"
+CACHED_INPUT_TOKENS = "cached_input_tokens"
+PROMPT_PREFIX_HASH = "prompt_prefix_hash"
+LATENCY_SECONDS = "latency_seconds"
+ANNOTATIONS = "annotations"
 
 MODEL = "model"
 TIME = "time"
@@ -75,3 +81,9 @@ OLLAMA = "ollama"
 GEMINI = "gemini"
 HUGGINGFACE = "huggingface"
 PERPLEXITY = "perplexity"
+OPENAI_COMPATIBLE = "openai_compatible"
+REPLAY = "replay"
+
+# Resume section generation modes
+FAN_OUT = "fan_out"
+STRUCTURED = "structured"
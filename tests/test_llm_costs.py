@@ -0,0 +1,25 @@
+from src.libs.llm_costs import CostLedger
+
+FALLBACKS = {"gpt-4o-mini": "gpt-4.1-nano", "gpt-4o": "gpt-4o-mini", "claude-3-5-sonnet": "claude-3-5-haiku-latest"}
+
+
+def make_ledger(tmp_path) -> CostLedger:
+    return CostLedger(tmp_path / "ledger.sqlite3", soft_limits={"run": 0.0}, hard_limits={}, fallback_models=FALLBACKS)
+
+
+def test_soft_limit_falls_back_within_the_provider(tmp_path):
+    ledger = make_ledger(tmp_path)
+    assert ledger.check(model="gpt-4o-2024-08-06") == "gpt-4o-mini"
+    assert ledger.check(model="gpt-4o-mini") == "gpt-4.1-nano"
+    assert ledger.check(model="claude-3-5-sonnet-latest") == "claude-3-5-haiku-latest"
+
+
+def test_soft_limit_keeps_models_without_fallback(tmp_path):
+    ledger = make_ledger(tmp_path)
+    assert ledger.check(model="gemini-1.5-pro") is None
+    assert ledger.check(model="gpt-4.1-nano") is None
+
+
+def test_within_budget_keeps_the_model(tmp_path):
+    ledger = CostLedger(tmp_path / "ledger.sqlite3", soft_limits={"run": 1.0}, hard_limits={}, fallback_models=FALLBACKS)
+    assert ledger.check(model="gpt-4o") is None
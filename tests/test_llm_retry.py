@@ -0,0 +1,209 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import config as cfg
+from src.libs import llm_costs, llm_retry
+from src.libs.llm_backends import Backend, BackendPool
+from src.libs.llm_invocation import BaseLoggerChatModel
+from src.libs.llm_retry import CircuitBreaker, CircuitOpenError, RetryStats, get_circuit_breaker
+
+
+class BadRequestError(Exception):
+    status_code = 400
+
+
+class ServiceUnavailableError(Exception):
+    status_code = 503
+
+
+class FakeChatModel(BaseChatModel):
+    provider: str = "fake"
+    model_name: str = "fake-model"
+    error: Exception = None
+    delay: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return self.provider
+
+    def _reply(self) -> ChatResult:
+        if self.error is not None:
+            raise self.error
+        message = AIMessage(
+            content="ok",
+            usage_metadata={"input_tokens": 1, "output_tokens": 1, "total_tokens": 2},
+            response_metadata={"model_name": self.model_name},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return self._reply()
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.delay)
+        return self._reply()
+
+
+class PoolAdapter:
+    """Routes through a backend pool, like AIAdapter."""
+
+    def __init__(self, pool: BackendPool):
+        self.pool = pool
+        self.model = pool.primary.model
+
+    def invoke(self, prompt):
+        return self.pool.invoke(prompt)
+
+
+class ChatModel(BaseLoggerChatModel):
+    def parse_llmresult(self, llmresult):
+        return {}
+
+    def log_request(self, messages, parsed_reply):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch, tmp_path):
+    monkeypatch.setattr(cfg, "LLM_CACHE_BYPASS", True)
+    monkeypatch.setattr(cfg, "LLM_RETRY_MAX_ATTEMPTS", 1)
+    monkeypatch.setattr(llm_retry, "_breakers", {})
+    monkeypatch.setattr(llm_costs, "_ledger", llm_costs.CostLedger(tmp_path / "ledger.sqlite3", {}, {}))
+
+
+def make_breaker(threshold: int = 2, reset_timeout: float = 60.0) -> CircuitBreaker:
+    return CircuitBreaker("fake", failure_threshold=threshold, reset_timeout=reset_timeout, stats=RetryStats())
+
+
+def half_open(breaker: CircuitBreaker) -> None:
+    """Open the breaker with its reset timeout already elapsed, so the next call is the trial."""
+    breaker.state = breaker.OPEN
+    breaker.opened_at = time.monotonic() - breaker.reset_timeout
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = make_breaker(threshold=2)
+    breaker.record_failure()
+    breaker.before_call()
+    assert breaker.state == breaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_breaker_success_resets_failure_count():
+    breaker = make_breaker(threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == breaker.CLOSED
+
+
+def test_half_open_lets_a_single_trial_through():
+    breaker = make_breaker()
+    half_open(breaker)
+    breaker.before_call()
+    assert breaker.state == breaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_successful_trial_closes_the_breaker():
+    breaker = make_breaker()
+    half_open(breaker)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED
+    breaker.before_call()
+    breaker.before_call()
+
+
+def test_failed_trial_reopens_the_breaker():
+    breaker = make_breaker()
+    half_open(breaker)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_released_trial_lets_the_next_call_be_the_trial():
+    breaker = make_breaker()
+    half_open(breaker)
+    breaker.before_call()
+    breaker.release_trial()
+    assert breaker.state == breaker.HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_fatal_error_on_trial_closes_the_breaker():
+    model = ChatModel(FakeChatModel(error=BadRequestError("bad prompt")))
+    breaker = get_circuit_breaker("fake")
+    half_open(breaker)
+    with pytest.raises(BadRequestError):
+        model.invoke([HumanMessage(content="hello")])
+    assert breaker.state == breaker.CLOSED
+    model.llm.error = None
+    assert model.invoke([HumanMessage(content="hello")]).content == "ok"
+
+
+def test_retryable_error_on_trial_reopens_the_breaker():
+    model = ChatModel(FakeChatModel(error=ServiceUnavailableError("overloaded")))
+    breaker = get_circuit_breaker("fake")
+    half_open(breaker)
+    with pytest.raises(ServiceUnavailableError):
+        model.invoke([HumanMessage(content="hello")])
+    assert breaker.state == breaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        model.invoke([HumanMessage(content="hello")])
+
+
+def test_cancelled_trial_is_released():
+    model = ChatModel(FakeChatModel(delay=10.0))
+    breaker = get_circuit_breaker("fake")
+    half_open(breaker)
+
+    async def cancel_trial():
+        task = asyncio.ensure_future(model.ainvoke([HumanMessage(content="hello")]))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_trial())
+    assert breaker.state == breaker.HALF_OPEN
+    model.llm.delay = 0.0
+    assert model.invoke([HumanMessage(content="hello")]).content == "ok"
+    assert breaker.state == breaker.CLOSED
+
+
+def test_interrupted_stream_trial_is_released():
+    model = ChatModel(FakeChatModel())
+    breaker = get_circuit_breaker("fake")
+    half_open(breaker)
+    stream = model.stream([HumanMessage(content="hello")])
+    next(stream)
+    stream.close()
+    breaker.before_call()
+    assert breaker.state == breaker.HALF_OPEN
+
+
+def test_trial_served_by_another_backend_is_released():
+    primary = FakeChatModel(provider="primary", error=ServiceUnavailableError("down"))
+    secondary = FakeChatModel(provider="secondary")
+    model = ChatModel(PoolAdapter(BackendPool([Backend("primary", primary, weight=100), Backend("secondary", secondary)])))
+    breaker = get_circuit_breaker("primary")
+    half_open(breaker)
+    assert model.invoke([HumanMessage(content="hello")]).response_metadata["llm_backend"] == "secondary"
+    assert get_circuit_breaker("secondary").state == breaker.CLOSED
+    breaker.before_call()
+    assert breaker.state == breaker.HALF_OPEN